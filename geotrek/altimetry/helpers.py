@@ -1,18 +1,27 @@
 import logging
 
-from django.contrib.gis.geos import GEOSGeometry
+from django.contrib.gis.gdal import CoordTransform, SpatialReference
+from django.contrib.gis.geos import Polygon
 from django.utils import translation
 from django.utils.translation import gettext as _
 from django.contrib.gis.geos import LineString
 from django.conf import settings
 from django.db import connection
 
+import numpy
 import pygal
 from pygal.style import LightSolarizedStyle
 
 logger = logging.getLogger(__name__)
 
 
+def cumulative_distances(coords, offset=0):
+    """Return distance from origin (2D) of each vertex of a line, plus ``offset``."""
+    xy = numpy.array(coords, dtype=float)[:, :2]
+    steps = numpy.hypot(*numpy.diff(xy, axis=0).T)
+    return offset + numpy.concatenate(([0.0], numpy.cumsum(steps)))
+
+
 class AltimetryHelper:
     @classmethod
     def elevation_profile(cls, geometry3d, precision=None, offset=0):
@@ -20,8 +29,29 @@ class AltimetryHelper:
 
         :precision:  geometry sampling in meters
         """
-        precision = precision or settings.ALTIMETRIC_PROFILE_PRECISION
+        return cls.elevation_profiles([geometry3d], precision, offset)[0]
+
+    @classmethod
+    def elevation_profiles(cls, geometries3d, precision=None, offset=0):
+        """Extract elevation profiles from many 3D geometries at once.
+
+        Distances from origin are computed with NumPy (cumulative length of
+        segments), and coordinates are reprojected with a single transformation,
+        so that no database query is needed.
+
+        :precision:  geometry sampling in meters
+        """
+        transform = {}
+        profiles = []
+        for geometry3d in geometries3d:
+            if geometry3d.srid not in transform:
+                transform[geometry3d.srid] = CoordTransform(SpatialReference(geometry3d.srid),
+                                                            SpatialReference(settings.API_SRID))
+            profiles.append(cls._elevation_profile(geometry3d, transform[geometry3d.srid], offset))
+        return profiles
 
+    @classmethod
+    def _elevation_profile(cls, geometry3d, transform, offset):
         if geometry3d.geom_type == 'Point':
             return [[0, geometry3d.x, geometry3d.y, geometry3d.z]]
 
@@ -30,25 +60,16 @@ class AltimetryHelper:
             for subcoords in geometry3d.coords:
                 subline = LineString(subcoords, srid=geometry3d.srid)
                 offset += subline.length
-                subprofile = AltimetryHelper.elevation_profile(subline, precision, offset)
+                subprofile = cls._elevation_profile(subline, transform, offset)
                 profile.extend(subprofile)
             return profile
 
-        # Add measure to 2D version of geometry3d
         # Get distance from origin for each vertex
-        sql = """
-        WITH line2d AS (SELECT ST_Force2D('%(ewkt)s'::geometry) AS geom),
-             line_measure AS (SELECT ST_Addmeasure(geom, 0, ST_length(geom)) AS geom FROM line2d),
-             points2dm AS (SELECT (ST_DumpPoints(geom)).geom AS point FROM line_measure)
-        SELECT (%(offset)s + ST_M(point)) FROM points2dm;
-        """ % {'offset': offset, 'ewkt': geometry3d.ewkt}
-        cursor = connection.cursor()
-        cursor.execute(sql)
-        pointsm = cursor.fetchall()
+        distances = cumulative_distances(geometry3d.coords, offset)
         # Join (offset+distance, x, y, z) together
-        geom3dapi = geometry3d.transform(settings.API_SRID, clone=True)
-        assert len(pointsm) == len(geom3dapi.coords), 'Cannot map distance to xyz'
-        dxyz = [pointsm[i] + v for i, v in enumerate(geom3dapi.coords)]
+        geom3dapi = geometry3d.transform(transform, clone=True)
+        assert len(distances) == len(geom3dapi.coords), 'Cannot map distance to xyz'
+        dxyz = [(float(distances[i]), ) + v for i, v in enumerate(geom3dapi.coords)]
         return dxyz
 
     @classmethod
@@ -125,6 +146,56 @@ class AltimetryHelper:
                                   int(ycenter + height / 2.0))
         return (xmin, ymin, xmax, ymax)
 
+    @classmethod
+    def elevation_grid(cls, xmin, ymin, xmax, ymax, precision):
+        """Return altitudes of a regular grid of points as a NumPy array.
+
+        Rows go from south to north, columns from west to east. Cells where
+        DEM has no value are NaN. DEM is clipped (and resampled if much finer than
+        ``precision``) in a single query, then sampled with NumPy.
+        Returns ``None`` if no DEM intersects the grid.
+        """
+        xs = xmin + precision * numpy.arange((xmax - xmin) // precision + 1)
+        ys = ymin + precision * numpy.arange((ymax - ymin) // precision + 1)
+        sql = """
+            WITH extent AS (
+                    SELECT ST_MakeEnvelope(%(xmin)s, %(ymin)s, %(xmax)s, %(ymax)s, %(srid)s) AS geom
+                ),
+                clipped AS (
+                    SELECT ST_Union(ST_Clip(rast, ST_Expand(extent.geom, %(precision)s + ABS(ST_ScaleX(rast))))) AS rast
+                    FROM altimetry_dem, extent
+                    WHERE ST_Intersects(rast, extent.geom)
+                ),
+                resampled AS (
+                    SELECT CASE WHEN ABS(ST_ScaleX(rast)) * 2 < %(precision)s
+                                THEN ST_Rescale(rast, %(precision)s, -%(precision)s)
+                                ELSE rast END AS rast
+                    FROM clipped
+                )
+            SELECT ST_UpperLeftX(rast), ST_UpperLeftY(rast), ST_ScaleX(rast), ST_ScaleY(rast),
+                   ST_DumpValues(rast, 1)
+            FROM resampled
+            WHERE rast IS NOT NULL;
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, {'xmin': xmin, 'ymin': ymin, 'xmax': xmax, 'ymax': ymax,
+                                 'srid': settings.SRID, 'precision': precision})
+            result = cursor.fetchone()
+        if result is None:
+            return None
+        upperleft_x, upperleft_y, scale_x, scale_y, values = result
+        # NULL (no data) values become NaN
+        values = numpy.array(values, dtype=float)
+        height, width = values.shape
+        # Same pixel lookup as ST_Value() for each point of the grid
+        columns = numpy.floor((xs - upperleft_x) / scale_x).astype(int)
+        rows = numpy.floor((ys - upperleft_y) / scale_y).astype(int)
+        grid = numpy.full((len(ys), len(xs)), numpy.nan)
+        inside_columns = (columns >= 0) & (columns < width)
+        inside_rows = (rows >= 0) & (rows < height)
+        grid[numpy.ix_(inside_rows, inside_columns)] = values[numpy.ix_(rows[inside_rows], columns[inside_columns])]
+        return grid
+
     @classmethod
     def elevation_area(cls, geom):
         xmin, ymin, xmax, ymax = cls._nice_extent(geom)
@@ -139,74 +210,25 @@ class AltimetryHelper:
         if height < precision or width < precision:
             precision = min([height, width])
 
-        sql = """
-            -- Author: Celian Garcia
-            WITH columns AS (
-                    SELECT generate_series({xmin}::int, {xmax}::int, {precision}) AS x
-                ),
-                lines AS (
-                    SELECT generate_series({ymin}::int, {ymax}::int, {precision}) AS y
-                ),
-                resolution AS (
-                    SELECT x, y
-                    FROM (SELECT COUNT(x) AS x FROM columns) AS col,
-                         (SELECT COUNT(y) AS y FROM lines)   AS lin
-                ),
-                points2d AS (
-                    SELECT row_number() OVER (ORDER BY lines.y, columns.x) AS id,
-                           ST_SetSRID(ST_MakePoint(x, y), {srid}) AS geom,
-                           ST_Transform(ST_SetSRID(ST_MakePoint(x, y), {srid}), 4326) AS geomll
-                    FROM columns, lines
-                ),
-                draped AS (
-                    SELECT id, CASE WHEN ST_Value(altimetry_dem.rast, p.geom)::int = -99999 THEN 0 ELSE ST_Value(altimetry_dem.rast, p.geom)::int END AS altitude
-                    FROM altimetry_dem, points2d AS p
-                    WHERE ST_Intersects(altimetry_dem.rast, p.geom)
-                ),
-                all_draped AS (
-                    SELECT geomll, geom, altitude
-                    FROM points2d LEFT JOIN draped ON (points2d.id = draped.id)
-                    ORDER BY points2d.id
-                ),
-                extent_latlng AS (
-                    SELECT ST_Envelope(ST_Union(geom)) AS extent,
-                           MIN(altitude) AS min_z,
-                           MAX(altitude) AS max_z,
-                           AVG(altitude) AS center_z
-                    FROM all_draped
-                )
-            SELECT extent,
-                   ST_transform(extent, 4326),
-                   center_z,
-                   min_z,
-                   max_z,
-                   resolution.x AS resolution_w,
-                   resolution.y AS resolution_h,
-                   altitude
-            FROM extent_latlng, resolution, all_draped;
-        """.format(xmin=xmin, ymin=ymin, xmax=xmax, ymax=ymax,
-                   srid=settings.SRID, precision=precision)
-        cursor = connection.cursor()
-        cursor.execute(sql)
-        result = cursor.fetchall()
-        first = result[0]
-        envelop_native, envelop, center_z, min_z, max_z, resolution_w, resolution_h, a = first
-        envelop = GEOSGeometry(envelop, srid=4326)
-        envelop_native = GEOSGeometry(envelop_native, srid=settings.SRID)
-
-        if center_z is None:
+        grid = cls.elevation_grid(xmin, ymin, xmax, ymax, precision)
+        if grid is None or numpy.isnan(grid).all():
             logger.warning("No DEM present")
             return {}
 
-        altitudes = []
-        row = []
-        for i, record in enumerate(result):
-            if i > 0 and i % resolution_w == 0:
-                altitudes.append(row)
-                row = []
-            elevation = (record[7] or 0.0) - min_z
-            row.append(elevation)
-        altitudes.append(row)
+        resolution_h, resolution_w = grid.shape
+        envelop_native = Polygon.from_bbox((xmin, ymin,
+                                            xmin + (resolution_w - 1) * precision,
+                                            ymin + (resolution_h - 1) * precision))
+        envelop_native.srid = settings.SRID
+        envelop = envelop_native.transform(4326, clone=True)
+
+        draped = numpy.rint(grid)
+        draped[draped == -99999] = 0
+        valid = ~numpy.isnan(draped)
+        min_z = int(draped[valid].min())
+        max_z = int(draped[valid].max())
+        center_z = draped[valid].mean()
+        altitudes = (numpy.where(valid, draped, 0) - min_z).astype(int).tolist()
 
         area = {
             'center': {
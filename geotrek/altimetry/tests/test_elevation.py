@@ -123,6 +123,34 @@ class ElevationProfileTest(TestCase):
         profile = AltimetryHelper.elevation_profile(geom)
         self.assertEqual(profile, [[0, 1.5, 2.5, 8.0]])
 
+    def test_elevation_profile_distances(self):
+        geom = LineString((0, 0, 8), (3, 4, 10), (3, 10, 12), srid=settings.SRID)
+        profile = AltimetryHelper.elevation_profile(geom)
+        self.assertEqual([step[0] for step in profile], [0, 5, 11])
+        self.assertEqual([step[3] for step in profile], [8, 10, 12])
+
+    def test_elevation_profiles_batch(self):
+        def separate_profile(geom):
+            """Profile of a single geometry, computed with GEOS length and transformation"""
+            if geom.geom_type == 'Point':
+                return [[0, geom.x, geom.y, geom.z]]
+            geom_api = geom.transform(settings.API_SRID, clone=True)
+            distances = [0.0] + [LineString(geom.coords[:i + 1]).length for i in range(1, len(geom.coords))]
+            return [[distance] + list(coords) for distance, coords in zip(distances, geom_api.coords)]
+
+        geoms = [LineString((700000, 6600000, 8), (700003, 6600004, 10), (700003, 6600010, 12), srid=2154),
+                 Point(700001.5, 6600002.5, 8, srid=2154),
+                 LineString((3, 45, 100), (3.01, 45.01, 110), srid=4326),
+                 LineString((700000, 6600000, 8), (700000, 6600010, 10), srid=2154)]
+        profiles = AltimetryHelper.elevation_profiles(geoms)
+        self.assertEqual(len(profiles), len(geoms))
+        for geom, profile in zip(geoms, profiles):
+            expected = separate_profile(geom)
+            self.assertEqual(len(profile), len(expected))
+            for step, expected_step in zip(profile, expected):
+                for value, expected_value in zip(step, expected_step):
+                    self.assertAlmostEqual(value, expected_value, places=6)
+
     def test_elevation_svg_output(self):
         geom = LineString((1.5, 2.5, 8), (2.5, 2.5, 10),
                           srid=settings.SRID)
@@ -218,6 +246,16 @@ class ElevationOtherGeomAreaTest(TestCase):
         self.assertEqual(extent['altitudes']['max'], 30)
         self.assertEqual(extent['altitudes']['min'], 30)
 
+    def test_grid_values(self):
+        grid = AltimetryHelper.elevation_grid(0, 0, 100, 125, 25)
+        self.assertEqual(grid.shape, (6, 5))
+        # lines of the grid go from south to north
+        self.assertEqual(grid[1].tolist(), [30, 35, 40, 45, 0])
+        self.assertEqual(grid[-2].tolist(), [2, 2, 10, 15, 0])
+
+    def test_grid_without_dem(self):
+        self.assertIsNone(AltimetryHelper.elevation_grid(10000, 10000, 10100, 10100, 25))
+
     def test_area_has_nice_ratio_if_vertical(self):
         geom = LineString((0, 0), (0, 1000), srid=settings.SRID)
         area = AltimetryHelper.elevation_area(geom)
@@ -1,6 +1,7 @@
 import argparse
+import hashlib
 import logging
-import filecmp
+import multiprocessing
 import os
 import stat
 from PIL import Image
@@ -8,12 +9,12 @@ import re
 import shutil
 import tempfile
 from time import sleep
-from zipfile import ZipFile
 import cairosvg
 
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
 from django.db.models import Q
 from django.http import StreamingHttpResponse
 from django.test.client import RequestFactory
@@ -26,7 +27,8 @@ from geotrek.tourism import models as tourism_models
 from geotrek.trekking import models as trekking_models
 from geotrek.api.mobile.views.trekking import TrekViewSet
 from geotrek.api.mobile.views.common import FlatPageViewSet, SettingsView
-from geotrek.common.helpers_sync import ZipTilesBuilder
+from geotrek.common.helpers_sync import (SyncZipFile, ZipTilesBuilder, ZIP_MANIFEST_NAME, file_has_content,
+                                         load_zip_hashes, save_zip_hashes)
 # Register mapentity models
 from geotrek.trekking import urls  # NOQA
 from geotrek.tourism import urls  # NOQA
@@ -35,6 +37,49 @@ from geotrek.tourism import urls  # NOQA
 logger = logging.getLogger(__name__)
 
 
+def pictogram_digest(path):
+    """ Hash of content of source pictogram """
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def pictogram_cache_path(path, size=None, digest=None):
+    """ Path of rasterized pictogram in cache, keyed by content of source file and target size """
+    file_extension = os.path.splitext(path)[1]
+    if digest is None:
+        digest = pictogram_digest(path)
+    if file_extension == '.svg':
+        file_extension = '.png'
+    return os.path.join(settings.VAR_DIR, 'pictograms', '{}-{}{}'.format(digest, size or 'orig', file_extension))
+
+
+def rasterize_pictogram(args):
+    """ Convert SVG pictograms to PNG and resize them, result is stored in cache """
+    path, size, cache_path = args
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    # Write to a temporary file first so that concurrent runs never read a partial pictogram
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix=os.path.splitext(cache_path)[1])
+    os.close(fd)
+    try:
+        # Convert SVG to PNG and open it
+        if os.path.splitext(path)[1] == '.svg':
+            cairosvg.svg2png(url=path, write_to=tmp_path)
+            image = Image.open(tmp_path)
+        else:
+            image = Image.open(path)
+        # Resize
+        if size:
+            image = image.resize((size, size), Image.ANTIALIAS)
+        # Save
+        image.save(tmp_path, optimize=True, quality=95)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, cache_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return cache_path
+
+
 class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('path')
@@ -46,6 +91,8 @@ class Command(BaseCommand):
                             help='Skip inclusion of tiles in zip files')
         parser.add_argument('--url', '-u', dest='url', default='http://localhost', help='Base url')
         parser.add_argument('--indent', '-i', default=0, type=int, help='Indent json files')
+        parser.add_argument('--jobs', '-j', dest='jobs', type=int, default=1,
+                            help="Number of processes used to rasterize pictograms")
         parser.add_argument('--task', default=None, help=argparse.SUPPRESS)
 
     def mkdirs(self, name):
@@ -76,7 +123,6 @@ class Command(BaseCommand):
             if self.verbosity == 2:
                 self.stdout.write("\x1b[3D\x1b[31;1mfailed (HTTP {code})\x1b[0m".format(code=response.status_code))
             return
-        f = open(fullname, 'wb')
         if isinstance(response, StreamingHttpResponse):
             content = b''.join(response.streaming_content)
         else:
@@ -85,16 +131,18 @@ class Command(BaseCommand):
         if fix2028:
             content = content.replace(b'\\u2028', b'\\n')
             content = content.replace(b'\\u2029', b'\\n')
-        f.write(content)
-        f.close()
         oldfilename = os.path.join(self.dst_root, name)
-        # If new file is identical to old one, don't recreate it. This will help backup
-        if os.path.isfile(oldfilename) and filecmp.cmp(fullname, oldfilename):
+        if os.path.lexists(fullname):
+            # Do not modify a file linked to previous sync
             os.unlink(fullname)
+        # If new file is identical to old one, don't recreate it. This will help backup
+        if file_has_content(oldfilename, content):
             os.link(oldfilename, fullname)
             if self.verbosity == 2:
                 self.stdout.write("\x1b[3D\x1b[32munchanged\x1b[0m")
         else:
+            with open(fullname, 'wb') as f:
+                f.write(content)
             if self.verbosity == 2:
                 self.stdout.write("\x1b[3D\x1b[32mgenerated\x1b[0m")
 
@@ -165,7 +213,7 @@ class Command(BaseCommand):
         self.mkdirs(dst)
         if not os.path.isfile(dst):
             os.link(src, dst)
-        if zipfile and os.path.join(url, name) not in zipfile.namelist():
+        if zipfile:
             zipfile.write(dst, os.path.join(url, name))
         if self.verbosity == 2:
             self.stdout.write(
@@ -177,6 +225,32 @@ class Command(BaseCommand):
             url_media = '/%s%s' % (prefix, settings.MEDIA_URL) if prefix else settings.MEDIA_URL
             self.sync_file(field.name, settings.MEDIA_ROOT, url_media, directory=directory, zipfile=zipfile)
 
+    def pictogram_cache_path(self, path, size=None):
+        """ Like ``pictogram_cache_path()``, each source pictogram being hashed once per run """
+        if path not in self.pictogram_digests:
+            self.pictogram_digests[path] = pictogram_digest(path)
+        return pictogram_cache_path(path, size, self.pictogram_digests[path])
+
+    def rasterize_pictograms(self, models_sizes):
+        """ Fill pictograms cache of given (model, size) couples, missing pictograms are rasterized in parallel """
+        todo = {}
+        for model, size in models_sizes:
+            for obj in model.objects.all():
+                if not obj.pictogram:
+                    continue
+                path = obj.pictogram.path
+                cache_path = self.pictogram_cache_path(path, size)
+                if not os.path.exists(cache_path):
+                    todo[cache_path] = (path, size, cache_path)
+        if self.jobs > 1 and len(todo) > 1:
+            # Workers are forked and must open their own database connections
+            connections.close_all()
+            with multiprocessing.get_context('fork').Pool(min(self.jobs, len(todo))) as pool:
+                pool.map(rasterize_pictogram, todo.values())
+        else:
+            for args in todo.values():
+                rasterize_pictogram(args)
+
     def sync_pictograms(self, model, directory='', zipfile=None, size=None):
         for obj in model.objects.all():
             if not obj.pictogram:
@@ -188,19 +262,13 @@ class Command(BaseCommand):
                 name = os.path.join(settings.MEDIA_URL.strip('/'), obj.pictogram.name)
             dst = os.path.join(self.tmp_root, directory, name)
             self.mkdirs(dst)
-            # Convert SVG to PNG and open it
-            if file_extension == '.svg':
-                cairosvg.svg2png(url=obj.pictogram.path, write_to=dst)
-                image = Image.open(dst)
-            else:
-                image = Image.open(obj.pictogram.path)
-            # Resize
-            if size:
-                image = image.resize((size, size), Image.ANTIALIAS)
-            # Save
-            image.save(dst, optimize=True, quality=95)
-            if name not in zipfile.namelist():
-                zipfile.write(dst, name)
+            cache_path = self.pictogram_cache_path(obj.pictogram.path, size)
+            if not os.path.exists(cache_path):
+                rasterize_pictogram((obj.pictogram.path, size, cache_path))
+            if os.path.lexists(dst):
+                os.remove(dst)
+            shutil.copyfile(cache_path, dst)
+            zipfile.write(dst, name)
             if self.verbosity == 2:
                 self.stdout.write(
                     "\x1b[36m**\x1b[0m \x1b[1m{directory}{url}/{name}\x1b[0m \x1b[32mcopied\x1b[0m".format(
@@ -213,20 +281,15 @@ class Command(BaseCommand):
 
         oldzipfilename = os.path.join(self.dst_root, name)
         zipfilename = os.path.join(self.tmp_root, name)
-        try:
-            oldzipfile = ZipFile(oldzipfilename, 'r')
-        except IOError:
-            uptodate = False
-        else:
-            old = set([(zi.filename, zi.CRC) for zi in oldzipfile.infolist()])
-            new = set([(zi.filename, zi.CRC) for zi in zipfile.infolist()])
-            uptodate = (old == new)
-            oldzipfile.close()
+        manifest_hash = zipfile.manifest_hash
+        uptodate = self.old_zip_hashes.get(name) == manifest_hash and os.path.isfile(oldzipfilename)
 
         zipfile.close()
+        self.zip_hashes[name] = manifest_hash
         if uptodate:
-            stat = os.stat(oldzipfilename)
-            os.utime(zipfilename, (stat.st_atime, stat.st_mtime))
+            # Keep previous zip, which has the same entries
+            os.unlink(zipfilename)
+            os.link(oldzipfilename, zipfilename)
 
         if self.verbosity == 2:
             if uptodate:
@@ -289,7 +352,7 @@ class Command(BaseCommand):
         zipname_trekid = os.path.join(url_trek, "{}.zip".format(trek.pk))
         zipfullname_trekid = os.path.join(self.tmp_root, zipname_trekid)
         self.mkdirs(zipfullname_trekid)
-        trekid_zipfile = ZipFile(zipfullname_trekid, 'w')
+        trekid_zipfile = SyncZipFile(zipfullname_trekid, 'w')
 
         if not self.skip_tiles:
             self.sync_trek_tiles(trek, trekid_zipfile)
@@ -349,29 +412,28 @@ class Command(BaseCommand):
         zipname_settings = os.path.join('nolang', 'global.zip')
         zipfullname_settings = os.path.join(self.tmp_root, zipname_settings)
         self.mkdirs(zipfullname_settings)
-        self.zipfile_settings = ZipFile(zipfullname_settings, 'w')
+        self.zipfile_settings = SyncZipFile(zipfullname_settings, 'w')
 
         if not self.skip_tiles:
             self.sync_global_tiles(self.zipfile_settings)
 
-        self.sync_pictograms(common_models.Theme, directory=url_media_nolang, zipfile=self.zipfile_settings)
-        self.sync_pictograms(trekking_models.TrekNetwork, directory=url_media_nolang, zipfile=self.zipfile_settings)
-        self.sync_pictograms(trekking_models.Practice, directory=url_media_nolang, zipfile=self.zipfile_settings,
-                             size=settings.MOBILE_CATEGORY_PICTO_SIZE)
-        self.sync_pictograms(trekking_models.Accessibility, directory=url_media_nolang, zipfile=self.zipfile_settings)
-        self.sync_pictograms(trekking_models.DifficultyLevel, directory=url_media_nolang, zipfile=self.zipfile_settings)
-        self.sync_pictograms(trekking_models.POIType, directory=url_media_nolang, zipfile=self.zipfile_settings,
-                             size=settings.MOBILE_POI_PICTO_SIZE)
-        self.sync_pictograms(trekking_models.Route, directory=url_media_nolang, zipfile=self.zipfile_settings)
-        self.sync_pictograms(trekking_models.ServiceType, directory=url_media_nolang, zipfile=self.zipfile_settings)
-        self.sync_pictograms(tourism_models.InformationDeskType, directory=url_media_nolang,
-                             zipfile=self.zipfile_settings, size=settings.MOBILE_INFORMATIONDESKTYPE_PICTO_SIZE)
-        self.sync_pictograms(tourism_models.TouristicContentCategory, directory=url_media_nolang,
-                             zipfile=self.zipfile_settings, size=settings.MOBILE_CATEGORY_PICTO_SIZE)
-        self.sync_pictograms(tourism_models.TouristicContentType, directory=url_media_nolang,
-                             zipfile=self.zipfile_settings)
-        self.sync_pictograms(tourism_models.TouristicEventType, directory=url_media_nolang,
-                             zipfile=self.zipfile_settings)
+        pictograms = [
+            (common_models.Theme, None),
+            (trekking_models.TrekNetwork, None),
+            (trekking_models.Practice, settings.MOBILE_CATEGORY_PICTO_SIZE),
+            (trekking_models.Accessibility, None),
+            (trekking_models.DifficultyLevel, None),
+            (trekking_models.POIType, settings.MOBILE_POI_PICTO_SIZE),
+            (trekking_models.Route, None),
+            (trekking_models.ServiceType, None),
+            (tourism_models.InformationDeskType, settings.MOBILE_INFORMATIONDESKTYPE_PICTO_SIZE),
+            (tourism_models.TouristicContentCategory, settings.MOBILE_CATEGORY_PICTO_SIZE),
+            (tourism_models.TouristicContentType, None),
+            (tourism_models.TouristicEventType, None),
+        ]
+        self.rasterize_pictograms(pictograms)
+        for model, size in pictograms:
+            self.sync_pictograms(model, directory=url_media_nolang, zipfile=self.zipfile_settings, size=size)
         self.close_zip(self.zipfile_settings, zipname_settings)
 
     def sync_trek_tiles(self, trek, zipfile):
@@ -454,7 +516,7 @@ class Command(BaseCommand):
         if not os.path.exists(self.dst_root):
             return
         existing = set([os.path.basename(p) for p in os.listdir(self.dst_root)])
-        remaining = existing - {'nolang'} - set(settings.MODELTRANSLATION_LANGUAGES)
+        remaining = existing - {'nolang', ZIP_MANIFEST_NAME} - set(settings.MODELTRANSLATION_LANGUAGES)
         if remaining:
             raise CommandError("Destination directory contains extra data")
 
@@ -472,6 +534,8 @@ class Command(BaseCommand):
         self.verbosity = options['verbosity']
         self.skip_tiles = options['skip_tiles']
         self.indent = options['indent']
+        self.jobs = options['jobs']
+        self.pictogram_digests = {}
         self.factory = RequestFactory()
         self.dst_root = options["path"].rstrip('/')
         self.abs_path = os.path.abspath(options["path"])
@@ -514,6 +578,9 @@ class Command(BaseCommand):
         if not os.path.exists(sync_mobile_tmp_dir):
             os.mkdir(sync_mobile_tmp_dir)
 
+        self.old_zip_hashes = load_zip_hashes(self.dst_root)
+        self.zip_hashes = {}
+
         with tempfile.TemporaryDirectory(dir=sync_mobile_tmp_dir) as tmp_dir:
             self.tmp_root = tmp_dir
             self.sync()
@@ -527,6 +594,7 @@ class Command(BaseCommand):
                         'infos': "{}".format(_("Sync mobile ended"))
                     }
                 )
+            save_zip_hashes(self.tmp_root, self.zip_hashes)
             self.rename_root()
 
         done_message = 'Done'
@@ -20,6 +20,7 @@ from django.test import TestCase
 from django.test.utils import override_settings
 from django.utils import translation
 
+from geotrek.api.management.commands.sync_mobile import pictogram_cache_path, pictogram_digest
 from geotrek.common.tests.factories import RecordSourceFactory, TargetPortalFactory, AttachmentFactory
 from geotrek.common.tests import TranslationResetMixin
 from geotrek.common.utils.testdata import get_dummy_uploaded_image_svg, get_dummy_uploaded_image, get_dummy_uploaded_file
@@ -330,6 +331,33 @@ class SyncMobileSettingsTest(TranslationResetMixin, VarTmpTestCase):
         self.assertEqual(image_desk.size, (32, 32))
         self.assertIn('en/settings.json', output.getvalue())
 
+    def test_sync_pictograms_cache(self):
+        practice = PracticeFactory.create(pictogram=get_dummy_uploaded_image_svg())
+        cache_path = pictogram_cache_path(practice.pictogram.path, settings.MOBILE_CATEGORY_PICTO_SIZE)
+        if os.path.exists(cache_path):
+            os.remove(cache_path)
+        management.call_command('sync_mobile', os.path.join(settings.TMP_DIR, 'sync_mobile', 'tmp_sync'), url='http://localhost:8000',
+                                skip_tiles=True, verbosity=0)
+        self.assertTrue(os.path.exists(cache_path))
+        self.assertEqual(Image.open(cache_path).size, (32, 32))
+        shutil.rmtree(os.path.join(settings.TMP_DIR, 'sync_mobile', 'tmp_sync'))
+        with mock.patch('geotrek.api.management.commands.sync_mobile.rasterize_pictogram') as mock_rasterize:
+            management.call_command('sync_mobile', os.path.join(settings.TMP_DIR, 'sync_mobile', 'tmp_sync'),
+                                    url='http://localhost:8000', skip_tiles=True, verbosity=0)
+        mock_rasterize.assert_not_called()
+        pictogram_png = practice.pictogram.url.replace('.svg', '.png')
+        image_practice = Image.open(os.path.join(settings.TMP_DIR, 'sync_mobile', 'tmp_sync', 'nolang', pictogram_png[1:]))
+        self.assertEqual(image_practice.size, (32, 32))
+
+    def test_sync_pictograms_hashed_once(self):
+        practice = PracticeFactory.create(pictogram=get_dummy_uploaded_image_svg())
+        with mock.patch('geotrek.api.management.commands.sync_mobile.pictogram_digest',
+                        side_effect=pictogram_digest) as mock_digest:
+            management.call_command('sync_mobile', os.path.join(settings.TMP_DIR, 'sync_mobile', 'tmp_sync'),
+                                    url='http://localhost:8000', skip_tiles=True, verbosity=0)
+        paths = [call.args[0] for call in mock_digest.call_args_list]
+        self.assertEqual(paths.count(practice.pictogram.path), 1)
+
 
 class SyncMobileTreksTest(TranslationResetMixin, VarTmpTestCase):
     @classmethod
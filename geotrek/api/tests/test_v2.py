@@ -4230,3 +4230,105 @@ class AltimetryCacheTests(BaseApiTest):
             response = self.client.get(reverse('apiv2:trek-profile', args=(self.trek.pk,)), {"format": "svg"})
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response['Content-Type'], 'image/svg+xml')
+
+
+class VectorTilesTestCase(TestCase):
+    """ Test APIV2 vector tiles are filtered and cached
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.path = core_factory.PathFactory.create(geom=LineString((700000, 6600000), (700100, 6600100)))
+        if settings.TREKKING_TOPOLOGY_ENABLED:
+            cls.trek = trek_factory.TrekFactory.create(paths=[cls.path], name='Published trek')
+            cls.unpublished = trek_factory.TrekFactory.create(paths=[cls.path], name='Unpublished trek',
+                                                              published=False)
+        else:
+            cls.trek = trek_factory.TrekFactory.create(geom=cls.path.geom, name='Published trek')
+            cls.unpublished = trek_factory.TrekFactory.create(geom=cls.path.geom, name='Unpublished trek',
+                                                              published=False)
+        cls.user = SuperUserFactory.create()
+
+    def tile_url(self, basename, point, z=12):
+        point = point.transform(3857, clone=True)
+        size = 2 * 20037508.342789244 / 2 ** z
+        x = int((point.x + 20037508.342789244) // size)
+        y = int((20037508.342789244 - point.y) // size)
+        return reverse('apiv2:{}-mvt'.format(basename), args=(z, x, y))
+
+    def test_trek_tile(self):
+        response = self.client.get(self.tile_url('trek', Point(700050, 6600050, srid=settings.SRID)))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.mapbox-vector-tile')
+        self.assertIn(b'Published trek', response.content)
+        self.assertNotIn(b'Unpublished trek', response.content)
+
+    def test_trek_tile_filtered_by_practice(self):
+        url = self.tile_url('trek', Point(700050, 6600050, srid=settings.SRID))
+        other_practice = trek_factory.PracticeFactory.create()
+        response = self.client.get(url, {'practices': other_practice.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(b'Published trek', response.content)
+
+    def test_trek_tile_out_of_features(self):
+        response = self.client.get(self.tile_url('trek', Point(500000, 6900000, srid=settings.SRID)))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+
+    def test_trek_tile_does_not_exist(self):
+        response = self.client.get(reverse('apiv2:trek-mvt', args=(1, 2, 0)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_trek_tile_invalidated_on_update(self):
+        url = self.tile_url('trek', Point(700050, 6600050, srid=settings.SRID))
+        response = self.client.get(url)
+        self.assertIn(b'Published trek', response.content)
+        self.trek.name = 'Renamed trek'
+        self.trek.save()
+        response = self.client.get(url)
+        self.assertIn(b'Renamed trek', response.content)
+        self.trek.delete()
+        response = self.client.get(url)
+        self.assertNotIn(b'Renamed trek', response.content)
+
+    def test_path_tile_requires_authentication(self):
+        url = self.tile_url('path', Point(700050, 6600050, srid=settings.SRID))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 401)
+        self.client.force_login(self.user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'path', response.content)
+
+
+class SimplifiedGeometriesTestCase(TestCase):
+    """ Test APIV2 serves stored simplified geometries for zoom parameter
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        # Zigzag with 1 m amplitude, lower than tolerances of simplified geometries
+        cls.path = core_factory.PathFactory.create(geom=LineString(*[(700000 + i * 10, 6600000 + i % 2)
+                                                                     for i in range(50)]))
+        if settings.TREKKING_TOPOLOGY_ENABLED:
+            cls.trek = trek_factory.TrekFactory.create(paths=[cls.path])
+        else:
+            cls.trek = trek_factory.TrekFactory.create(geom=cls.path.geom)
+
+    def get_trek_coordinates(self, params):
+        response = self.client.get(reverse('apiv2:trek-detail', args=(self.trek.pk, )), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['geometry']['coordinates']
+
+    def test_trek_full_geometry(self):
+        self.assertEqual(len(self.get_trek_coordinates({})), 50)
+        self.assertEqual(len(self.get_trek_coordinates({'zoom': 16})), 50)
+
+    def test_trek_simplified_geometry(self):
+        self.assertEqual(len(self.get_trek_coordinates({'zoom': 8})), 2)
+        self.assertEqual(len(self.get_trek_coordinates({'zoom': 12})), 2)
+        # Elevation is kept
+        self.assertEqual(len(self.get_trek_coordinates({'zoom': 12})[0]), 3)
+
+    def test_trek_invalid_zoom(self):
+        self.assertEqual(len(self.get_trek_coordinates({'zoom': 'foo'})), 50)
@@ -4,21 +4,25 @@ import coreschema
 
 from coreapi.document import Field
 from django.conf import settings
-from django.db.models import Exists, OuterRef
+from django.db.models import Exists, F, OuterRef
 from django.db.models.query_utils import Q
 from django.utils.translation import gettext as _
 from rest_framework.filters import BaseFilterBackend
 from rest_framework_gis.filters import DistanceToPointFilter, InBBOXFilter
 
+from geotrek.common.search import search
 from geotrek.common.utils import intersecting
 from geotrek.core.models import Topology
 from geotrek.tourism.models import TouristicContent, TouristicContentType, TouristicEvent, TouristicEventType
 from geotrek.trekking.models import ServiceType, Trek, POI
-from geotrek.zoning.models import City, District
+from geotrek.zoning.models import CityIntersection, DistrictIntersection
 
 if 'geotrek.outdoor' in settings.INSTALLED_APPS:
     from geotrek.outdoor.models import Course, Site
 
+if 'geotrek.sensitivity' in settings.INSTALLED_APPS:
+    from geotrek.sensitivity.models import Species
+
 
 class GeotrekQueryParamsFilter(BaseFilterBackend):
     def filter_queryset(self, request, queryset, view):
@@ -57,6 +61,13 @@ class GeotrekQueryParamsDimensionFilter(BaseFilterBackend):
                     description=_("Set output format (json / geojson). Default: json. Example: geojson.")
                 )
             ),
+            Field(
+                name='zoom', required=False, location='query', schema=coreschema.Integer(
+                    title=_("Zoom"),
+                    description=_("Use geometries simplified for this map zoom level (treks, paths and outdoor courses). "
+                                  "Example: 10.")
+                )
+            ),
         )
 
 
@@ -154,20 +165,12 @@ class GeotrekSensitiveAreaFilter(BaseFilterBackend):
         if structures:
             qs = qs.filter(structure__in=structures.split(','))
         period = request.GET.get('period')
-        if not period:
-            qs = qs.filter(**{'species__period{:02}'.format(date.today().month): True})
-        elif period == 'any':
-            q = Q()
-            for m in range(1, 13):
-                q |= Q(**{'species__period{:02}'.format(m): True})
-            qs = qs.filter(q)
-        elif period == 'ignore':
-            pass
-        else:
-            q = Q()
-            for m in [int(m) for m in period.split(',')]:
-                q |= Q(**{'species__period{:02}'.format(m): True})
-            qs = qs.filter(q)
+        if period == 'any':
+            qs = qs.filter(period_mask__gt=0)
+        elif period != 'ignore':
+            months = [int(m) for m in period.split(',')] if period else [date.today().month]
+            qs = qs.alias(period_match=F('period_mask').bitand(Species.months_mask(months))) \
+                .filter(period_match__gt=0)
         trek_id = request.GET.get('trek')
         trek = Trek.objects.filter(pk=trek_id)
         if trek:
@@ -348,10 +351,14 @@ class GeotrekZoningAndThemeFilter(NearbyContentFilter):
         qs = queryset
         cities = request.GET.get('cities')
         if cities:
-            qs = qs.filter(Exists(City.objects.filter(code__in=cities.split(","), geom__intersects=OuterRef('geom'))))
+            qs = qs.filter(Exists(CityIntersection.objects.filter(
+                object_table=CityIntersection.object_table_of(qs.model), object_id=OuterRef('pk'),
+                city_code__in=cities.split(","))))
         districts = request.GET.get('districts')
         if districts:
-            qs = qs.filter(Exists(District.objects.filter(pk__in=districts.split(","), geom__intersects=OuterRef('geom'))))
+            qs = qs.filter(Exists(DistrictIntersection.objects.filter(
+                object_table=DistrictIntersection.object_table_of(qs.model), object_id=OuterRef('pk'),
+                district_id__in=districts.split(","))))
         structures = request.GET.get('structures')
         if structures:
             qs = qs.filter(structure__in=structures.split(','))
@@ -363,17 +370,13 @@ class GeotrekZoningAndThemeFilter(NearbyContentFilter):
                 qs = qs.filter(parent_sites__themes__in=themes.split(','))
             if portals:
                 qs = qs.filter(parent_sites__portal__in=portals.split(','))
-            if q:
-                qs = qs.filter(
-                    Q(name__icontains=q) | Q(description__icontains=q)
-                )
         else:
             if themes:
                 qs = qs.filter(themes__in=themes.split(','))
             if portals:
                 qs = qs.filter(portal__in=portals.split(','))
-            if q:
-                qs = qs.filter(Q(name__icontains=q) | Q(description__icontains=q) | Q(description_teaser__icontains=q))
+        if q:
+            qs = search(qs, q)
         return qs
 
     def _get_schema_fields(self, view):
@@ -650,10 +653,14 @@ class GeotrekTrekQueryParamsFilter(BaseFilterBackend):
             qs = qs.filter(ascent__lte=ascent_max)
         cities = request.GET.get('cities')
         if cities:
-            qs = qs.filter(Exists(City.objects.filter(code__in=cities.split(","), geom__intersects=OuterRef('geom'))))
+            qs = qs.filter(Exists(CityIntersection.objects.filter(
+                object_table=CityIntersection.object_table_of(qs.model), object_id=OuterRef('pk'),
+                city_code__in=cities.split(","))))
         districts = request.GET.get('districts')
         if districts:
-            qs = qs.filter(Exists(District.objects.filter(pk__in=districts.split(","), geom__intersects=OuterRef('geom'))))
+            qs = qs.filter(Exists(DistrictIntersection.objects.filter(
+                object_table=DistrictIntersection.object_table_of(qs.model), object_id=OuterRef('pk'),
+                district_id__in=districts.split(","))))
         structures = request.GET.get('structures')
         if structures:
             qs = qs.filter(structure__in=structures.split(','))
@@ -683,10 +690,7 @@ class GeotrekTrekQueryParamsFilter(BaseFilterBackend):
             qs = qs.filter(practice__in=practices.split(','))
         q = request.GET.get('q')
         if q:
-            qs = qs.filter(
-                Q(name__icontains=q) | Q(description__icontains=q)
-                | Q(description_teaser__icontains=q) | Q(ambiance__icontains=q)
-            )
+            qs = search(qs, q)
         return qs
 
     def get_schema_fields(self, view):
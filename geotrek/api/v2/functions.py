@@ -1,6 +1,6 @@
 from django.contrib.gis.db.models.functions import GeoFunc
 from django.db.models import Func
-from django.db.models.fields import FloatField
+from django.db.models.fields import BinaryField, FloatField
 from django.contrib.gis.db.models import GeometryField, PointField
 
 
@@ -30,3 +30,12 @@ class Area(Func):
 class EndPoint(GeoFunc):
     """ ST_EndPoint postgis function """
     output_field = PointField()
+
+
+class AsMVTGeom(Func):
+    """
+    ST_AsMVTGeom postgis function, geometry in vector tile coordinate space
+    """
+    function = 'ST_AsMVTGeom'
+    # Selected as is, ST_AsMVT needs a geometry column
+    output_field = BinaryField()
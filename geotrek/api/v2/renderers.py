@@ -51,3 +51,14 @@ class SVGProfileRenderer(BaseRenderer):
         translation.deactivate()
         line_chart.add('', [(int(v[0]), int(v[3])) for v in profile])
         return line_chart.render()
+
+
+class MVTRenderer(BaseRenderer):
+    media_type = "application/vnd.mapbox-vector-tile"
+    format = "mvt"
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, media_type=None, renderer_context=None):
+        # Errors have no vector tile representation, their status code is enough
+        return data if isinstance(data, bytes) else b''
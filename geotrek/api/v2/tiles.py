@@ -0,0 +1,110 @@
+"""
+
+   Vector tiles of API v2 geometric endpoints
+
+   Tiles are generated by PostGIS (``ST_AsMVT``) from the filtered queryset of the viewset,
+   so that query parameters (published, portal, practices...) apply as for GeoJSON lists.
+   They are cached with a key including the latest ``date_update`` and the number of features of the tile.
+
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.gis.db.models import GeometryField
+from django.contrib.gis.db.models.functions import Transform
+from django.contrib.gis.geos import Polygon
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connection
+from django.db.models import Count, F, Func, Max, Value
+from modeltranslation.utils import build_localized_fieldname, get_language
+
+from geotrek.api.v2.functions import AsMVTGeom
+
+
+MVT_SRID = 3857
+MVT_EXTENT = 4096
+MVT_BUFFER = 64
+MERCATOR_MAX = 20037508.342789244
+
+
+def tile_bounds(z, x, y):
+    """ Web mercator bounds of a tile, ``None`` if the tile does not exist """
+    count = 2 ** z
+    if x >= count or y >= count:
+        return None
+    size = 2 * MERCATOR_MAX / count
+    xmin = -MERCATOR_MAX + x * size
+    ymax = MERCATOR_MAX - y * size
+    return xmin, ymax - size, xmin + size, ymax
+
+
+def tile_area(bounds):
+    """
+    Polygon of the tile and its buffer in internal SRID, ``None`` if the tile is out of ``SPATIAL_EXTENT``.
+    The tile is clipped to ``SPATIAL_EXTENT`` before its transformation, since low zoom tiles
+    cover areas where the internal projection is not defined.
+    """
+    xmin, ymin, xmax, ymax = bounds
+    margin = (xmax - xmin) * MVT_BUFFER / MVT_EXTENT
+    area = Polygon.from_bbox((xmin - margin, ymin - margin, xmax + margin, ymax + margin))
+    area.srid = MVT_SRID
+    extent = Polygon.from_bbox(settings.SPATIAL_EXTENT)
+    extent.srid = settings.SRID
+    extent.transform(MVT_SRID)
+    if not area.intersects(extent):
+        return None
+    area = area.intersection(extent)
+    area.srid = MVT_SRID
+    area.transform(settings.SRID)
+    return area
+
+
+def localized_field(model, field):
+    """ Translated column of a field in current language """
+    name = build_localized_fieldname(field, get_language())
+    try:
+        model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return field
+    return name
+
+
+def tile_features(queryset, bounds, geom_field):
+    """ Filter queryset by features of the tile """
+    area = tile_area(bounds)
+    if area is None:
+        return queryset.none()
+    return queryset.filter(**{'{}__bboverlaps'.format(geom_field): area}).order_by().prefetch_related(None)
+
+
+def tile_cache_key(features, layer, z, x, y, params):
+    """ Cache key of a tile, changed when one of its features is updated, added or removed """
+    state = features.aggregate(latest=Max('date_update'), count=Count('pk'))
+    latest = state['latest'].strftime('%y%m%d%H%M%S%f') if state['latest'] else ''
+    params = hashlib.md5(params.encode()).hexdigest()
+    return 'mvt_{}_{}_{}_{}_{}_{}_{}'.format(layer, z, x, y, params, state['count'], latest)
+
+
+def render_tile(features, bounds, layer, geom_field, fields):
+    """ Vector tile of features, with given fields as properties """
+    if features.query.is_empty():
+        return b''
+    envelope = Func(*[Value(coord) for coord in bounds], Value(MVT_SRID), function='ST_MakeEnvelope',
+                    output_field=GeometryField())
+    model = features.model
+    values = {
+        'mvt_geom': AsMVTGeom(Transform(F(geom_field), MVT_SRID), envelope, Value(MVT_EXTENT), Value(MVT_BUFFER),
+                              Value(True)),
+        'mvt_id': F('pk'),
+    }
+    values.update({'mvt_{}'.format(field): F(localized_field(model, field)) for field in fields})
+    sql, params = features.values(**values).query.sql_with_params()
+    columns = ', '.join('"mvt_{0}" AS "{0}"'.format(name) for name in ['geom', 'id'] + list(fields))
+    sql = """
+        SELECT ST_AsMVT(tile, %s, {extent}, 'geom')
+        FROM (SELECT {columns} FROM ({sql}) AS features WHERE "mvt_geom" IS NOT NULL) AS tile
+    """.format(extent=MVT_EXTENT, columns=columns, sql=sql)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [layer] + list(params))
+        content = cursor.fetchone()[0]
+    return bytes(content) if content else b''
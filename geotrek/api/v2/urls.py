@@ -4,6 +4,7 @@ from django.views.generic import RedirectView
 from rest_framework import routers
 
 from geotrek.api.v2 import views as api_views
+from geotrek.api.v2.renderers import MVTRenderer
 
 
 router = routers.DefaultRouter()
@@ -89,6 +90,12 @@ _urlpatterns += [
     path('sportpractice/', RedirectView.as_view(pattern_name='apiv2:sportpractice-list', permanent=True)),
     path('sportpractice/<int:pk>/', RedirectView.as_view(pattern_name='apiv2:sportpractice-detail', permanent=True)),
     path('version', api_views.GeotrekVersionAPIView.as_view()),
-    path('', include(router.urls)),
 ]
+# Vector tiles of geometric endpoints, without trailing slash as usual for tiles
+for prefix, viewset, basename in router.registry:
+    if getattr(viewset, 'mvt_fields', None) is not None:
+        _urlpatterns.append(path('{}/<int:z>/<int:x>/<int:y>.mvt'.format(prefix),
+                                 viewset.as_view({'get': 'mvt'}, basename=basename, renderer_classes=[MVTRenderer]),
+                                 name='{}-mvt'.format(basename)))
+_urlpatterns.append(path('', include(router.urls)))
 urlpatterns = [path('api/v2/', include(_urlpatterns))]
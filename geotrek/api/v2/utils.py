@@ -42,7 +42,7 @@ def build_url(serializer, url):
 
 def build_response_from_cache(cache_lookup, data_func, content_type):
     # Choose adequate cache
-    if content_type == "application/json":
+    if content_type in ("application/json", "application/vnd.mapbox-vector-tile"):
         cache = caches[settings.MAPENTITY_CONFIG['GEOJSON_LAYERS_CACHE_BACKEND']]
     else:
         cache = caches['default']
@@ -6,6 +6,7 @@ from django.utils.translation import activate
 
 from geotrek.api.v2 import serializers as api_serializers, \
     filters as api_filters, viewsets as api_viewsets
+from geotrek.common.functions import simplified_geometry
 from geotrek.common.models import Attachment
 from geotrek.outdoor import models as outdoor_models
 
@@ -90,7 +91,8 @@ class CourseViewSet(api_viewsets.GeotrekGeometricViewset):
     def get_queryset(self):
         activate(self.request.GET.get('language'))
         return outdoor_models.Course.objects \
-            .annotate(geom_transformed=Transform(F('geom'), settings.API_SRID)) \
+            .annotate(geom_transformed=Transform(simplified_geometry('geom', self.request.GET.get('zoom')),
+                                                 settings.API_SRID)) \
             .prefetch_related(Prefetch('attachments',
                                        queryset=Attachment.objects.select_related('license', 'filetype', 'filetype__structure'))) \
             .order_by('name')  # Required for reliable pagination
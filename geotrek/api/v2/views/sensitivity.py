@@ -1,12 +1,10 @@
 from django.conf import settings
 from django.contrib.gis.db.models.functions import Transform
-from django.db.models import F, Case, When
+from django.db.models import F
 from django_filters.rest_framework.backends import DjangoFilterBackend
 
 from geotrek.api.v2 import serializers as api_serializers, \
     viewsets as api_viewsets
-from geotrek.api.v2.functions import Buffer, Area
-from geotrek.common.functions import GeometryType
 from geotrek.sensitivity import models as sensitivity_models
 from ..filters import GeotrekQueryParamsFilter, GeotrekQueryParamsDimensionFilter, GeotrekInBBoxFilter, GeotrekSensitiveAreaFilter, NearbyContentFilter, UpdateOrCreateDateFilter
 
@@ -21,8 +19,17 @@ class SensitiveAreaViewSet(api_viewsets.GeotrekGeometricViewset):
         NearbyContentFilter,
         UpdateOrCreateDateFilter,
     )
-    bbox_filter_field = 'geom_transformed'
     bbox_filter_include_overlapping = True
+    mvt_fields = ('species', 'period_mask')
+
+    @property
+    def bbox_filter_field(self):
+        # Stored geometries in internal SRID, so that spatial index is used
+        return 'geom' if 'bubble' in self.request.GET else 'geom_buffered'
+
+    @property
+    def mvt_geom_field(self):
+        return self.bbox_filter_field
 
     def get_serializer_class(self):
         if 'bubble' in self.request.GET:
@@ -36,20 +43,15 @@ class SensitiveAreaViewSet(api_viewsets.GeotrekGeometricViewset):
         queryset = sensitivity_models.SensitiveArea.objects.existing() \
             .filter(published=True) \
             .select_related('species', 'structure') \
-            .prefetch_related('species__practices') \
-            .annotate(geom_type=GeometryType(F('geom')))
+            .prefetch_related('species__practices')
         if 'bubble' in self.request.GET:
             queryset = queryset.annotate(geom_transformed=Transform(F('geom'), settings.API_SRID))
         else:
-            queryset = queryset.annotate(geom_transformed=Case(
-                When(geom_type='POINT', then=Transform(Buffer(F('geom'), F('species__radius'), 4), settings.API_SRID)),
-                When(geom_type='POLYGON', then=Transform(F('geom'), settings.API_SRID)),
-                When(geom_type='MULTIPOLYGON', then=Transform(F('geom'), settings.API_SRID)),
-            ))
+            queryset = queryset.annotate(geom_transformed=Transform(F('geom_buffered'), settings.API_SRID))
         # Ensure smaller areas are at the end of the list, ie above bigger areas on the map
         # to ensure we can select every area in case of overlapping
         # Second sort key pk is required for reliable pagination
-        queryset = queryset.annotate(area=Area('geom_transformed')).order_by('-area', 'pk')
+        queryset = queryset.order_by('-area', 'pk')
         return queryset
 
 
@@ -11,6 +11,7 @@ from geotrek.signage import models as signage_models
 class SignageViewSet(api_viewsets.GeotrekGeometricViewset):
     filter_backends = api_viewsets.GeotrekGeometricViewset.filter_backends + (api_filters.NearbyContentFilter, api_filters.UpdateOrCreateDateFilter)
     serializer_class = api_serializers.SignageSerializer
+    mvt_fields = ('name', 'type')
     queryset = signage_models.Signage.objects.existing() \
         .select_related('topo_object', 'type', ) \
         .annotate(geom3d_transformed=Transform(F('geom_3d'), settings.API_SRID)) \
@@ -12,6 +12,7 @@ from geotrek.api.v2 import filters as api_filters
 from geotrek.api.v2 import serializers as api_serializers
 from geotrek.api.v2 import viewsets as api_viewsets
 from geotrek.api.v2.functions import Length3D
+from geotrek.common.functions import simplified_geometry
 from geotrek.common.models import Attachment, AccessibilityAttachment
 from geotrek.api.v2.renderers import SVGProfileRenderer
 from geotrek.api.v2.utils import build_response_from_cache
@@ -31,6 +32,7 @@ class TrekViewSet(api_viewsets.GeotrekGeometricViewset):
         api_filters.GeotrekRatingsFilter
     )
     serializer_class = api_serializers.TrekSerializer
+    mvt_fields = ('name', 'practice')
 
     def get_queryset(self):
         activate(self.request.GET.get('language'))
@@ -43,7 +45,8 @@ class TrekViewSet(api_viewsets.GeotrekGeometricViewset):
                                        queryset=AccessibilityAttachment.objects.select_related('license')),
                               Prefetch('web_links',
                                        queryset=trekking_models.WebLink.objects.select_related('category'))) \
-            .annotate(geom3d_transformed=Transform(F('geom_3d'), settings.API_SRID),
+            .annotate(geom3d_transformed=Transform(simplified_geometry('geom_3d', self.request.GET.get('zoom')),
+                                                   settings.API_SRID),
                       length_3d_m=Length3D('geom_3d')) \
             .order_by("name")  # Required for reliable pagination
 
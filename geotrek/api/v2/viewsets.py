@@ -4,9 +4,13 @@ from rest_framework.authentication import BasicAuthentication, SessionAuthentica
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
 
 from django.conf import settings
+from django.http import Http404
 
-from geotrek.api.v2 import pagination as api_pagination, filters as api_filters
+from geotrek.api.v2 import pagination as api_pagination, filters as api_filters, tiles as api_tiles
+from geotrek.api.v2.renderers import MVTRenderer
 from geotrek.api.v2.serializers import override_serializer
+from geotrek.api.v2.utils import build_response_from_cache
+from geotrek.zoning.mixins import prefetch_zoning
 from mapentity.renderers import GeoJSONRenderer
 
 
@@ -28,6 +32,12 @@ class GeotrekViewSet(viewsets.ReadOnlyModelViewSet):
             'kwargs': self.kwargs
         }
 
+    def get_serializer(self, *args, **kwargs):
+        if kwargs.get('many') and args:
+            # Serializers only use cities of zoning properties
+            args = (prefetch_zoning(args[0], ('cities', )), ) + args[1:]
+        return super().get_serializer(*args, **kwargs)
+
 
 class GeotrekGeometricViewset(GeotrekViewSet):
     filter_backends = GeotrekViewSet.filter_backends + (
@@ -39,8 +49,24 @@ class GeotrekGeometricViewset(GeotrekViewSet):
     bbox_filter_field = 'geom'
     bbox_filter_include_overlapping = True
     renderer_classes = GeotrekViewSet.renderer_classes + [GeoJSONRenderer, ]
+    # Properties of features in vector tiles, no vector tiles endpoint if None
+    mvt_fields = None
+    mvt_geom_field = 'geom'
 
     def get_serializer_class(self):
         base_serializer_class = super().get_serializer_class()
         format_output = self.request.query_params.get('format', 'json')
         return override_serializer(format_output, base_serializer_class)
+
+    def mvt(self, request, z, x, y):
+        bounds = api_tiles.tile_bounds(z, x, y)
+        if self.mvt_fields is None or bounds is None:
+            raise Http404('No such tile.')
+        layer = self.basename
+        features = api_tiles.tile_features(self.filter_queryset(self.get_queryset()), bounds, self.mvt_geom_field)
+        cache_lookup = api_tiles.tile_cache_key(features, layer, z, x, y, request.GET.urlencode())
+        return build_response_from_cache(
+            cache_lookup,
+            lambda: api_tiles.render_tile(features, bounds, layer, self.mvt_geom_field, self.mvt_fields),
+            content_type=MVTRenderer.media_type
+        )
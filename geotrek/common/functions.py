@@ -1,5 +1,7 @@
-from django.contrib.gis.db.models import PointField
-from django.db.models import CharField, FloatField
+from django.conf import settings
+from django.contrib.gis.db.models import GeometryField, PointField
+from django.db.models import CharField, F, FloatField
+from django.db.models.functions import Coalesce
 from django.contrib.gis.db.models.functions import GeoFunc, GeomOutputGeoFunc
 
 
@@ -27,3 +29,31 @@ class DumpGeom(GeomOutputGeoFunc):
 class StartPoint(GeoFunc):
     """ ST_StartPoint postgis function """
     output_field = PointField()
+
+
+class Force2D(GeomOutputGeoFunc):
+    """ ST_Force2D postgis function """
+
+
+def simplified_level(zoom):
+    """ Level of detail of stored simplified geometries (``SIMPLIFIED_GEOMETRIES``) for a zoom level, if any """
+    try:
+        zoom = int(zoom)
+    except (TypeError, ValueError):
+        return None
+    for level in ('low', 'medium'):
+        if zoom <= settings.SIMPLIFIED_GEOMETRIES[level]['max_zoom']:
+            return level
+    return None
+
+
+def simplified_geometry(field, zoom, force_2d=False):
+    """
+    Stored simplified geometry (``geom_simplified_low`` or ``geom_simplified_medium``) for a zoom level,
+    or ``field`` at full resolution. Simplified geometries are missing for points, ``field`` is used instead.
+    """
+    level = simplified_level(zoom)
+    if level is None:
+        return F(field)
+    geom = Coalesce('geom_simplified_{}'.format(level), field, output_field=GeometryField(srid=settings.SRID))
+    return Force2D(geom) if force_2d else geom
@@ -1,5 +1,11 @@
+import hashlib
+import json
 import logging
+import os
 import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from zipfile import ZipFile, ZipInfo
 
 from django.conf import settings
 from landez import TilesManager
@@ -10,17 +16,87 @@ from geotrek.common import views
 
 logger = logging.getLogger(__name__)
 
+ZIP_MANIFEST_NAME = 'zip_manifest.json'
+
+
+class SyncZipFile(ZipFile):
+    """
+    Zip file written by sync commands. Entries already in zip are ignored.
+    SHA-256 of entries are computed while they are written, so that unchanged zips can be detected
+    by comparing ``manifest_hash`` with the one of previous sync, without reading previous zip.
+    """
+    def __init__(self, file, mode='w', **kwargs):
+        super().__init__(file, mode, **kwargs)
+        self.hashes = {}
+
+    def __contains__(self, arcname):
+        return arcname in self.hashes
+
+    def write(self, filename, arcname=None, compress_type=None):
+        zinfo = ZipInfo.from_file(filename, arcname)
+        if zinfo.filename in self.hashes:
+            return
+        zinfo.compress_type = self.compression if compress_type is None else compress_type
+        with open(filename, 'rb') as f:
+            self.writestr(zinfo, f.read())
+
+    def writestr(self, zinfo_or_arcname, data, compress_type=None):
+        name = zinfo_or_arcname.filename if isinstance(zinfo_or_arcname, ZipInfo) else zinfo_or_arcname
+        if name in self.hashes:
+            return
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.hashes[name] = hashlib.sha256(data).hexdigest()
+        super().writestr(zinfo_or_arcname, data, compress_type)
+
+    @property
+    def manifest_hash(self):
+        return hashlib.sha256(json.dumps(sorted(self.hashes.items())).encode()).hexdigest()
+
+
+def file_has_content(filename, content):
+    """ Compare content of a file with bytes, without reading file if sizes differ """
+    try:
+        if os.path.getsize(filename) != len(content):
+            return False
+        with open(filename, 'rb') as f:
+            return f.read() == content
+    except OSError:
+        return False
+
+
+def load_zip_hashes(root):
+    """ Manifest hashes of zips of a previous sync """
+    try:
+        with open(os.path.join(root, ZIP_MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {}
+
+
+def save_zip_hashes(root, hashes):
+    with open(os.path.join(root, ZIP_MANIFEST_NAME), 'w') as f:
+        json.dump(hashes, f)
+
 
 class ZipTilesBuilder:
-    def __init__(self, zipfile, prefix="", **builder_args):
+    """
+    Write tiles of covered areas into a zip file.
+    Tiles are downloaded in ``MOBILE_TILES_DOWNLOAD_WORKERS`` threads, through the disk cache of landez
+    (``tiles_dir``), which is shared by all builders and kept between synchronizations.
+    """
+    def __init__(self, zipfile, prefix="", workers=None, **builder_args):
         self.zipfile = zipfile
         self.prefix = prefix
+        self.workers = settings.MOBILE_TILES_DOWNLOAD_WORKERS if workers is None else workers
+        # Do not modify arguments, they are shared by builders of all treks
+        builder_args = dict(builder_args)
         builder_args['tile_format'] = self.format_from_url(builder_args['tiles_url'])
         self.tm = TilesManager(**builder_args)
 
         if not isinstance(settings.MOBILE_TILES_URL, str) and len(settings.MOBILE_TILES_URL) > 1:
             for url in settings.MOBILE_TILES_URL[1:]:
-                args = builder_args
+                args = dict(builder_args)
                 args['tiles_url'] = url
                 args['tile_format'] = self.format_from_url(args['tiles_url'])
                 self.tm.add_layer(TilesManager(**args), opacity=1)
@@ -41,16 +117,44 @@ class ZipTilesBuilder:
     def add_coverage(self, bbox, zoomlevels):
         self.tiles |= set(self.tm.tileslist(bbox, zoomlevels))
 
+    def get_tile(self, tile):
+        try:
+            return self.tm.tile(tile)
+        except DownloadError:
+            return None
+        except OSError:
+            # Cache folders may be created by several threads at the same time
+            try:
+                return self.tm.tile(tile)
+            except DownloadError:
+                return None
+
+    def fetch_tiles(self, tiles):
+        """ Returns (tile, data) of tiles, downloaded by a bounded number of threads """
+        if self.workers <= 1:
+            for tile in tiles:
+                yield tile, self.get_tile(tile)
+            return
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = deque()
+            for tile in tiles:
+                pending.append((tile, executor.submit(self.get_tile, tile)))
+                # Do not keep more downloaded tiles in memory than needed
+                if len(pending) >= self.workers * 4:
+                    tile, future = pending.popleft()
+                    yield tile, future.result()
+            while pending:
+                tile, future = pending.popleft()
+                yield tile, future.result()
+
     def run(self):
-        for tile in self.tiles:
+        for tile, data in self.fetch_tiles(sorted(self.tiles)):
             name = '{prefix}{0}/{1}/{2}{ext}'.format(
                 *tile,
                 prefix=self.prefix,
                 ext=settings.MOBILE_TILES_EXTENSION or self.tm._tile_extension
             )
-            try:
-                data = self.tm.tile(tile)
-            except DownloadError:
+            if data is None:
                 logger.warning("Failed to download tile %s" % name)
             else:
                 self.zipfile.writestr(name, data)
@@ -0,0 +1,38 @@
+import multiprocessing
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from geotrek.common.models import Attachment
+from geotrek.common.thumbnails import generate_thumbnails
+
+
+def generate_thumbnails_worker(pk):
+    """ Generate missing thumbnails of a picture in a worker process """
+    try:
+        attachment = Attachment.objects.get(pk=pk)
+    except Attachment.DoesNotExist:
+        return 0
+    return generate_thumbnails(attachment)
+
+
+class Command(BaseCommand):
+    help = "Generate missing thumbnails of pictures"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jobs', '-j', dest='jobs', type=int, default=multiprocessing.cpu_count(),
+                            help="Number of worker processes (default: number of CPUs)")
+
+    def handle(self, *args, **options):
+        pks = list(Attachment.objects.filter(is_image=True).exclude(attachment_file='')
+                   .order_by('pk').values_list('pk', flat=True))
+        if options['jobs'] > 1:
+            # Workers are forked and must open their own database connections
+            connections.close_all()
+            with multiprocessing.get_context('fork').Pool(options['jobs']) as pool:
+                counts = list(pool.imap_unordered(generate_thumbnails_worker, pks, chunksize=16))
+        else:
+            counts = [generate_thumbnails_worker(pk) for pk in pks]
+        if options['verbosity'] > 0:
+            self.stdout.write("{pictures} pictures: {thumbnails} thumbnails generated".format(
+                pictures=len(pks), thumbnails=sum(counts)))
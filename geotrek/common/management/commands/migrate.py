@@ -26,6 +26,7 @@ class Command(BaseCommand):
         super().handle(*args, **options)
         call_command('sync_translation_fields', '--noinput')
         call_command('update_translation_fields')
+        call_command('rebuild_search_index', '--missing', verbosity=0)
         for app in apps.get_app_configs():
             move_models_to_schemas(app)
             load_sql_files(app, 'post')
@@ -0,0 +1,38 @@
+from itertools import islice
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+
+from geotrek.common.models import SearchEntry
+from geotrek.common.search import index_objects, indexed_models
+
+
+class Command(BaseCommand):
+    help = "Rebuild full-text search vectors used by API v2 q parameter"
+    chunk_size = 500
+
+    def add_arguments(self, parser):
+        parser.add_argument('--missing', action='store_true', default=False,
+                            help="Only index objects without search vectors")
+
+    def handle(self, *args, **options):
+        for model in indexed_models():
+            content_type = ContentType.objects.get_for_model(model)
+            objects = model._base_manager.all()
+            if options['missing']:
+                entries = SearchEntry.objects.filter(content_type=content_type)
+                # Remove vectors of objects deleted without their model delete() method
+                entries.exclude(object_id__in=objects.values('pk')).delete()
+                objects = objects.exclude(pk__in=entries.values('object_id'))
+            else:
+                SearchEntry.objects.filter(content_type=content_type).delete()
+            count = 0
+            iterator = objects.iterator(chunk_size=self.chunk_size)
+            while True:
+                chunk = list(islice(iterator, self.chunk_size))
+                if not chunk:
+                    break
+                index_objects(chunk)
+                count += len(chunk)
+            if options['verbosity'] > 0:
+                self.stdout.write("{model}: {count} objects indexed".format(model=model._meta.verbose_name, count=count))
@@ -1,23 +1,27 @@
 import argparse
+import hashlib
+import json
 import logging
-import filecmp
+import multiprocessing
 import os
 import stat
 import shutil
 import tempfile
 from time import sleep
-from zipfile import ZipFile
 
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
 from django.core.management.base import BaseCommand, CommandError
-from django.db.models import Q
+from django.db import connections
+from django.contrib.gis.db.models import GeometryField
+from django.db.models import Count, Max, Min, Q
 from django.http import StreamingHttpResponse
 from django.test.client import RequestFactory
 from django.utils import translation
 from django.utils.translation import gettext as _
 
 from geotrek.common.models import FileType  # NOQA
+from geotrek.altimetry.models import Dem
 from geotrek.altimetry.views import ElevationProfile, ElevationArea, serve_elevation_chart
 from geotrek.common import models as common_models
 
@@ -48,8 +52,57 @@ from geotrek.tourism import urls  # NOQA
 
 logger = logging.getLogger(__name__)
 
+MANIFEST_NAME = 'sync_manifest.json'
+
+
+class ZipEntries:
+    """ Record files to add to a zip, with the same interface as ``SyncZipFile`` """
+    def __init__(self):
+        self.entries = []
+
+    def __contains__(self, arcname):
+        return arcname in self.namelist()
+
+    def namelist(self):
+        return [arcname for filename, arcname in self.entries]
+
+    def write(self, filename, arcname):
+        if arcname not in self:
+            self.entries.append((filename, arcname))
+
+    def writestr(self, arcname, data):
+        # Content has been written into the file of the same name
+        self.write(None, arcname)
+
+
+_worker_command = None
+
+
+def init_worker(command):
+    """ Initialize a worker process of ``--jobs`` option """
+    global _worker_command
+    _worker_command = command
+
+
+def sync_detail_worker(unit):
+    """
+    Call ``sync_detail()`` of a subcommand for one object in a worker process.
+    Written files and files to add to the global zip are returned to the main process.
+    """
+    subcommand_class, model, pk, lang = unit
+    command = _worker_command
+    translation.activate(lang)
+    result = command.sync_detail_unit(subcommand_class(command), lang, model.objects.get(pk=pk))
+    translation.deactivate()
+    return result
+
 
 class Command(BaseCommand):
+    pool = None
+    incremental = False
+    written = None
+    renders_avoided = 0
+
     def add_arguments(self, parser):
         parser.add_argument('path')
         parser.add_argument('--empty-tmp-folder', dest='empty_tmp_folder', action='store_true', default=False,
@@ -79,12 +132,163 @@ class Command(BaseCommand):
                             default=False, help='include infrastructures')
         parser.add_argument('--with-dives', action='store_true', dest='with_dives',
                             default=False, help='include dives')
+        parser.add_argument('--jobs', '-j', dest='jobs', type=int, default=1,
+                            help='Number of processes used to sync treks and dives details')
+        parser.add_argument('--incremental', '-I', action='store_true', dest='incremental', default=False,
+                            help='Only sync treks and dives details whose data changed since last sync')
         parser.add_argument('--task', default=None, help=argparse.SUPPRESS)
 
     def mkdirs(self, name):
         dirname = os.path.dirname(name)
-        if not os.path.exists(dirname):
-            os.makedirs(dirname)
+        os.makedirs(dirname, exist_ok=True)
+
+    def link(self, src, dst):
+        """ Hard link ``src`` to ``dst``, replacing it atomically if it exists """
+        tmpname = '{}.{}.tmp'.format(dst, os.getpid())
+        os.link(src, tmpname)
+        os.replace(tmpname, dst)
+
+    def record(self, name):
+        """ Record a file written for the current object, in order to reuse it with ``--incremental`` option """
+        if self.written is not None:
+            self.written.append(name)
+
+    def stamp(self, objects):
+        """
+        List primary keys and update dates of objects, to compute signatures.
+        Objects without update date (practices, themes, cities...) are described by their fields and pictogram.
+        """
+        return [self.stamp_object(obj) for obj in objects if obj is not None]
+
+    def stamp_object(self, obj):
+        date_update = getattr(obj, 'date_update', None)
+        if date_update is not None:
+            return obj.pk, date_update
+        values = [getattr(obj, field.attname) for field in obj._meta.concrete_fields
+                  if not isinstance(field, GeometryField)]
+        pictogram = getattr(obj, 'pictogram', None)
+        if pictogram:
+            values.append(self.media_signature(pictogram.name))
+        return values
+
+    def media_signature(self, name):
+        """ Size and modification date of a media file, computed once per run """
+        if name not in self.media_signatures:
+            try:
+                st = os.stat(os.path.join(settings.MEDIA_ROOT, name))
+                self.media_signatures[name] = (st.st_size, st.st_mtime)
+            except OSError:
+                self.media_signatures[name] = None
+        return self.media_signatures[name]
+
+    def dem_signature(self):
+        """ Tiles of DEM, which get new ids when it is loaded again, computed once per run """
+        if self.dem_state is None:
+            self.dem_state = Dem.objects.aggregate(count=Count('pk'), first=Min('pk'), last=Max('pk'))
+        return self.dem_state
+
+    def file_signature(self, name):
+        """ Hash of a file already synced during this run, or None if it does not exist """
+        fullname = os.path.join(self.tmp_root, name)
+        if not os.path.isfile(fullname):
+            return None
+        with open(fullname, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def unit_signature(self, lang, subcommand, obj):
+        """ Hash of everything the files of an object depend on, or None if the subcommand does not provide it """
+        if not hasattr(subcommand, 'signature'):
+            return None
+        values = subcommand.signature(lang, obj)
+        return hashlib.sha256(json.dumps(values, default=str, sort_keys=True).encode()).hexdigest()
+
+    def options_signature(self):
+        keys = ('url', 'rando_url', 'source', 'portal', 'skip_pdf', 'skip_dem', 'skip_profile_png', 'with_events',
+                'content_categories', 'with_signages', 'with_infrastructures', 'with_dives')
+        return {key: self.options.get(key) for key in keys}
+
+    def load_manifest(self):
+        """ Read objects synced by previous run, ignored if it was run with other options """
+        try:
+            with open(os.path.join(self.dst_root, MANIFEST_NAME)) as f:
+                manifest = json.load(f)
+        except (IOError, ValueError):
+            return {}
+        if manifest.get('options') != self.options_signature():
+            return {}
+        return manifest.get('units', {})
+
+    def save_manifest(self):
+        with open(os.path.join(self.tmp_root, MANIFEST_NAME), 'w') as f:
+            json.dump({'options': self.options_signature(), 'units': self.new_manifest}, f)
+
+    def reuse_unit(self, unit):
+        """ Link files of an unchanged object from previous sync. Return False if some of them are missing. """
+        for name in unit['files']:
+            if not os.path.isfile(os.path.join(self.dst_root, name)):
+                return False
+        for name in unit['files']:
+            fullname = os.path.join(self.tmp_root, name)
+            # Global files may already have been synced during this run
+            if not os.path.exists(fullname):
+                self.mkdirs(fullname)
+                self.link(os.path.join(self.dst_root, name), fullname)
+        for arcname in unit['zip']:
+            self.zipfile.write(os.path.join(self.tmp_root, arcname), arcname)
+        for name in unit['files']:
+            if name in self.old_zip_hashes:
+                self.zip_hashes[name] = self.old_zip_hashes[name]
+        return True
+
+    def sync_detail_unit(self, subcommand, lang, obj):
+        """
+        Call ``subcommand.sync_detail()`` for one object.
+        Return success, written files, files to add to the global zip and manifest hashes of closed zips.
+        """
+        successfull, zipfile, zip_hashes = self.successfull, self.zipfile, self.zip_hashes
+        self.successfull, self.zipfile, self.written, self.zip_hashes = True, ZipEntries(), [], {}
+        try:
+            subcommand.sync_detail(lang, obj)
+            return self.successfull, self.written, self.zipfile.namelist(), self.zip_hashes
+        finally:
+            self.successfull, self.zipfile, self.written, self.zip_hashes = successfull, zipfile, None, zip_hashes
+
+    def sync_details(self, lang, subcommand, objects):
+        """
+        Call ``subcommand.sync_detail()`` for each object, in worker processes if ``--jobs`` is greater than 1.
+        With ``--incremental`` option, objects whose signature did not change since previous sync are skipped
+        and their files are reused.
+        Return the number of objects.
+        """
+        units = []
+        reused = 0
+        for obj in objects:
+            key = '{lang}/{model}/{pk}'.format(lang=lang, model=obj._meta.model_name, pk=obj.pk)
+            signature = None
+            if self.incremental:
+                signature = self.unit_signature(lang, subcommand, obj)
+                unit = self.manifest.get(key)
+                if signature and unit and unit['signature'] == signature and self.reuse_unit(unit):
+                    self.new_manifest[key] = unit
+                    self.unchanged += 1
+                    reused += 1
+                    if self.verbosity == 2:
+                        self.stdout.write("{lang} {key} unchanged".format(lang=lang, key=key))
+                    continue
+            units.append((key, signature, obj))
+        if self.pool is None:
+            results = (self.sync_detail_unit(subcommand, lang, obj) for key, signature, obj in units)
+        else:
+            results = self.pool.imap(sync_detail_worker,
+                                     [(type(subcommand), type(obj), obj.pk, lang) for key, signature, obj in units])
+        for (key, signature, obj), (successfull, written, arcnames, zip_hashes) in zip(units, results):
+            self.successfull = self.successfull and successfull
+            self.zip_hashes.update(zip_hashes)
+            for arcname in arcnames:
+                self.zipfile.write(os.path.join(self.tmp_root, arcname), arcname)
+            if signature and successfull:
+                self.new_manifest[key] = {'signature': signature, 'files': written, 'zip': arcnames}
+        return len(units) + reused
 
     def get_params_portal(self, params):
         if self.portal:
@@ -107,7 +311,7 @@ class Command(BaseCommand):
         logger.info("Build global tiles file...")
         self.mkdirs(global_file)
 
-        zipfile = ZipFile(global_file, 'w')
+        zipfile = common_sync.SyncZipFile(global_file, 'w')
         tiles = common_sync.ZipTilesBuilder(zipfile, **self.builder_args)
         tiles.add_coverage(bbox=global_extent,
                            zoomlevels=settings.MOBILE_TILES_GLOBAL_ZOOMS)
@@ -131,7 +335,7 @@ class Command(BaseCommand):
 
         self.mkdirs(trek_file)
 
-        zipfile = ZipFile(trek_file, 'w')
+        zipfile = common_sync.SyncZipFile(trek_file, 'w')
         tiles = common_sync.ZipTilesBuilder(zipfile, **self.builder_args)
 
         geom = trek.geom
@@ -173,7 +377,6 @@ class Command(BaseCommand):
             if self.verbosity > 0:
                 self.stderr.write(self.style.ERROR("failed (HTTP {code})".format(code=response.status_code)))
             return
-        f = open(fullname, 'wb')
         if isinstance(response, StreamingHttpResponse):
             content = b''.join(response.streaming_content)
         else:
@@ -182,22 +385,24 @@ class Command(BaseCommand):
         if fix2028:
             content = content.replace(b'\\u2028', b'\\n')
             content = content.replace(b'\\u2029', b'\\n')
-        f.write(content)
-        f.close()
         oldfilename = os.path.join(self.dst_root, name)
         # If new file is identical to old one, don't recreate it. This will help backup
-        if os.path.isfile(oldfilename) and filecmp.cmp(fullname, oldfilename):
-            os.unlink(fullname)
-            os.link(oldfilename, fullname)
+        if common_sync.file_has_content(oldfilename, content):
+            self.link(oldfilename, fullname)
             if self.verbosity == 2:
                 self.stdout.write("unchanged")
         else:
+            # Write into a temporary file renamed afterwards, so that workers never see partial files
+            tmpname = '{}.{}.tmp'.format(fullname, os.getpid())
+            with open(tmpname, 'wb') as f:
+                f.write(content)
+            os.replace(tmpname, fullname)
             if self.verbosity == 2:
                 self.stdout.write("generated")
-        # FixMe: Find why there are duplicate files.
-        if zipfile:
-            if name not in zipfile.namelist():
-                zipfile.write(fullname, name)
+        self.record(name)
+        # Add content to zip from memory, without reading written file again
+        if zipfile is not None:
+            zipfile.writestr(name, content)
 
     def sync_json(self, lang, viewset, name, zipfile=None, params={}, as_view_args=[], **kwargs):
         view = viewset.as_view(*as_view_args)
@@ -264,7 +469,8 @@ class Command(BaseCommand):
                 self.stdout.write("\x1b[36m{lang}\x1b[0m \x1b[1m{url}/{name}\x1b[0m \x1b[31mfile does not exist\x1b[0m".format(lang=lang, url=url, name=name))
             return
         if not os.path.isfile(dst):
-            os.link(src, dst)
+            self.link(src, dst)
+        self.record(os.path.join(url, name))
         if zipfile:
             zipfile.write(dst, os.path.join(url, name))
         if self.verbosity == 2:
@@ -285,20 +491,15 @@ class Command(BaseCommand):
     def close_zip(self, zipfile, name):
         oldzipfilename = os.path.join(self.dst_root, name)
         zipfilename = os.path.join(self.tmp_root, name)
-        try:
-            oldzipfile = ZipFile(oldzipfilename, 'r')
-        except IOError:
-            uptodate = False
-        else:
-            old = set([(zi.filename, zi.CRC) for zi in oldzipfile.infolist()])
-            new = set([(zi.filename, zi.CRC) for zi in zipfile.infolist()])
-            uptodate = (old == new)
-            oldzipfile.close()
+        manifest_hash = zipfile.manifest_hash
+        uptodate = self.old_zip_hashes.get(name) == manifest_hash and os.path.isfile(oldzipfilename)
 
         zipfile.close()
+        self.zip_hashes[name] = manifest_hash
+        self.record(name)
         if uptodate:
-            stat = os.stat(oldzipfilename)
-            os.utime(zipfilename, (stat.st_atime, stat.st_mtime))
+            # Keep previous zip, which has the same entries
+            self.link(oldzipfilename, zipfilename)
 
         if self.verbosity == 2:
             if uptodate:
@@ -367,10 +568,11 @@ class Command(BaseCommand):
             path = attachments[0].attachment_file.name
             modelname = obj._meta.model_name
             src = os.path.join(settings.MEDIA_ROOT, path)
-            dst = os.path.join(self.tmp_root, 'api', lang, '{modelname}s'.format(modelname=modelname), str(obj.pk),
-                               obj.slug + '.pdf')
+            name = os.path.join('api', lang, '{modelname}s'.format(modelname=modelname), str(obj.pk), obj.slug + '.pdf')
+            dst = os.path.join(self.tmp_root, name)
             self.mkdirs(dst)
             os.link(src, dst)
+            self.record(name)
             if self.verbosity == 2:
                 self.stdout.write("\x1b[36m{lang}\x1b[0m \x1b[1m{dst}\x1b[0m \x1b[32mcopied\x1b[0m".format(lang=lang,
                                                                                                            dst=dst))
@@ -381,9 +583,22 @@ class Command(BaseCommand):
             if self.source:
                 params['source'] = self.source[0]
             self.get_params_portal(params)
-            self.sync_object_view(lang, obj, view, '{obj.slug}.pdf', params=params, slug=obj.slug)
+            self.sync_object_view(lang, obj, view, '{obj.slug}.pdf', params=params, slug=obj.slug, from_command=True)
 
     def sync(self):
+        if self.jobs > 1:
+            # Workers are forked and must open their own database connections
+            connections.close_all()
+            self.pool = multiprocessing.get_context('fork').Pool(self.jobs, initializer=init_worker,
+                                                                 initargs=(self, ))
+        try:
+            self.sync_all()
+        finally:
+            if self.pool is not None:
+                self.pool.close()
+                self.pool.join()
+
+    def sync_all(self):
         step_value = int(50 / len(settings.MODELTRANSLATION_LANGUAGES))
         current_value = 30
         self.sync_tiles()
@@ -419,7 +634,7 @@ class Command(BaseCommand):
                 zipname = os.path.join('zip', 'treks', lang, 'global.zip')
                 zipfullname = os.path.join(self.tmp_root, zipname)
                 self.mkdirs(zipfullname)
-                self.zipfile = ZipFile(zipfullname, 'w')
+                self.zipfile = common_sync.SyncZipFile(zipfullname, 'w')
 
                 translation.activate(lang)
                 subcommand.sync(lang)
@@ -438,7 +653,8 @@ class Command(BaseCommand):
         if not os.path.exists(self.dst_root):
             return
         existing = set([os.path.basename(p) for p in os.listdir(self.dst_root)])
-        remaining = existing - set(('api', 'media', 'meta', 'static', 'zip'))
+        remaining = existing - set(('api', 'media', 'meta', 'static', 'zip', MANIFEST_NAME,
+                                    common_sync.ZIP_MANIFEST_NAME))
         if remaining:
             raise CommandError("Destination directory contains extra data")
 
@@ -491,6 +707,15 @@ class Command(BaseCommand):
         self.with_infrastructures = options.get('with_infrastructures', False)
         self.with_dives = options.get('with_dives', False)
         self.celery_task = options.get('task', None)
+        self.jobs = options['jobs']
+        self.incremental = options['incremental']
+        self.manifest = self.load_manifest() if self.incremental else {}
+        self.new_manifest = {}
+        self.media_signatures = {}
+        self.dem_state = None
+        self.old_zip_hashes = common_sync.load_zip_hashes(self.dst_root)
+        self.zip_hashes = {}
+        self.unchanged = 0
 
         if self.source is not None:
             self.source = self.source.split(',')
@@ -527,8 +752,16 @@ class Command(BaseCommand):
                         'infos': "{}".format(_("Sync ended"))
                     }
                 )
+            if self.incremental:
+                self.save_manifest()
+            common_sync.save_zip_hashes(self.tmp_root, self.zip_hashes)
             self.rename_root()
 
+        if self.incremental and self.verbosity >= 1:
+            self.stdout.write("{count} unchanged objects reused".format(count=self.unchanged))
+        if self.verbosity >= 1:
+            self.stdout.write("{count} renders of global files avoided".format(count=self.renders_avoided))
+
         done_message = 'Done'
         if self.successfull:
             done_message = self.style.SUCCESS(done_message)
@@ -2,6 +2,8 @@ from django.contrib.gis.db.models.functions import Transform
 from mapentity.settings import API_SRID
 from rest_framework import viewsets, permissions
 
+from geotrek.zoning.mixins import prefetch_zoning
+
 
 class APIViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.DjangoModelPermissionsOrAnonReadOnly]
@@ -15,3 +17,9 @@ class APIViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         return super().get_queryset().annotate(api_geom=Transform("geom", API_SRID))
+
+    def get_serializer(self, *args, **kwargs):
+        if kwargs.get('many') and args:
+            # Avoid one spatial query per object and zoning layer
+            args = (prefetch_zoning(args[0]), ) + args[1:]
+        return super().get_serializer(*args, **kwargs)
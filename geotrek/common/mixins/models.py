@@ -1,5 +1,4 @@
 import datetime
-import hashlib
 import os
 import shutil
 
@@ -19,6 +18,7 @@ from easy_thumbnails.files import get_thumbnailer
 from embed_video.backends import detect_backend, VideoDoesntExistException
 
 from geotrek.common.mixins.managers import NoDeleteManager
+from geotrek.common.thumbnails import watermark_options
 from geotrek.common.utils import classproperty, logger
 
 
@@ -118,17 +118,7 @@ class PicturesMixin:
         for picture in self.pictures:
             thumbnailer = get_thumbnailer(picture.attachment_file)
             try:
-                # Uppercase options aren't used by prepared options (a primary
-                # use of prepared options is to generate the filename -- these
-                # options don't alter the filename).
-                text = settings.THUMBNAIL_COPYRIGHT_FORMAT.format(author=picture.author, title=picture.title,
-                                                                  legend=picture.legend)
-                ali = thumbnailer.get_options({'size': (800, 800),
-                                               'TEXT': text,
-                                               'SIZE_WATERMARK': settings.THUMBNAIL_COPYRIGHT_SIZE,
-                                               'watermark': hashlib.md5(text.encode('utf-8')).hexdigest()
-                                               })
-
+                ali = thumbnailer.get_options(watermark_options(picture))
                 thdetail = thumbnailer.get_thumbnail(ali)
             except (IOError, InvalidImageFormatError, DecompressionBombError) as e:
                 logger.info(_("Image {} invalid or missing from disk: {}.").format(picture.attachment_file, e))
@@ -251,11 +241,14 @@ class BasePublishableMixin(models.Model):
         abstract = True
 
     def save(self, *args, **kwargs):
+        self.update_publication_date()
+        super().save(*args, **kwargs)
+
+    def update_publication_date(self):
         if self.publication_date is None and self.any_published:
             self.publication_date = datetime.date.today()
         if self.publication_date is not None and not self.any_published:
             self.publication_date = None
-        super().save(*args, **kwargs)
 
     @property
     def any_published(self):
@@ -416,3 +409,22 @@ class AddPropertyMixin:
             raise AttributeError("%s has already an attribute %s" % (cls, name))
         setattr(cls, name, property(func))
         setattr(cls, '%s_verbose_name' % name, verbose_name)
+
+
+class SearchIndexMixin:
+    """ Update full-text search vectors of ``search_fields`` (name, weight) when saved, see ``geotrek.common.search`` """
+    search_fields = (('name', 'A'), )
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from geotrek.common.search import index_object
+        index_object(self)
+
+    def delete(self, *args, **kwargs):
+        pk = self.pk
+        result = super().delete(*args, **kwargs)
+        # pk is reset only if object was really deleted (not just flagged as deleted)
+        if self.pk is None:
+            from geotrek.common.search import unindex_objects
+            unindex_objects(type(self), [pk])
+        return result
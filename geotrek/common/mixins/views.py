@@ -1,3 +1,4 @@
+import hashlib
 import os
 from io import BytesIO
 from urllib.parse import urljoin
@@ -201,7 +202,7 @@ class DocumentPublicMixin:
     def dispatch(self, *args, **kwargs):
         return super(mapentity_views.MapEntityDocumentBase, self).dispatch(*args, **kwargs)
 
-    def get(self, request, pk, slug, lang=None):
+    def get(self, request, pk, slug, lang=None, from_command=False):
         obj = get_object_or_404(self.model, pk=pk)
         try:
             file_type = FileType.objects.get(type="Topoguide")
@@ -214,7 +215,7 @@ class DocumentPublicMixin:
             return HttpResponseNotFound("No attached file with 'Topoguide' type.")
         path = attachments[0].attachment_file.name
 
-        if settings.DEBUG:
+        if settings.DEBUG or from_command:
             response = static.serve(self.request, path, settings.MEDIA_ROOT)
         else:
             response = HttpResponse()
@@ -230,6 +231,59 @@ class DocumentPublicMixin:
         return context
 
 
+class DocumentPublicCacheMixin:
+    """
+    Store rendered public documents in ``MEDIA_ROOT/documents``, and serve stored copies with sendfile
+    until the object or objects displayed in documents change (see ``get_document_signature()``)
+    """
+    document_params = ('portal', 'source')
+
+    def get_document_signature(self, obj):
+        """ Values which change when the document has to be rendered again """
+        return [obj.pk, obj.date_update]
+
+    def get_document_path(self, obj, language):
+        params = [(name, self.request.GET.get(name)) for name in self.document_params]
+        basename = '{suffix}-{language}-{params}'.format(
+            suffix=self.template_name_suffix, language=language,
+            params=hashlib.md5(repr(params).encode()).hexdigest()[:8])
+        signature = hashlib.md5(repr(self.get_document_signature(obj)).encode()).hexdigest()
+        folder = os.path.join(settings.MEDIA_ROOT, 'documents', obj._meta.model_name, str(obj.pk))
+        return folder, basename, '{}-{}.pdf'.format(basename, signature)
+
+    def store_document(self, folder, basename, filename, content):
+        os.makedirs(folder, exist_ok=True)
+        # Write into a temporary file renamed afterwards, so that other processes never serve partial files
+        tmpname = os.path.join(folder, '{}.{}.tmp'.format(filename, os.getpid()))
+        with open(tmpname, 'wb') as f:
+            f.write(content)
+        os.rename(tmpname, os.path.join(folder, filename))
+        # Remove outdated versions of document
+        for name in os.listdir(folder):
+            if name.startswith(basename + '-') and name.endswith('.pdf') and name != filename:
+                os.remove(os.path.join(folder, name))
+
+    def get(self, request, pk, slug, lang=None, from_command=False):
+        obj = self.get_object()
+        folder, basename, filename = self.get_document_path(obj, request.LANGUAGE_CODE)
+        if not os.path.exists(os.path.join(folder, filename)):
+            response = super().get(request, pk, slug, lang)
+            if not hasattr(response, 'render') or response.status_code != 200:
+                # External document (Topoguide attachment) or error
+                return response
+            response.render()
+            self.store_document(folder, basename, filename, response.content)
+        path = os.path.relpath(os.path.join(folder, filename), settings.MEDIA_ROOT)
+        if settings.DEBUG or from_command:
+            response = static.serve(self.request, path, settings.MEDIA_ROOT)
+        else:
+            response = HttpResponse()
+            response[settings.MAPENTITY_CONFIG['SENDFILE_HTTP_HEADER']] = os.path.join(settings.MEDIA_URL_SECURE, path)
+        response["Content-Type"] = 'application/pdf'
+        response['Content-Disposition'] = "attachment; filename={0}.pdf".format(slug)
+        return response
+
+
 class CompletenessMixin:
     """Mixin for completeness fields"""
 
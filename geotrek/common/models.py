@@ -6,7 +6,9 @@ from PIL import Image
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
 from django.db.models import Q
 from django.template.defaultfilters import slugify
 from django.utils.translation import gettext_lazy as _
@@ -14,6 +16,7 @@ from paperclip.models import Attachment as BaseAttachment, FileType as BaseFileT
 
 from geotrek.authent.models import StructureOrNoneRelated
 from geotrek.common.mixins.models import OptionalPictogramMixin, PictogramMixin
+from geotrek.common.utils import logger
 
 
 class AccessibilityAttachmentManager(models.Manager):
@@ -139,6 +142,45 @@ class FileType(StructureOrNoneRelated, BaseFileType):
 class Attachment(BaseAttachment):
     creation_date = models.DateField(verbose_name=_("Creation Date"), null=True, blank=True)
     uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    # Set by parsers, to store identical files only once
+    sha256 = models.CharField(max_length=64, blank=True, default='', db_index=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.queue_thumbnails()
+
+    def queue_thumbnails(self):
+        """ Pre-generate thumbnails once saved attachment is committed, also called for attachments created in bulk """
+        if settings.THUMBNAIL_PREGENERATE and self.is_image and self.attachment_file:
+            transaction.on_commit(self.pregenerate_thumbnails)
+
+    def pregenerate_thumbnails(self):
+        from geotrek.common.tasks import generate_attachment_thumbnails
+        try:
+            generate_attachment_thumbnails.delay(self.pk)
+        except Exception as e:
+            # Thumbnails will be generated on first access
+            logger.warning("Cannot pre-generate thumbnails of {}: {}".format(self.attachment_file, e))
+
+
+class ImportedFile(models.Model):
+    """ Remote file downloaded by parsers, to send conditional requests when it is imported again """
+    url = models.TextField(unique=True)
+    etag = models.CharField(max_length=256, blank=True, default='')
+    last_modified = models.CharField(max_length=64, blank=True, default='')
+    sha256 = models.CharField(max_length=64)
+
+    class Meta:
+        default_permissions = ()
+
+    @property
+    def conditional_headers(self):
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
 
 
 class Theme(PictogramMixin):
@@ -270,3 +312,18 @@ class RatingMixin(OptionalPictogramMixin, models.Model):
 
     class Meta:
         abstract = True
+
+
+class SearchEntry(models.Model):
+    """ Full-text search vector of an object in a language, see ``geotrek.common.search`` """
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    language = models.CharField(max_length=10)
+    vector = SearchVectorField()
+
+    class Meta:
+        unique_together = (('content_type', 'object_id', 'language'), )
+        indexes = [
+            GinIndex(name='searchentry_vector_gin_idx', fields=['vector']),
+        ]
+        default_permissions = ()
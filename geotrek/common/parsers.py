@@ -1,4 +1,4 @@
-from io import BytesIO
+import hashlib
 import importlib
 import json
 import os
@@ -7,10 +7,15 @@ import requests
 import logging
 from requests.auth import HTTPBasicAuth
 import textwrap
+import uuid
 import xlrd
 import xml.etree.ElementTree as ET
 from functools import reduce
-from collections import Iterable
+from collections import Iterable, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice, zip_longest
+from tempfile import NamedTemporaryFile
+from threading import BoundedSemaphore, Lock
 from time import sleep
 from PIL import Image, UnidentifiedImageError
 
@@ -19,22 +24,28 @@ from os.path import dirname
 from urllib.parse import urlparse
 
 from django.contrib.gis.geos import GEOSGeometry, WKBWriter
-from django.db import models, connection
+from django.db import models, connection, transaction
+from django.db.models.constants import LOOKUP_SEP
 from django.db.utils import DatabaseError
 from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
 from django.contrib.gis.gdal import DataSource, GDALException, CoordTransform
 from django.contrib.gis.geos import Point, Polygon
 from django.core.exceptions import ImproperlyConfigured
-from django.core.files.base import ContentFile
+from django.core.files.base import ContentFile, File
 from django.template.loader import render_to_string
-from django.utils import translation
+from django.utils import timezone, translation
 from django.utils.translation import gettext as _
 from django.utils.encoding import force_str
+from django.utils.text import get_valid_filename
 from django.conf import settings
+from modeltranslation.utils import build_localized_fieldname
 from paperclip.models import attachment_upload
 
 from geotrek.authent.models import default_structure
-from geotrek.common.models import FileType, Attachment, License
+from geotrek.common.mixins.models import SearchIndexMixin
+from geotrek.common.models import FileType, Attachment, ImportedFile, License
+from geotrek.common.search import index_objects
 from geotrek.common.utils.translation import get_translated_fields
 
 
@@ -43,6 +54,9 @@ if 'modeltranslation' in settings.INSTALLED_APPS:
 
 logger = logging.getLogger(__name__)
 
+# Parsers run in threads (see GeotrekAggregatorParser) create related objects (categories...) one at a time
+create_lock = Lock()
+
 
 class ImportError(Exception):
     pass
@@ -64,10 +78,88 @@ class DownloadImportError(ImportError):
     pass
 
 
+def file_sha256(f):
+    """Hash of content of a django File, read by chunks"""
+    sha256 = hashlib.sha256()
+    for chunk in f.chunks():
+        sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class TemporaryPkSet:
+    """
+    Set of primary keys of a queryset, stored in a temporary table instead of memory.
+    Discarded keys are removed from the table by batches.
+    """
+    def __init__(self, queryset, batch_size=10000):
+        self.batch_size = batch_size
+        self.table = 'parser_pks_{}'.format(uuid.uuid4().hex)
+        self.discarded = set()
+        self.count = None
+        sql, params = queryset.values('pk').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TEMPORARY TABLE {table} (pk integer PRIMARY KEY)'.format(table=self.table))
+            cursor.execute('INSERT INTO {table} {sql}'.format(table=self.table, sql=sql), params)
+
+    def discard(self, pk):
+        if self.count is not None or pk is None:
+            return
+        self.discarded.add(pk)
+        if len(self.discarded) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.discarded and self.count is None:
+            with connection.cursor() as cursor:
+                cursor.execute('DELETE FROM {table} WHERE pk = ANY(%s)'.format(table=self.table), [list(self.discarded)])
+        self.discarded = set()
+
+    def __len__(self):
+        if self.count is not None:
+            return self.count
+        self.flush()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM {table}'.format(table=self.table))
+            return cursor.fetchone()[0]
+
+    def batches(self):
+        """Returns lists of batch_size primary keys"""
+        self.flush()
+        last = None
+        while True:
+            with connection.cursor() as cursor:
+                if last is None:
+                    cursor.execute('SELECT pk FROM {table} ORDER BY pk LIMIT %s'.format(table=self.table),
+                                   [self.batch_size])
+                else:
+                    cursor.execute('SELECT pk FROM {table} WHERE pk > %s ORDER BY pk LIMIT %s'.format(table=self.table),
+                                   [last, self.batch_size])
+                pks = [row[0] for row in cursor.fetchall()]
+            if not pks:
+                return
+            yield pks
+            last = pks[-1]
+
+    def __iter__(self):
+        for pks in self.batches():
+            yield from pks
+
+    def close(self):
+        """Drop table, only keep the number of primary keys"""
+        if self.count is None:
+            self.count = len(self)
+            with connection.cursor() as cursor:
+                cursor.execute('DROP TABLE IF EXISTS {table}'.format(table=self.table))
+
+
 class Parser:
     """
     provider: Allow to differentiate multiple Parser for the same model
     default_language: Allow to define which language this parser will populate by default
+    bulk: Parse rows by chunks of bulk_size rows, with a few queries per chunk instead of several queries per row.
+          Objects are created and updated without calling their save() method.
+    streaming: For big sources, keep objects to delete in a temporary table instead of memory,
+               and report progress every streaming_batch_size rows
     """
     label = None
     model = None
@@ -91,6 +183,10 @@ class Parser:
     natural_keys = {}
     field_options = {}
     default_language = None
+    bulk = False
+    bulk_size = 1000
+    streaming = False
+    streaming_batch_size = 10000
 
     def __init__(self, progress_cb=None, user=None, encoding='utf8'):
         self.warnings = {}
@@ -104,6 +200,14 @@ class Parser:
         self.structure = user and user.profile.structure or default_structure()
         self.encoding = encoding
         self.translated_fields = get_translated_fields(self.model)
+        self.existing = {}
+        self.related = {}
+        self.pending = []
+        self.pending_m2m = {}
+
+        if self.bulk and self.model._meta.parents:
+            raise ImproperlyConfigured("Bulk mode is not available for {model}, "
+                                       "which inherits from another model".format(model=self.model.__name__))
 
         if self.fields is None:
             self.fields = {
@@ -201,7 +305,9 @@ class Parser:
             raise RowImportError(_("Blank value not allowed for field '{src}'".format(src=src)))
         if isinstance(field, models.CharField):
             val = str(val)[:256]
-        if isinstance(field, models.ManyToManyField):
+        if isinstance(field, models.ManyToManyField) and self.bulk:
+            self.pending_m2m.setdefault(dst, {})[self.obj] = val
+        elif isinstance(field, models.ManyToManyField):
             fk = getattr(self.obj, dst)
             fk.set(val)
         else:
@@ -287,9 +393,19 @@ class Parser:
         if operation == "created":
             if hasattr(self.model, 'provider') and self.provider is not None and not self.obj.provider:
                 self.obj.provider = self.provider
+        if self.bulk:
+            # Saved with other objects of the chunk, see save_pending()
+            self.pending.append((self.line, row, self.obj, operation, update_fields))
+            if operation == "created" and self.eid is not None:
+                self.existing[self.get_eid_key(self.eid_val)] = [self.obj]
+            return
+        if operation == "created":
             self.obj.save()
         else:
             self.obj.save(update_fields=update_fields)
+        self.parse_relations(row, operation, update_fields)
+
+    def parse_relations(self, row, operation, update_fields):
         update_fields += self.parse_fields(row, self.m2m_fields)
         update_fields += self.parse_fields(row, self.m2m_constant_fields)
         update_fields += self.parse_fields(row, self.non_fields, non_field=True)
@@ -316,6 +432,31 @@ class Parser:
         self.eid_val = eid_val
         return {self.eid: eid_val}
 
+    def get_eid_key(self, eid_val):
+        """Normalize eid value to find it in prefetched objects"""
+        return self.model._meta.get_field(self.eid).to_python(eid_val)
+
+    def prefetch_objects(self, rows):
+        """Fetch objects of all rows of a chunk at once, with their many-to-many relations"""
+        self.existing = {}
+        if self.eid is None:
+            return
+        eids = set()
+        for row in rows:
+            try:
+                eids.add(self.get_eid_key(self.get_eid_kwargs(row)[self.eid]))
+            except (RowImportError, ValueImportError):
+                continue  # Reported when parsing row
+        objects = self.model.objects.filter(**{'{}__in'.format(self.eid): eids})
+        if hasattr(self.model, 'provider') and self.provider is not None:
+            objects = objects.filter(provider__exact=self.provider)
+        if hasattr(self.model, 'structure'):
+            objects = objects.select_related('structure')
+        m2m_fields = [f.name for f in self.model._meta.many_to_many
+                      if f.name in self.m2m_fields or f.name in self.m2m_constant_fields]
+        for obj in objects.prefetch_related(*m2m_fields):
+            self.existing.setdefault(self.get_eid_key(getattr(obj, self.eid)), []).append(obj)
+
     def parse_row(self, row):
         self.eid_val = None
         self.line += 1
@@ -328,9 +469,12 @@ class Parser:
             except RowImportError as warnings:
                 self.add_warning(str(warnings))
                 return
-            objects = self.model.objects.filter(**eid_kwargs)
-            if hasattr(self.model, 'provider') and self.provider is not None:
-                objects = objects.filter(provider__exact=self.provider)
+            if self.bulk:
+                objects = self.existing.get(self.get_eid_key(self.eid_val), [])
+            else:
+                objects = self.model.objects.filter(**eid_kwargs)
+                if hasattr(self.model, 'provider') and self.provider is not None:
+                    objects = objects.filter(provider__exact=self.provider)
         if len(objects) == 0 and self.update_only:
             if self.warn_on_missing_objects:
                 self.add_warning(_("Bad value '{eid_val}' for field '{eid_src}'. No object with this identifier").format(eid_val=self.eid_val, eid_src=self.eid_src))
@@ -358,7 +502,7 @@ class Parser:
             self.parse_obj(row, operation)
             self.to_delete.discard(self.obj.pk)
         self.nb_success += 1  # FIXME
-        if self.progress_cb:
+        if self.progress_cb and (not self.streaming or self.line % self.streaming_batch_size == 0 or self.line == self.nb):
             self.progress_cb(float(self.line) / self.nb, self.line, self.eid_val)
 
     def report(self, output_format='txt'):
@@ -400,19 +544,17 @@ class Parser:
         val = self.get_mapping(src, val, mapping, partial)
         if val is None:
             return None
-        fields = {field: val}
+        filters = {}
         if fk:
-            fields[fk] = getattr(self.obj, fk)
-        if create:
-            val, created = model.objects.get_or_create(**fields)
-            if created:
-                self.add_warning(_("{model} '{val}' did not exist in Geotrek-Admin and was automatically created").format(model=model._meta.verbose_name.title(), val=val))
-            return val
+            filters[fk] = getattr(self.obj, fk)
         try:
-            return model.objects.get(**fields)
+            val, created = self.get_related(model, field, val, create, **filters)
         except model.DoesNotExist:
             self.add_warning(_("{model} '{val}' does not exists in Geotrek-Admin. Please add it").format(model=model._meta.verbose_name.title(), val=val))
             return None
+        if created:
+            self.add_warning(_("{model} '{val}' did not exist in Geotrek-Admin and was automatically created").format(model=model._meta.verbose_name.title(), val=val))
+        return val
 
     def filter_m2m(self, src, val, model, field, mapping=None, partial=False, create=False, fk=None, **kwargs):
         if not val:
@@ -426,22 +568,53 @@ class Parser:
             subval = self.get_mapping(src, subval, mapping, partial)
             if subval is None:
                 continue
-            fields = {field: subval}
+            filters = {}
             if fk:
-                fields[fk] = getattr(self.obj, fk)
-            if create:
-                subval, created = model.objects.get_or_create(**fields)
-                if created:
-                    self.add_warning(_("{model} '{val}' did not exist in Geotrek-Admin and was automatically created").format(model=model._meta.verbose_name.title(), val=subval))
-                dst.append(subval)
-                continue
+                filters[fk] = getattr(self.obj, fk)
             try:
-                dst.append(model.objects.get(**fields))
+                subval, created = self.get_related(model, field, subval, create, **filters)
             except model.DoesNotExist:
                 self.add_warning(_("{model} '{val}' does not exists in Geotrek-Admin. Please add it").format(model=model._meta.verbose_name.title(), val=subval))
                 continue
+            if created:
+                self.add_warning(_("{model} '{val}' did not exist in Geotrek-Admin and was automatically created").format(model=model._meta.verbose_name.title(), val=subval))
+            dst.append(subval)
         return dst
 
+    def get_related(self, model, field, val, create=False, **filters):
+        """
+        Returns (object, created) tuple for object of ``model`` whose natural key ``field`` is ``val``.
+        Raises ``model.DoesNotExist`` if it does not exist and ``create`` is False.
+        In bulk mode, objects are looked up in a dictionary, filled with one query for each model, field and filters.
+        """
+        fields = dict(filters, **{field: val})
+        if not self.bulk or LOOKUP_SEP in field:
+            if create:
+                with create_lock:
+                    return model.objects.get_or_create(**fields)
+            return model.objects.get(**fields), False
+        model_field = model._meta.pk if field == 'pk' else model._meta.get_field(field)
+        key = (model, field, tuple((name, getattr(value, 'pk', value)) for name, value in sorted(filters.items())))
+        if key not in self.related:
+            if field in get_translated_fields(model):
+                attname = build_localized_fieldname(field, translation.get_language())
+            else:
+                attname = model_field.attname
+            self.related[key] = {}
+            for obj in model.objects.filter(**filters):
+                self.related[key].setdefault(getattr(obj, attname), []).append(obj)
+        objects = self.related[key].setdefault(model_field.to_python(val), [])
+        if len(objects) == 1:
+            return objects[0], False
+        if objects:
+            return model.objects.get(**fields), False  # Raises MultipleObjectsReturned, as in row by row mode
+        if not create:
+            raise model.DoesNotExist
+        with create_lock:
+            obj, created = model.objects.get_or_create(**fields)  # May have been created by another thread
+        objects.append(obj)
+        return obj, created
+
     def get_to_delete_kwargs(self):
         # FIXME: use mapping if it exists
         kwargs = {}
@@ -474,13 +647,122 @@ class Parser:
         kwargs = self.get_to_delete_kwargs()
         if kwargs is None:
             self.to_delete = set()
+        elif self.streaming:
+            self.to_delete = TemporaryPkSet(self.model.objects.filter(**kwargs), self.streaming_batch_size)
         else:
             self.to_delete = set(self.model.objects.filter(**kwargs).values_list('pk', flat=True))
 
     def end(self):
-        if self.delete:
+        if isinstance(self.to_delete, TemporaryPkSet):
+            if self.delete:
+                for pks in self.to_delete.batches():
+                    self.model.objects.filter(pk__in=pks).delete()
+            self.to_delete.close()
+        elif self.delete:
             self.model.objects.filter(pk__in=self.to_delete).delete()
 
+    def save_pending(self):
+        """Save objects parsed in bulk mode, then parse and save their relations"""
+        pending, self.pending = self.pending, []
+        to_create, to_update, update_fields = {}, {}, set()
+        for line, row, obj, operation, fields in pending:
+            if operation == "created":
+                to_create[id(obj)] = obj
+            elif fields and id(obj) not in to_create:
+                to_update[id(obj)] = obj
+                update_fields.update(fields)
+        # bulk_update() does not call pre_save(), update date (auto_now) is set here
+        has_date_update = any(field.name == 'date_update' for field in self.model._meta.concrete_fields)
+        now = timezone.now()
+        for obj in list(to_create.values()) + list(to_update.values()):
+            if hasattr(obj, 'update_publication_date'):
+                obj.update_publication_date()
+                update_fields.add('publication_date')
+            if has_date_update:
+                obj.date_update = now
+        if has_date_update and to_update:
+            update_fields.add('date_update')
+        line = self.line
+        lines = {id(obj): line for line, row, obj, operation, fields in pending}
+        failed = self.bulk_save(self.model.objects.bulk_create, to_create.values(), lines)
+        if to_update:
+            failed |= self.bulk_save(self.model.objects.bulk_update, to_update.values(), lines, update_fields)
+        if failed:
+            # Rows of objects which could not be saved are not successful, like in row by row mode
+            self.nb_success -= len({lines[key] for key in failed})
+            pending = [item for item in pending if id(item[2]) not in failed]
+            to_create = {key: obj for key, obj in to_create.items() if key not in failed}
+            to_update = {key: obj for key, obj in to_update.items() if key not in failed}
+        if issubclass(self.model, SearchIndexMixin):
+            index_objects(list(to_create.values()) + list(to_update.values()))
+        for obj in to_create.values():
+            # New objects have no relations yet, avoid querying them
+            obj._prefetched_objects_cache = {
+                field.name: field.remote_field.model.objects.none() for field in self.model._meta.many_to_many
+            }
+        for self.line, row, self.obj, operation, update_fields in pending:
+            self.parse_relations(row, operation, update_fields)
+        self.line = line
+        self.save_pending_m2m()
+
+    def bulk_save(self, method, objects, lines, *args):
+        """Save objects with bulk_create() or bulk_update() by batches of bulk_size objects.
+           A failing batch is saved again object by object to report errors on their lines.
+           Returns ids of objects which could not be saved."""
+        failed = set()
+        objects = list(objects)
+        for i in range(0, len(objects), self.bulk_size):
+            batch = objects[i:i + self.bulk_size]
+            try:
+                with transaction.atomic():
+                    method(batch, *args)
+            except DatabaseError:
+                for obj in batch:
+                    try:
+                        with transaction.atomic():
+                            method([obj], *args)
+                    except DatabaseError as e:
+                        if settings.DEBUG:
+                            raise
+                        self.line = lines[id(obj)]
+                        self.add_warning(str(e))
+                        failed.add(id(obj))
+        return failed
+
+    def save_pending_m2m(self):
+        pending_m2m, self.pending_m2m = self.pending_m2m, {}
+        for dst, values in pending_m2m.items():
+            field = self.model._meta.get_field(dst)
+            through = field.remote_field.through
+            source = '{}_id'.format(field.m2m_field_name())
+            target = '{}_id'.format(field.m2m_reverse_field_name())
+            through.objects.filter(**{'{}__in'.format(source): [obj.pk for obj in values]}).delete()
+            through.objects.bulk_create([
+                through(**{source: obj.pk, target: subval.pk}) for obj, val in values.items() for subval in val
+            ], batch_size=self.bulk_size)
+
+    def parse_chunk(self, rows):
+        """Parse rows in bulk mode"""
+        self.prefetch_objects(rows)
+        for row in rows:
+            self.try_parse_row(row)
+        self.save_pending()
+
+    def try_parse_row(self, row):
+        try:
+            self.parse_row(row)
+        except DatabaseError as e:
+            if settings.DEBUG:
+                raise
+            self.add_warning(str(e))
+        except (ValueImportError, RowImportError) as e:
+            self.add_warning(str(e))
+        except Exception as e:
+            raise
+            if settings.DEBUG:
+                raise
+            self.add_warning(str(e))
+
     def parse(self, filename=None, limit=None):
         if filename:
             self.filename = filename
@@ -489,35 +771,40 @@ class Parser:
         if self.filename and not os.path.exists(self.filename):
             raise GlobalImportError(_("File does not exists at: {filename}").format(filename=self.filename))
         self.start()
-        for i, row in enumerate(self.next_row()):
-            if limit and i >= limit:
-                break
-            try:
-                self.parse_row(row)
-            except DatabaseError as e:
-                if settings.DEBUG:
-                    raise
-                self.add_warning(str(e))
-            except (ValueImportError, RowImportError) as e:
-                self.add_warning(str(e))
-            except Exception as e:
-                raise
-                if settings.DEBUG:
-                    raise
-                self.add_warning(str(e))
+        try:
+            rows = self.prefetch(islice(self.next_row(), limit or None))
+            if self.bulk:
+                while True:
+                    chunk = list(islice(rows, self.bulk_size))
+                    if not chunk:
+                        break
+                    self.parse_chunk(chunk)
+            else:
+                for row in rows:
+                    self.try_parse_row(row)
+        finally:
+            self.release()
         self.end()
 
-    def request_or_retry(self, url, verb='get', **kwargs):
+    def prefetch(self, rows):
+        """Hook to fetch data of rows in advance, while previous rows are parsed"""
+        return rows
+
+    def release(self):
+        """Hook to free resources used while rows are parsed, called even if parsing failed"""
+        pass
+
+    def request_or_retry(self, url, verb='get', session=None, **kwargs):
         try_get = settings.PARSER_NUMBER_OF_TRIES
         assert try_get > 0
         while try_get:
-            action = getattr(requests, verb)
+            action = getattr(session or requests, verb)
             response = action(url, allow_redirects=True, **kwargs)
             if response.status_code in settings.PARSER_RETRY_HTTP_STATUS:
                 logger.info("Failed to fetch url {}. Retrying ...".format(url))
                 sleep(settings.PARSER_RETRY_SLEEP_TIME)
                 try_get -= 1
-            elif response.status_code == 200:
+            elif response.status_code in (200, 304):
                 return response
             else:
                 break
@@ -557,7 +844,7 @@ class ShapeParser(Parser):
 
 class ExcelParser(Parser):
     def next_row(self):
-        workbook = xlrd.open_workbook(self.filename)
+        workbook = xlrd.open_workbook(self.filename, on_demand=True)
         sheet = workbook.sheet_by_index(0)
         header = [self.normalize_field_name(cell.value) for cell in sheet.row(0)]
         self.nb = sheet.nrows - 1
@@ -589,6 +876,11 @@ class AtomParser(Parser):
 
 
 class AttachmentParserMixin:
+    """
+    download_workers: Number of threads downloading attachments of next rows while rows are parsed (0 to disable)
+    download_workers_per_host: Maximum number of simultaneous requests to a same host
+    download_lookahead: Number of rows read in advance to start downloading their attachments
+    """
     download_attachments = True
     base_url = ''
     delete_attachments = True
@@ -596,6 +888,10 @@ class AttachmentParserMixin:
     non_fields = {
         'attachments': _("Attachments"),
     }
+    download_workers = 0
+    download_workers_per_host = 4
+    download_lookahead = 100
+    executor = None
 
     def start(self):
         super().start()
@@ -610,6 +906,123 @@ class AttachmentParserMixin:
                 raise GlobalImportError(_("FileType '{name}' does not exists in "
                                           "Geotrek-Admin. Please add it").format(name=self.filetype_name))
         self.creator, created = get_user_model().objects.get_or_create(username='import', defaults={'is_active': False})
+        self.imported_files = {}
+        if self.download_workers and self.download_attachments:
+            self.start_downloads()
+
+    def release(self):
+        super().release()
+        if self.executor is not None:
+            self.end_downloads()
+
+    def start_downloads(self):
+        self.executor = ThreadPoolExecutor(max_workers=self.download_workers)
+        self.prefetched = {}
+        self.host_semaphores = {}
+        # Keep-alive connections, shared by threads
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=self.download_workers,
+                                                pool_maxsize=self.download_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # Names of existing files, which only need a HEAD request to check if they changed
+        files = Attachment.objects.filter(content_type=ContentType.objects.get_for_model(self.model)) \
+            .values_list('attachment_file', flat=True)
+        self.attachment_names = set()
+        for path in files:
+            basename, ext = os.path.splitext(os.path.basename(path))
+            self.attachment_names.add(basename + ext)
+            self.attachment_names.add(re.sub(r'_[a-zA-Z0-9]{7}$', '', basename) + ext)
+
+    def end_downloads(self):
+        for future in self.prefetched.values():
+            future.cancel()
+        self.executor.shutdown()
+        for future in self.prefetched.values():
+            if not future.cancelled() and future.exception() is None:
+                response, path = future.result()
+                if path:
+                    os.remove(path)
+        self.session.close()
+        self.executor = None
+
+    def prefetch(self, rows):
+        rows = super().prefetch(rows)
+        if self.executor is None:
+            yield from rows
+            return
+        buffer = deque()
+        for row in rows:
+            self.prefetch_attachments(row)
+            buffer.append(row)
+            if len(buffer) > self.download_lookahead:
+                yield buffer.popleft()
+        yield from buffer
+
+    def prefetch_attachments(self, row):
+        """Start downloading attachments of a row, before it is parsed"""
+        if 'attachments' not in self.non_fields:
+            return
+        src = self.normalize_src(self.non_fields['attachments'])
+        # Warnings are reported when the row is parsed
+        warnings, self.warnings = self.warnings, {}
+        try:
+            urls = [self.base_url + subval[0] for subval in
+                    self.filter_attachments(src, self.get_val(row, 'attachments', src))]
+        except Exception:
+            return
+        finally:
+            self.warnings = warnings
+        for url in urls:
+            parsed_url = urlparse(url)
+            if parsed_url.scheme not in ('http', 'https'):
+                continue
+            basename, ext = os.path.splitext(os.path.basename(url))
+            name = get_valid_filename('%s%s' % (basename[:128], ext))
+            imported_file = self.get_imported_file(url)
+            verb = 'head' if name in self.attachment_names or imported_file else 'get'
+            if (verb, url) in self.prefetched:
+                continue
+            headers = imported_file.conditional_headers if imported_file and verb == 'head' else {}
+            semaphore = self.host_semaphores.setdefault(parsed_url.netloc,
+                                                        BoundedSemaphore(self.download_workers_per_host))
+            self.prefetched[(verb, url)] = self.executor.submit(self.prefetch_url, url, verb, semaphore, headers)
+
+    def prefetch_url(self, url, verb, semaphore, headers):
+        """Run in download threads: returns response, and path of temporary file where content is streamed"""
+        with semaphore:
+            response = self.request_or_retry(url, verb=verb, session=self.session, stream=True, headers=headers)
+            if verb == 'head':
+                response.close()
+                return response, None
+            with NamedTemporaryFile(prefix='geotrek-import-', delete=False) as f:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    f.write(chunk)
+            response.close()
+            return response, f.name
+
+    def open_prefetched(self, path):
+        """Opens temporary file of a prefetched url, which is removed once closed"""
+        f = open(path, 'rb')
+        os.remove(path)
+        return File(f)
+
+    def get_prefetched(self, url, verb):
+        """Returns (response, path) of url downloaded in advance, (None, None) if it was not"""
+        if self.executor is None or (verb, url) not in self.prefetched:
+            return None, None
+        return self.prefetched.pop((verb, url)).result()
+
+    def get_imported_file(self, url):
+        """Returns validators and content hash of url when it was last downloaded, None if it never was"""
+        if url not in self.imported_files:
+            self.imported_files[url] = ImportedFile.objects.filter(url=url).first()
+        return self.imported_files[url]
+
+    def is_imported_file(self, url, attachment):
+        """Returns True if attachment content was downloaded from url"""
+        imported_file = self.get_imported_file(url)
+        return bool(imported_file and attachment.sha256 and imported_file.sha256 == attachment.sha256)
 
     def filter_attachments(self, src, val):
         if not val:
@@ -628,10 +1041,18 @@ class AttachmentParserMixin:
             return size != attachment.attachment_file.size
 
         if parsed_url.scheme == 'http' or parsed_url.scheme == 'https':
+            # Conditional request if the attachment is the file downloaded last time from this url
+            imported_file = self.get_imported_file(url) if self.is_imported_file(url, attachment) else None
             try:
-                response = self.request_or_retry(url, verb='head')
+                response, path = self.get_prefetched(url, 'head')
+                if response is None or (response.status_code == 304 and imported_file is None):
+                    headers = imported_file.conditional_headers if imported_file else {}
+                    response = self.request_or_retry(url, verb='head', headers=headers)
             except (requests.exceptions.ConnectionError, DownloadImportError) as e:
                 raise ValueImportError('Failed to load attachment: {exc}'.format(exc=e))
+            if imported_file and (response.status_code == 304
+                                  or imported_file.etag and response.headers.get('ETag') == imported_file.etag):
+                return not attachment.attachment_file.storage.exists(attachment.attachment_file.name)
             size = response.headers.get('content-length')
             try:
                 return size is not None and int(size) != attachment.attachment_file.size
@@ -641,33 +1062,52 @@ class AttachmentParserMixin:
         return True
 
     def download_attachment(self, url):
+        f, sha256 = self.download_attachment_file(url)
+        if f is None:
+            return None
+        with f:
+            return f.read()
+
+    def download_attachment_file(self, url):
+        """Returns downloaded file (not loaded in memory if it was prefetched) and its hash, (None, None) if it failed"""
         parsed_url = urlparse(url)
         if parsed_url.scheme == 'ftp':
             try:
                 response = self.request_or_retry(url)
             except (DownloadImportError, requests.exceptions.ConnectionError) as e:
                 raise ValueImportError('Failed to load attachment: {exc}'.format(exc=e))
-            return response.read()
+            f = ContentFile(response.read())
+            return f, file_sha256(f)
         else:
             if self.download_attachments:
                 try:
-                    response = self.request_or_retry(url)
+                    response, path = self.get_prefetched(url, 'get')
+                    if response is None:
+                        response = self.request_or_retry(url)
                 except (DownloadImportError, requests.exceptions.ConnectionError) as e:
                     raise ValueImportError('Failed to load attachment: {exc}'.format(exc=e))
+                f = self.open_prefetched(path) if path else ContentFile(response.content)
                 if response.status_code != requests.codes.ok:
+                    f.close()
                     self.add_warning(_("Failed to download '{url}'").format(url=url))
-                    return None
-                return response.content
-            return None
+                    return None, None
+                sha256 = file_sha256(f)
+                self.imported_files[url], created = ImportedFile.objects.update_or_create(url=url, defaults={
+                    'etag': response.headers.get('ETag') or '',
+                    'last_modified': response.headers.get('Last-Modified') or '',
+                    'sha256': sha256,
+                })
+                return f, sha256
+            return None, None
 
     def check_attachment_updated(self, attachments_to_delete, updated, **kwargs):
         found = False
         for attachment in attachments_to_delete:
             upload_name, ext = os.path.splitext(attachment_upload(attachment, kwargs.get('name')))
             existing_name = attachment.attachment_file.name
-            if re.search(r"^{name}(_[a-zA-Z0-9]{{7}})?{ext}$".format(
-                    name=upload_name, ext=ext), existing_name
-            ) and not self.has_size_changed(kwargs.get('url'), attachment):
+            same_name = re.search(r"^{name}(_[a-zA-Z0-9]{{7}})?{ext}$".format(name=upload_name, ext=ext), existing_name)
+            if (same_name or self.is_imported_file(kwargs.get('url'), attachment)) \
+                    and not self.has_size_changed(kwargs.get('url'), attachment):
                 found = True
                 attachments_to_delete.remove(attachment)
                 if kwargs.get('author') != attachment.author or kwargs.get('legend') != attachment.legend:
@@ -680,32 +1120,56 @@ class AttachmentParserMixin:
 
     def generate_content_attachment(self, attachment, parsed_url, url, updated, name):
         if (parsed_url.scheme in ('http', 'https') and self.download_attachments) or parsed_url.scheme == 'ftp':
-            content = self.download_attachment(url)
-            if content is None:
+            f, sha256 = self.download_attachment_file(url)
+            if f is None:
                 return False, updated
-            f = ContentFile(content)
-            if settings.PAPERCLIP_MAX_BYTES_SIZE_IMAGE and settings.PAPERCLIP_MAX_BYTES_SIZE_IMAGE < f.size:
-                logger.warning(
-                    _(f'{self.obj.__class__.__name__} #{self.obj.pk} - {url} : downloaded file is too large'))
-                return False, updated
-            try:
-                image = Image.open(BytesIO(content))
-                if settings.PAPERCLIP_MIN_IMAGE_UPLOAD_WIDTH and settings.PAPERCLIP_MIN_IMAGE_UPLOAD_WIDTH > image.width:
-                    logger.warning(
-                        _(f"{self.obj.__class__.__name__} #{self.obj.pk} - {url} : downloaded file is not wide enough"))
-                    return False, updated
-                if settings.PAPERCLIP_MIN_IMAGE_UPLOAD_HEIGHT and settings.PAPERCLIP_MIN_IMAGE_UPLOAD_HEIGHT > image.height:
+            with f:
+                if settings.PAPERCLIP_MAX_BYTES_SIZE_IMAGE and settings.PAPERCLIP_MAX_BYTES_SIZE_IMAGE < f.size:
                     logger.warning(
-                        _(f"{self.obj.__class__.__name__} #{self.obj.pk} - {url} : downloaded file is not tall enough"))
+                        _(f'{self.obj.__class__.__name__} #{self.obj.pk} - {url} : downloaded file is too large'))
                     return False, updated
-            except UnidentifiedImageError:
-                pass
-            attachment.attachment_file.save(name, f, save=False)
+                try:
+                    image = Image.open(f)
+                    if settings.PAPERCLIP_MIN_IMAGE_UPLOAD_WIDTH and settings.PAPERCLIP_MIN_IMAGE_UPLOAD_WIDTH > image.width:
+                        logger.warning(
+                            _(f"{self.obj.__class__.__name__} #{self.obj.pk} - {url} : downloaded file is not wide enough"))
+                        return False, updated
+                    if settings.PAPERCLIP_MIN_IMAGE_UPLOAD_HEIGHT and settings.PAPERCLIP_MIN_IMAGE_UPLOAD_HEIGHT > image.height:
+                        logger.warning(
+                            _(f"{self.obj.__class__.__name__} #{self.obj.pk} - {url} : downloaded file is not tall enough"))
+                        return False, updated
+                except UnidentifiedImageError:
+                    pass
+                attachment.sha256 = sha256
+                # Identical files are stored once on disk, each attachment keeping its own path
+                same_content = Attachment.objects.filter(sha256=attachment.sha256).exclude(attachment_file='').first()
+                if not (same_content and self.link_attachment_file(attachment, name, same_content)):
+                    f.seek(0)
+                    attachment.attachment_file.save(name, f, save=False)
             attachment.is_image = attachment.is_an_image()
         else:
             attachment.attachment_link = url
         return True, updated
 
+    def link_attachment_file(self, attachment, name, same_content):
+        """Hard link file of attachment to the identical file of same_content, returns False if it is not possible"""
+        field_file = attachment.attachment_file
+        storage = field_file.storage
+        try:
+            source = storage.path(same_content.attachment_file.name)
+            if not os.path.isfile(source):
+                return False
+            link_name = storage.get_available_name(field_file.field.generate_filename(attachment, name),
+                                                   max_length=field_file.field.max_length)
+            link_path = storage.path(link_name)
+            os.makedirs(os.path.dirname(link_path), exist_ok=True)
+            os.link(source, link_path)
+        except (NotImplementedError, OSError):
+            # Storage without local files, or file system without hard links
+            return False
+        field_file.name = link_name
+        return True
+
     def remove_attachments(self, attachments_to_delete):
         if self.delete_attachments:
             for att in attachments_to_delete:
@@ -747,9 +1211,9 @@ class AttachmentParserMixin:
         attachments_to_delete = list(Attachment.objects.attachments_for_object(self.obj))
         updated, attachments = self.generate_attachments(src, val, attachments_to_delete, updated)
         Attachment.objects.bulk_create(attachments)
-        # TODO : attachments from parsers should be resized
-        #  See https://github.com/makinacorpus/django-paperclip/blob/master/paperclip/models.py#L124
-        # `bulk_create` does not call this `save` method
+        # `bulk_create` does not call `save` method, which queues thumbnails generation
+        for attachment in attachments:
+            attachment.queue_thumbnails()
         self.remove_attachments(attachments_to_delete)
         return updated
 
@@ -930,8 +1394,15 @@ class OpenSystemParser(Parser):
 
 
 class GeotrekAggregatorParser:
+    """
+    workers: Number of parsers run at the same time, in threads
+    workers_per_provider: Maximum number of parsers of a same provider run at the same time,
+        can be set for each provider with "workers" key in json file
+    """
     filename = None
     url = None
+    workers = 1
+    workers_per_provider = 2
 
     mapping_model_parser = {
         "Trek": ("geotrek.trekking.parsers", "GeotrekTrekParser"),
@@ -970,13 +1441,15 @@ class GeotrekAggregatorParser:
         with open(filename, mode='r') as f:
             json_aggregator = json.load(f)
 
+        tasks = {}
         for key, datas in json_aggregator.items():
             self.report_by_api_v2_by_type[key] = {}
+            tasks[key] = []
             models_to_import = datas.get('data_to_import')
             if not models_to_import:
                 models_to_import = self.mapping_model_parser.keys()
             for model in models_to_import:
-                Parser = None
+                self.report_by_api_v2_by_type[key][model] = None
                 if settings.TREKKING_TOPOLOGY_ENABLED:
                     if model in self.invalid_model_topology:
                         warning = f"{model}s can't be imported with dynamic segmentation"
@@ -992,21 +1465,65 @@ class GeotrekAggregatorParser:
                         key_warning = _("Geotrek-admin")
                         self.add_warning(key_warning, warning)
                     else:
-                        Parser = parser(progress_cb=self.progress_cb, provider=key, url=datas['url'],
-                                        portals_filter=datas.get('portals'), mapping=datas.get('mapping'),
-                                        create_categories=datas.get('create'), all_datas=datas.get('all_datas'))
-                        self.progress_cb(0, 0, f'{model} ({key})')
-                        Parser.parse()
-
-                self.report_by_api_v2_by_type[key][model] = {
-                    'nb_lines': Parser.line if Parser else 0,
-                    'nb_success': Parser.nb_success if Parser else 0,
-                    'nb_created': Parser.nb_created if Parser else 0,
-                    'nb_updated': Parser.nb_updated if Parser else 0,
-                    'nb_deleted': len(Parser.to_delete) if Parser and Parser.delete else None,
-                    'nb_unmodified': Parser.nb_unmodified if Parser else 0,
-                    'warnings': Parser.warnings if Parser else self.warnings
-                }
+                        tasks[key].append((key, model, parser, datas))
+                        continue
+                self.add_report(key, model, None)
+
+        if self.workers > 1:
+            self.parse_concurrently(json_aggregator, tasks)
+        else:
+            for key, model, parser, datas in chain.from_iterable(tasks.values()):
+                self.add_report(key, model, self.run_parser(key, model, parser, datas))
+
+    def run_parser(self, key, model, parser, datas):
+        Parser = parser(progress_cb=self.progress_cb, provider=key, url=datas['url'],
+                        portals_filter=datas.get('portals'), mapping=datas.get('mapping'),
+                        create_categories=datas.get('create'), all_datas=datas.get('all_datas'))
+        self.progress_cb(0, 0, f'{model} ({key})')
+        Parser.parse()
+        return Parser
+
+    def run_parser_thread(self, semaphore, *args):
+        with semaphore:
+            try:
+                return self.run_parser(*args)
+            finally:
+                connection.close()
+
+    def parse_concurrently(self, json_aggregator, tasks):
+        """Run parsers in threads, with at most ``workers_per_provider`` parsers for each provider"""
+        semaphores = {
+            key: BoundedSemaphore(datas.get('workers', self.workers_per_provider))
+            for key, datas in json_aggregator.items()
+        }
+        # Alternate providers, so that threads are not all waiting for the same provider
+        tasks = [task for provider_tasks in zip_longest(*tasks.values()) for task in provider_tasks if task]
+        progress_cb = self.progress_cb
+        progress_lock = Lock()
+
+        def locked_progress_cb(*args):
+            with progress_lock:
+                progress_cb(*args)
+
+        self.progress_cb = locked_progress_cb
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = [executor.submit(self.run_parser_thread, semaphores[task[0]], *task) for task in tasks]
+                for (key, model, parser, datas), future in zip(tasks, futures):
+                    self.add_report(key, model, future.result())
+        finally:
+            self.progress_cb = progress_cb
+
+    def add_report(self, key, model, Parser):
+        self.report_by_api_v2_by_type[key][model] = {
+            'nb_lines': Parser.line if Parser else 0,
+            'nb_success': Parser.nb_success if Parser else 0,
+            'nb_created': Parser.nb_created if Parser else 0,
+            'nb_updated': Parser.nb_updated if Parser else 0,
+            'nb_deleted': len(Parser.to_delete) if Parser and Parser.delete else None,
+            'nb_unmodified': Parser.nb_unmodified if Parser else 0,
+            'warnings': Parser.warnings if Parser else self.warnings
+        }
 
     def report(self, output_format='txt'):
         context = {'report': self.report_by_api_v2_by_type}
@@ -1073,6 +1590,8 @@ class GeotrekParser(AttachmentParserMixin, Parser):
         for key, value in self.m2m_replace_fields.items():
             self.m2m_fields[key] = value
         self.translated_fields = [field for field in get_translated_fields(self.model)]
+        # Options are modified below, do not share them with other instances
+        self.field_options = {key: dict(options) for key, options in self.field_options.items()}
         # Generate a mapping dictionnary between id and the related label
         for category, route in self.url_categories.items():
             if self.categories_keys_api_v2.get(category):
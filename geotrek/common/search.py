@@ -0,0 +1,110 @@
+"""
+
+   Full-text search of API v2 ``q`` parameter
+
+   Search vectors of models using ``SearchIndexMixin`` are stored for each language in ``SearchEntry``.
+   They are updated when objects are saved or deleted, and by ``rebuild_search_index`` command.
+
+"""
+import html
+import re
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Subquery, Value
+from django.utils.html import strip_tags
+from modeltranslation.utils import get_language
+
+from geotrek.common.models import SearchEntry
+
+
+# PostgreSQL text search configurations, other languages are not stemmed
+SEARCH_CONFIGS = {
+    'da': 'danish',
+    'de': 'german',
+    'en': 'english',
+    'es': 'spanish',
+    'fi': 'finnish',
+    'fr': 'french',
+    'hu': 'hungarian',
+    'it': 'italian',
+    'nl': 'dutch',
+    'no': 'norwegian',
+    'pt': 'portuguese',
+    'ro': 'romanian',
+    'ru': 'russian',
+    'sv': 'swedish',
+    'tr': 'turkish',
+}
+
+
+def search_config(language):
+    return SEARCH_CONFIGS.get(language, 'simple')
+
+
+def indexed_models():
+    from geotrek.common.mixins.models import SearchIndexMixin
+    return [model for model in apps.get_models() if issubclass(model, SearchIndexMixin)]
+
+
+def field_text(obj, field, language):
+    attname = '{}_{}'.format(field, language)
+    value = getattr(obj, attname) if hasattr(obj, attname) else getattr(obj, field)
+    return html.unescape(strip_tags(value or ''))
+
+
+def search_vector(obj, language):
+    config = search_config(language)
+    vectors = [SearchVector(Value(field_text(obj, field, language)), config=config, weight=weight)
+               for field, weight in obj.search_fields]
+    vector = vectors[0]
+    for other in vectors[1:]:
+        vector = vector + other
+    return vector
+
+
+def index_object(obj):
+    """ Update search vectors of an object, for each language """
+    index_objects([obj])
+
+
+def index_objects(objects):
+    """ Update search vectors of many objects of a same model, with two queries """
+    if not objects:
+        return
+    content_type = ContentType.objects.get_for_model(objects[0])
+    with transaction.atomic():
+        SearchEntry.objects.filter(content_type=content_type, object_id__in=[obj.pk for obj in objects]).delete()
+        SearchEntry.objects.bulk_create([
+            SearchEntry(content_type=content_type, object_id=obj.pk, language=language, vector=search_vector(obj, language))
+            for obj in objects for language in settings.MODELTRANSLATION_LANGUAGES
+        ])
+
+
+def unindex_objects(model, pks):
+    """ Remove search vectors of deleted objects """
+    content_type = ContentType.objects.get_for_model(model)
+    SearchEntry.objects.filter(content_type=content_type, object_id__in=pks).delete()
+
+
+def search(queryset, q):
+    """
+    Filter queryset by objects matching all words of ``q`` in current language, most relevant first.
+    Words are matched as prefixes, so that search can be done while typing.
+    """
+    words = re.findall(r'\w+', q)
+    if not words:
+        return queryset.none()
+    language = get_language()
+    query = SearchQuery(' & '.join('{}:*'.format(word) for word in words), config=search_config(language),
+                        search_type='raw')
+    entries = SearchEntry.objects.filter(content_type=ContentType.objects.get_for_model(queryset.model),
+                                         object_id=OuterRef('pk'), language=language, vector=query)
+    rank = entries.annotate(rank=SearchRank(F('vector'), query)).values('rank')[:1]
+    # Objects with same rank keep the ordering of queryset, or the default ordering of model
+    ordering = queryset.query.order_by or (queryset.model._meta.ordering if queryset.query.default_ordering else ())
+    return queryset.filter(Exists(entries)).annotate(search_rank=Subquery(rank)) \
+        .order_by('-search_rank', *ordering, 'pk')
@@ -175,3 +175,20 @@ def launch_sync_rando(*args, **kwargs):
     return {
         'name': current_task.name,
     }
+
+
+@shared_task(name='geotrek.common.generate-thumbnails')
+def generate_attachment_thumbnails(pk):
+    """
+    celery shared task - generate thumbnails of a picture
+    """
+    from geotrek.common.models import Attachment
+    from geotrek.common.thumbnails import generate_thumbnails
+
+    try:
+        attachment = Attachment.objects.get(pk=pk)
+    except Attachment.DoesNotExist:
+        return 0
+    if not attachment.is_image or not attachment.attachment_file:
+        return 0
+    return generate_thumbnails(attachment)
@@ -22,3 +22,23 @@ BEGIN
     RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
+
+CREATE FUNCTION {{ schema_geotrek }}.ft_simplified_geom_iu() RETURNS trigger SECURITY DEFINER AS $$
+DECLARE
+    source geometry := NEW.geom;
+BEGIN
+    -- Simplified geometries are 3D if trigger argument is '3d', 2D geometry is used until elevation is computed
+    IF TG_ARGV[0] = '3d' THEN
+        source := ST_Force3DZ(COALESCE(NEW.geom_3d, NEW.geom));
+    END IF;
+    IF source IS NULL OR ST_Dimension(source) = 0 THEN
+        -- Points are not simplified, full geometry is used instead
+        NEW.geom_simplified_low := NULL;
+        NEW.geom_simplified_medium := NULL;
+    ELSE
+        NEW.geom_simplified_low := ST_Simplify(source, {{ SIMPLIFIED_GEOMETRIES.low.tolerance }}, true);
+        NEW.geom_simplified_medium := ST_Simplify(source, {{ SIMPLIFIED_GEOMETRIES.medium.tolerance }}, true);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
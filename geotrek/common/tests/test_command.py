@@ -141,6 +141,16 @@ class CommandAttachmentsTests(TestCase):
         self.assertFalse(os.path.exists("{name}.120x120_q85_crop.png".format(name=self.picture.attachment_file.path)))
         self.assertEqual(Thumbnail.objects.count(), 0)
 
+    def test_generate_thumbnails(self):
+        output = StringIO()
+        call_command('generate_thumbnails', jobs=1, stdout=output)
+        # All aliases and resized picture with copyright
+        self.assertEqual(Thumbnail.objects.count(), len(settings.THUMBNAIL_ALIASES['']) + 1)
+        self.assertIn("1 pictures: 7 thumbnails generated", output.getvalue())
+        output = StringIO()
+        call_command('generate_thumbnails', jobs=1, stdout=output)
+        self.assertIn("1 pictures: 0 thumbnails generated", output.getvalue())
+
     def test_clean_attachments_deleted(self):
         output = StringIO()
         self.picture.delete()
@@ -1,4 +1,5 @@
 import json
+import math
 import os
 import urllib
 from io import StringIO
@@ -18,7 +19,7 @@ from django.test.utils import override_settings
 from requests import Response
 
 from geotrek.authent.tests.factories import StructureFactory
-from geotrek.common.models import Attachment, FileType, Organism
+from geotrek.common.models import Attachment, FileType, ImportedFile, Organism
 from geotrek.common.parsers import (AttachmentParserMixin, DownloadImportError,
                                     ExcelParser, GeotrekAggregatorParser,
                                     GeotrekParser, OpenSystemParser,
@@ -42,6 +43,29 @@ class OrganismEidParser(ExcelParser):
     eid = 'organism'
 
 
+class OrganismEidBulkParser(OrganismEidParser):
+    bulk = True
+
+
+class OrganismEidBulkErrorParser(OrganismEidBulkParser):
+    def next_row(self):
+        # Second organism name is too long to be saved
+        self.nb = 3
+        for name in ('First', 'X' * 200, 'Third'):
+            yield {'NOM': name}
+
+
+class OrganismEidStreamingParser(OrganismEidParser):
+    delete = True
+    streaming = True
+    streaming_batch_size = 2
+
+    def next_row(self):
+        self.nb = 5
+        for i in range(self.nb):
+            yield {'NOM': 'Organism {}'.format(i)}
+
+
 class StructureExcelParser(ExcelParser):
     model = Organism
     fields = {
@@ -81,6 +105,10 @@ class WarnAttachmentParser(AttachmentParser):
     warn_on_missing_fields = True
 
 
+class ConcurrentAttachmentParser(AttachmentParser):
+    download_workers = 2
+
+
 class AttachmentLegendParser(AttachmentParser):
 
     def filter_attachments(self, src, val):
@@ -145,6 +173,43 @@ class ParserTests(TestCase):
         self.assertEqual(organisms[0].organism, "2.0")
         self.assertEqual(organisms[1].organism, "Comité Hippolyte")
 
+    def test_updated_with_eid_bulk(self):
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'organism.xls')
+        filename2 = os.path.join(os.path.dirname(__file__), 'data', 'organism2.xls')
+        call_command('import', 'geotrek.common.tests.test_parsers.OrganismEidBulkParser', filename, verbosity=0)
+        call_command('import', 'geotrek.common.tests.test_parsers.OrganismEidBulkParser', filename2, verbosity=0)
+        call_command('import', 'geotrek.common.tests.test_parsers.OrganismEidBulkParser', filename2, verbosity=0)
+        self.assertEqual(Organism.objects.count(), 2)
+        organisms = Organism.objects.order_by('pk')
+        self.assertEqual(organisms[0].organism, "2.0")
+        self.assertEqual(organisms[1].organism, "Comité Hippolyte")
+
+    def test_bulk_database_error(self):
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'organism.xls')
+        parser = OrganismEidBulkErrorParser()
+        parser.parse(filename)
+        self.assertEqual(list(Organism.objects.values_list('organism', flat=True)), ['First', 'Third'])
+        self.assertEqual(parser.nb_success, 2)
+        self.assertEqual(list(parser.warnings.keys()), ['Line 2'])
+
+    def test_streaming_delete(self):
+        Organism.objects.create(organism="Removed")
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'organism.xls')
+        progress = mock.Mock()
+        parser = OrganismEidStreamingParser(progress_cb=progress)
+        parser.parse(filename)
+        self.assertFalse(Organism.objects.filter(organism="Removed").exists())
+        self.assertEqual(len(parser.to_delete), 1)
+        self.assertEqual(progress.call_count, math.ceil(parser.nb / parser.streaming_batch_size))
+
+    def test_bulk_not_available_with_inheritance(self):
+        class TrekBulkParser(ExcelParser):
+            model = Trek
+            bulk = True
+
+        with self.assertRaisesRegex(ImproperlyConfigured, "Bulk mode is not available for Trek"):
+            TrekBulkParser()
+
     def test_report_format_text(self):
         parser = OrganismParser()
         self.assertRegex(parser.report(), '0/0 lines imported.')
@@ -210,6 +275,53 @@ class AttachmentParserTests(TestCase):
         self.assertTrue(attachment.is_image)
         self.assertTrue(os.path.exists(attachment.attachment_file.path), True)
 
+    @override_settings(THUMBNAIL_PREGENERATE=True)
+    @mock.patch('geotrek.common.tasks.generate_attachment_thumbnails.delay')
+    @mock.patch('requests.get')
+    def test_attachment_thumbnails_queued(self, mocked, mocked_delay):
+        mocked.return_value.status_code = 200
+        mocked.return_value.content = b''
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'organism.xls')
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import', 'geotrek.common.tests.test_parsers.AttachmentParser', filename, verbosity=0)
+        mocked_delay.assert_called_once_with(Attachment.objects.get().pk)
+
+    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
+    @mock.patch('requests.Session.head')
+    def test_attachment_concurrent_download(self, mocked_head, mocked_session_get, mocked_get):
+        mocked_session_get.return_value.status_code = 200
+        mocked_session_get.return_value.iter_content.return_value = [b'Fake ', b'image']
+        mocked_head.return_value.status_code = 200
+        mocked_head.return_value.headers = {'content-length': 10}
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'organism.xls')
+        call_command('import', 'geotrek.common.tests.test_parsers.ConcurrentAttachmentParser', filename, verbosity=0)
+        organism = Organism.objects.get()
+        attachment = Attachment.objects.get()
+        self.assertEqual(attachment.content_object, organism)
+        with attachment.attachment_file.open() as f:
+            self.assertEqual(f.read(), b'Fake image')
+        # Existing file is only checked with a HEAD request
+        call_command('import', 'geotrek.common.tests.test_parsers.ConcurrentAttachmentParser', filename, verbosity=0)
+        self.assertEqual(mocked_session_get.call_count, 1)
+        self.assertEqual(mocked_head.call_count, 1)
+        self.assertEqual(Attachment.objects.count(), 1)
+        mocked_get.assert_not_called()
+
+    @mock.patch('requests.Session.get')
+    @mock.patch('geotrek.common.parsers.Parser.try_parse_row', side_effect=ValueError("Parsing error"))
+    def test_attachment_concurrent_download_released_on_error(self, mocked_parse_row, mocked_session_get):
+        mocked_session_get.return_value.status_code = 200
+        mocked_session_get.return_value.iter_content.return_value = [b'Fake ', b'image']
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'organism.xls')
+        parser = ConcurrentAttachmentParser()
+        with mock.patch('geotrek.common.parsers.AttachmentParserMixin.end_downloads',
+                        side_effect=parser.end_downloads) as mocked_end_downloads:
+            with self.assertRaisesRegex(ValueError, "Parsing error"):
+                parser.parse(filename)
+        mocked_end_downloads.assert_called_once()
+        self.assertIsNone(parser.executor)
+
     @mock.patch('requests.get')
     def test_attachment_connection_error(self, mocked):
         mocked.return_value.status_code = 200
@@ -353,6 +465,44 @@ class AttachmentParserTests(TestCase):
         self.assertEqual(attachment.legend, 'legend')
         self.assertEqual(attachment.author, 'name')
 
+    @mock.patch('requests.get')
+    @mock.patch('requests.head')
+    def test_attachment_conditional_request(self, mocked_head, mocked_get):
+        mocked_get.return_value.status_code = 200
+        mocked_get.return_value.content = b'Fake image'
+        mocked_get.return_value.headers = {'ETag': '"abc"'}
+        mocked_head.return_value.status_code = 304
+        mocked_head.return_value.headers = {}
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'organism.xls')
+        call_command('import', 'geotrek.common.tests.test_parsers.AttachmentParser', filename, verbosity=0)
+        call_command('import', 'geotrek.common.tests.test_parsers.AttachmentParser', filename, verbosity=0)
+        self.assertEqual(mocked_get.call_count, 1)
+        self.assertEqual(mocked_head.call_args[1]['headers'], {'If-None-Match': '"abc"'})
+        self.assertEqual(Attachment.objects.count(), 1)
+        imported_file = ImportedFile.objects.get()
+        self.assertEqual(imported_file.url, 'http://toto.tata/titi.png')
+        self.assertEqual(imported_file.sha256, Attachment.objects.get().sha256)
+
+    @mock.patch('requests.get')
+    @mock.patch('requests.head')
+    def test_attachment_same_content_stored_once(self, mocked_head, mocked_get):
+        mocked_get.return_value.status_code = 200
+        mocked_get.return_value.content = b'Fake image'
+        mocked_head.return_value.status_code = 200
+        mocked_head.return_value.headers = {'content-length': 10}
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'organism.xls')
+        filename2 = os.path.join(os.path.dirname(__file__), 'data', 'organism2.xls')
+        call_command('import', 'geotrek.common.tests.test_parsers.AttachmentParser', filename, verbosity=0)
+        call_command('import', 'geotrek.common.tests.test_parsers.AttachmentParser', filename2, verbosity=0)
+        self.assertEqual(Attachment.objects.count(), 2)
+        attachment_1, attachment_2 = Attachment.objects.order_by('pk')
+        # Each attachment has its own path, sharing the same file on disk
+        self.assertNotEqual(attachment_1.attachment_file.name, attachment_2.attachment_file.name)
+        self.assertTrue(os.path.samefile(attachment_1.attachment_file.path, attachment_2.attachment_file.path))
+        os.remove(attachment_1.attachment_file.path)
+        with attachment_2.attachment_file.open() as f:
+            self.assertEqual(f.read(), b'Fake image')
+
     @mock.patch('requests.get')
     @mock.patch('requests.head')
     def test_attachment_updated_file_not_found(self, mocked_head, mocked_get):
@@ -538,6 +688,10 @@ class GeotrekAggregatorTestParser(GeotrekAggregatorParser):
     pass
 
 
+class GeotrekAggregatorConcurrentTestParser(GeotrekAggregatorParser):
+    workers = 3
+
+
 class GeotrekParserTest(TestCase):
     def setUp(self, *args, **kwargs):
         self.filetype = FileType.objects.create(type="Photographie")
@@ -624,6 +778,25 @@ class GeotrekAggregatorParserTest(GeotrekParserTestMixin, TestCase):
         # Trek, POI, Service, InformationDesk, TouristicContent, TouristicEvent, Signage, Infrastructure
         self.assertEqual(8, mocked_import_module.call_count)
 
+    @skipIf(settings.TREKKING_TOPOLOGY_ENABLED, 'Test without dynamic segmentation only')
+    @mock.patch('geotrek.common.parsers.importlib.import_module', return_value=mock.MagicMock())
+    @mock.patch('django.template.loader.render_to_string')
+    @mock.patch('requests.get')
+    def test_geotrek_aggregator_parser_concurrent(self, mocked_get, mocked_render, mocked_import_module):
+        mocked_render.return_value = 'Render'
+        output = StringIO()
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'geotrek_parser_v2',
+                                'config_aggregator_multiple_admin.json')
+        call_command('import', 'geotrek.common.tests.test_parsers.GeotrekAggregatorConcurrentTestParser',
+                     filename=filename, verbosity=2, stdout=output)
+        stdout_parser = output.getvalue()
+        self.assertIn('Trek (URL_1)', stdout_parser)
+        self.assertIn('TouristicContent (URL_3)', stdout_parser)
+        self.assertEqual(8, mocked_import_module.call_count)
+        parser_class = mocked_import_module.return_value.GeotrekTrekParser
+        self.assertEqual(parser_class.return_value.parse.call_count, 2)
+        self.assertEqual(sorted(call[1]['provider'] for call in parser_class.call_args_list), ['URL_1', 'URL_2'])
+
     @skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
     def test_geotrek_aggregator_parser_model_dynamic_segmentation(self):
         output = StringIO()
@@ -0,0 +1,68 @@
+from io import StringIO
+
+from django.core import management
+from django.test import TestCase
+from django.utils import translation
+
+from geotrek.common.models import SearchEntry
+from geotrek.common.search import search
+from geotrek.tourism.models import TouristicContent
+from geotrek.tourism.tests.factories import TouristicContentFactory
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.hotel = TouristicContentFactory.create(name="Mountain hotel", description="<p>Quiet rooms</p>")
+        cls.museum = TouristicContentFactory.create(name="Museum", description="<p>Old mountain hotels</p>")
+
+    def search(self, q):
+        with translation.override('en'):
+            return list(search(TouristicContent.objects.order_by('pk'), q))
+
+    def test_search_words_prefix(self):
+        self.assertEqual(self.search('quiet roo'), [self.hotel])
+        self.assertEqual(self.search('MOUNT'), [self.hotel, self.museum])
+        self.assertEqual(self.search('mountain museum'), [])
+        self.assertEqual(self.search('!!'), [])
+
+    def test_search_ranked(self):
+        self.museum.name = "Mountain museum"
+        self.museum.save()
+        self.hotel.name = "Hotel"
+        self.hotel.description = "<p>Near the mountain</p>"
+        self.hotel.save()
+        self.assertEqual(self.search('mountain'), [self.museum, self.hotel])
+
+    def test_search_same_rank_ordering(self):
+        first = TouristicContentFactory.create(name="Chalet", description="")
+        second = TouristicContentFactory.create(name="Chalet", description="")
+        with translation.override('en'):
+            self.assertEqual(list(search(TouristicContent.objects.all(), 'chalet')), [first, second])
+            self.assertEqual(list(search(TouristicContent.objects.order_by('-pk'), 'chalet')), [second, first])
+
+    def test_search_html_stripped(self):
+        self.assertEqual(self.search('p'), [])
+
+    def test_rebuild_search_index(self):
+        SearchEntry.objects.all().delete()
+        self.assertEqual(self.search('hotel'), [])
+        management.call_command('rebuild_search_index', '--missing', stdout=StringIO())
+        self.assertEqual(self.search('hotel'), [self.hotel, self.museum])
+        management.call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('hotel'), [self.hotel, self.museum])
+
+    def test_delete_removes_search_entries(self):
+        hotel_pk = self.hotel.pk
+        self.hotel.delete()
+        self.assertTrue(SearchEntry.objects.filter(object_id=hotel_pk).exists())
+        self.hotel.delete(force=True)
+        self.assertFalse(SearchEntry.objects.filter(object_id=hotel_pk).exists())
+        self.assertEqual(self.search('hotel'), [self.museum])
+
+    def test_rebuild_search_index_missing_removes_orphans(self):
+        hotel_pk = self.hotel.pk
+        TouristicContent.objects.filter(pk=hotel_pk).delete()
+        self.assertTrue(SearchEntry.objects.filter(object_id=hotel_pk).exists())
+        management.call_command('rebuild_search_index', '--missing', stdout=StringIO())
+        self.assertFalse(SearchEntry.objects.filter(object_id=hotel_pk).exists())
@@ -8,13 +8,14 @@ from io import StringIO
 import zipfile
 
 from django.conf import settings
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 from django.contrib.gis.geos import LineString
 from django.core import management
 from django.core.management.base import CommandError
 from django.http import HttpResponse, StreamingHttpResponse
 from django.test.utils import override_settings
 
+from geotrek.common.helpers_sync import SyncZipFile, ZipTilesBuilder
 from geotrek.common.tests.factories import FileTypeFactory, RecordSourceFactory, TargetPortalFactory, AttachmentFactory, ThemeFactory
 from geotrek.common.utils.testdata import get_dummy_uploaded_image
 from geotrek.core.tests.factories import PathFactory
@@ -26,6 +27,61 @@ from geotrek.trekking.tests.factories import TrekFactory, TrekWithPublishedPOIsF
 from geotrek.trekking import models as trekking_models
 
 
+class ZipTilesBuilderTest(TestCase):
+    @override_settings(MOBILE_TILES_URL=['http://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png',
+                                         'http://{s}.tile.opentopomap.org/{z}/{x}/{y}.png'],
+                       MOBILE_TILES_EXTENSION='.png')
+    @mock.patch('landez.TilesManager.tile')
+    @mock.patch('landez.TilesManager.tileslist', return_value=[(9, 258, z) for z in range(20)])
+    def test_concurrent_download(self, mock_tileslist, mock_tile):
+        def tile(z_x_y):
+            if z_x_y[2] == 3:
+                raise DownloadError
+            return '{}/{}/{}'.format(*z_x_y).encode()
+        mock_tile.side_effect = tile
+        builder_args = {'tiles_url': 'http://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', 'ignore_errors': True,
+                        'tiles_dir': os.path.join(settings.TMP_DIR, 'tiles')}
+        output = os.path.join(settings.TMP_DIR, 'tiles.zip')
+        with zipfile.ZipFile(output, 'w') as zfile:
+            tiles = ZipTilesBuilder(zfile, prefix='tiles/', workers=4, **builder_args)
+            tiles.add_coverage(bbox=(0, 0, 1, 1), zoomlevels=[9])
+            tiles.run()
+        # Arguments are shared with builders of other treks
+        self.assertEqual(builder_args['tiles_url'], 'http://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png')
+        with zipfile.ZipFile(output) as zfile:
+            self.assertEqual(len(zfile.namelist()), 19)
+            self.assertEqual(zfile.read('tiles/9/258/12.png'), b'9/258/12')
+            self.assertNotIn('tiles/9/258/3.png', zfile.namelist())
+        os.remove(output)
+
+
+class SyncZipFileTest(TestCase):
+    def test_manifest_hash(self):
+        filename = os.path.join(settings.TMP_DIR, 'entry.json')
+        with open(filename, 'wb') as f:
+            f.write(b'{"b": 2}')
+        output = os.path.join(settings.TMP_DIR, 'sync.zip')
+        hashes = []
+        for entries in ([('a.json', b'{"a": 1}'), ('a.json', b'duplicate')], [('a.json', b'{"a": 1}')]):
+            with SyncZipFile(output, 'w') as zfile:
+                for arcname, data in entries:
+                    zfile.writestr(arcname, data)
+                zfile.write(filename, 'b.json')
+                zfile.write(filename, 'b.json')
+                self.assertIn('b.json', zfile)
+                hashes.append(zfile.manifest_hash)
+            with zipfile.ZipFile(output) as zfile:
+                self.assertEqual(zfile.namelist(), ['a.json', 'b.json'])
+                self.assertEqual(zfile.read('a.json'), b'{"a": 1}')
+        self.assertEqual(hashes[0], hashes[1])
+        with SyncZipFile(output, 'w') as zfile:
+            zfile.writestr('a.json', b'{"a": 2}')
+            zfile.write(filename, 'b.json')
+            self.assertNotEqual(zfile.manifest_hash, hashes[0])
+        os.remove(filename)
+        os.remove(output)
+
+
 class VarTmpTestCase(TestCase):
     def setUp(self):
         if os.path.exists(os.path.join(settings.TMP_DIR, 'sync_rando', 'tmp_sync')):
@@ -249,6 +305,7 @@ class SyncTest(VarTmpTestCase):
         management.call_command('sync_rando', os.path.join(settings.TMP_DIR, 'sync_rando', 'tmp_sync'), url='http://localhost:8000', skip_tiles=True, languages='en',
                                 skip_pdf=True, verbosity=2, stdout=output)
         self.assertIn("unchanged", output.getvalue())
+        self.assertTrue(os.path.exists(os.path.join(settings.TMP_DIR, 'sync_rando', 'tmp_sync', 'zip_manifest.json')))
 
     @override_settings(THUMBNAIL_COPYRIGHT_FORMAT='*' * 300)
     def test_sync_pictures_long_title_legend_author(self):
@@ -317,6 +374,82 @@ class SyncTest(VarTmpTestCase):
         self.assertTrue(os.path.exists(os.path.join(settings.TMP_DIR, 'sync_rando', 'tmp_sync', 'api', 'fr', 'treks', str(trek_2.pk), 'fr_2.kml')))
 
 
+class SyncJobsTest(TransactionTestCase):
+    """ Workers use their own database connections, so data must be committed """
+    def setUp(self):
+        self.dst = os.path.join(settings.TMP_DIR, 'sync_rando', 'tmp_sync')
+        if os.path.exists(self.dst):
+            shutil.rmtree(self.dst)
+
+    def tearDown(self):
+        if os.path.exists(self.dst):
+            shutil.rmtree(self.dst)
+
+    @mock.patch('geotrek.trekking.models.Trek.prepare_map_image')
+    def test_sync_with_jobs(self, mock_prepare):
+        treks = TrekFactory.create_batch(3, published=True)
+        management.call_command('sync_rando', self.dst, url='http://localhost:8000', skip_tiles=True, skip_pdf=True,
+                                skip_dem=True, skip_profile_png=True, languages='en', jobs=2, verbosity=2,
+                                stdout=StringIO())
+        global_zip = zipfile.ZipFile(os.path.join(self.dst, 'zip', 'treks', 'en', 'global.zip'))
+        names = global_zip.namelist()
+        self.assertIn('api/en/parameters.json', names)
+        for trek in treks:
+            self.assertTrue(os.path.exists(os.path.join(self.dst, 'zip', 'treks', 'en', '{}.zip'.format(trek.pk))))
+            self.assertTrue(os.path.exists(os.path.join(self.dst, 'api', 'en', 'treks', str(trek.pk), 'profile.json')))
+            self.assertIn('api/en/treks/{}/pois.geojson'.format(trek.pk), names)
+        self.assertEqual(len(names), len(set(names)))
+
+
+class SyncIncrementalTest(VarTmpTestCase):
+    def sync(self):
+        output = StringIO()
+        management.call_command('sync_rando', os.path.join(settings.TMP_DIR, 'sync_rando', 'tmp_sync'),
+                                url='http://localhost:8000', skip_tiles=True, skip_pdf=True, skip_dem=True,
+                                skip_profile_png=True, languages='en', incremental=True, verbosity=2, stdout=output)
+        return output.getvalue()
+
+    @mock.patch('geotrek.trekking.models.Trek.prepare_map_image')
+    def test_sync_incremental(self, mock_prepare):
+        dst = os.path.join(settings.TMP_DIR, 'sync_rando', 'tmp_sync')
+        trek_1, trek_2 = TrekFactory.create_batch(2, published=True)
+        output = self.sync()
+        self.assertIn('0 unchanged objects reused', output)
+        with open(os.path.join(dst, 'sync_manifest.json')) as f:
+            manifest = json.load(f)
+        unit = manifest['units']['en/trek/{}'.format(trek_1.pk)]
+        self.assertIn('api/en/treks/{}/pois.geojson'.format(trek_1.pk), unit['files'])
+        self.assertIn('zip/treks/en/{}.zip'.format(trek_1.pk), unit['files'])
+
+        trek_2.name = 'Renamed'
+        trek_2.save()
+        output = self.sync()
+        self.assertIn('en/trek/{} unchanged'.format(trek_1.pk), output)
+        self.assertNotIn('en/trek/{} unchanged'.format(trek_2.pk), output)
+        self.assertIn('1 unchanged objects reused', output)
+        self.assertTrue(os.path.exists(os.path.join(dst, 'api', 'en', 'treks', str(trek_1.pk), 'profile.json')))
+        global_zip = zipfile.ZipFile(os.path.join(dst, 'zip', 'treks', 'en', 'global.zip'))
+        self.assertIn('api/en/treks/{}/pois.geojson'.format(trek_1.pk), global_zip.namelist())
+
+    @mock.patch('geotrek.trekking.models.Trek.prepare_map_image')
+    def test_sync_incremental_related_changes(self, mock_prepare):
+        theme = ThemeFactory.create()
+        trek_1, trek_2 = TrekFactory.create_batch(2, published=True)
+        self.sync()
+        # Categories do not change update date of treks
+        trek_1.themes.add(theme)
+        output = self.sync()
+        self.assertNotIn('en/trek/{} unchanged'.format(trek_1.pk), output)
+        self.assertIn('en/trek/{} unchanged'.format(trek_2.pk), output)
+        # Pictogram of a category is replaced
+        with open(theme.pictogram.path, 'ab') as f:
+            f.write(b' ')
+        os.utime(theme.pictogram.path, (0, 0))
+        output = self.sync()
+        self.assertNotIn('en/trek/{} unchanged'.format(trek_1.pk), output)
+        self.assertIn('en/trek/{} unchanged'.format(trek_2.pk), output)
+
+
 class SyncComplexTest(VarTmpTestCase):
     @classmethod
     def setUpTestData(cls):
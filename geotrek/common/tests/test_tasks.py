@@ -3,10 +3,17 @@ import json
 import os
 from unittest.mock import patch
 
+from django.conf import settings
 from django.test import TestCase
-from geotrek.common.tasks import import_datas, import_datas_from_web
+from django.test.utils import override_settings
+from easy_thumbnails.models import Thumbnail
+
+from geotrek.common.tasks import generate_attachment_thumbnails, import_datas, import_datas_from_web
 from geotrek.common.models import Organism, FileType
 from geotrek.common.parsers import ExcelParser, GlobalImportError
+from geotrek.common.tests.factories import AttachmentFactory
+from geotrek.common.utils.testdata import get_dummy_uploaded_image
+from geotrek.trekking.tests.factories import POIFactory
 from geotrek.tourism.models import TouristicEvent
 
 
@@ -86,3 +93,21 @@ class TasksTest(TestCase):
         event = TouristicEvent.objects.get()
         self.assertEqual(event.eid, "323154")
         self.assertEqual(task.status, "SUCCESS")
+
+
+class ThumbnailsTaskTest(TestCase):
+    @override_settings(THUMBNAIL_PREGENERATE=True)
+    def test_thumbnails_generated_on_commit(self):
+        poi = POIFactory.create()
+        with patch('geotrek.common.tasks.generate_attachment_thumbnails.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                attachment = AttachmentFactory.create(content_object=poi, attachment_file=get_dummy_uploaded_image())
+        delay.assert_called_once_with(attachment.pk)
+
+    @override_settings(THUMBNAIL_PREGENERATE=False)
+    def test_generate_attachment_thumbnails(self):
+        attachment = AttachmentFactory.create(content_object=POIFactory.create(),
+                                              attachment_file=get_dummy_uploaded_image())
+        task = generate_attachment_thumbnails.s(attachment.pk).apply()
+        self.assertEqual(task.result, len(settings.THUMBNAIL_ALIASES['']) + 1)
+        self.assertEqual(Thumbnail.objects.count(), len(settings.THUMBNAIL_ALIASES['']) + 1)
@@ -0,0 +1,54 @@
+"""
+
+   Thumbnails pre-generation
+
+   Thumbnails of pictures are generated by a celery task when attachments are saved (``THUMBNAIL_PREGENERATE``),
+   and by ``generate_thumbnails`` command for existing attachments.
+   Generated thumbnails are registered by easy-thumbnails, so that views only have to read them.
+
+"""
+import hashlib
+
+from PIL.Image import DecompressionBombError
+from django.conf import settings
+from easy_thumbnails.alias import aliases
+from easy_thumbnails.exceptions import InvalidImageFormatError
+from easy_thumbnails.files import get_thumbnailer
+
+from geotrek.common.utils import logger
+
+
+def watermark_options(picture):
+    """ Options of resized pictures with copyright (``PicturesMixin.resized_pictures``) """
+    # Uppercase options aren't used by prepared options (a primary
+    # use of prepared options is to generate the filename -- these
+    # options don't alter the filename).
+    text = settings.THUMBNAIL_COPYRIGHT_FORMAT.format(author=picture.author, title=picture.title,
+                                                      legend=picture.legend)
+    return {
+        'size': (800, 800),
+        'TEXT': text,
+        'SIZE_WATERMARK': settings.THUMBNAIL_COPYRIGHT_SIZE,
+        'watermark': hashlib.md5(text.encode('utf-8')).hexdigest()
+    }
+
+
+def thumbnail_options(picture):
+    """ Options of all thumbnails of a picture: configured aliases and resized picture with copyright """
+    return list(aliases.all(include_global=True).values()) + [watermark_options(picture)]
+
+
+def generate_thumbnails(picture):
+    """ Generate missing thumbnails of a picture, returns the number of generated thumbnails """
+    thumbnailer = get_thumbnailer(picture.attachment_file)
+    count = 0
+    for options in thumbnail_options(picture):
+        options = thumbnailer.get_options(options)
+        try:
+            if thumbnailer.get_existing_thumbnail(options) is None:
+                thumbnailer.get_thumbnail(options)
+                count += 1
+        except (IOError, InvalidImageFormatError, DecompressionBombError) as e:
+            logger.info("Image {} invalid or missing from disk: {}.".format(picture.attachment_file, e))
+            break
+    return count
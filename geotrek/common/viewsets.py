@@ -1,6 +1,10 @@
+from django.conf import settings
+from django.contrib.gis.db.models.functions import Transform
 from mapentity.views import MapEntityViewSet
 from rest_framework import permissions
 
+from geotrek.common.functions import simplified_geometry, simplified_level
+
 
 class GeotrekMapentityViewSet(MapEntityViewSet):
     """ Custom MapentityViewSet for geotrek. """
@@ -20,3 +24,22 @@ class GeotrekMapentityViewSet(MapEntityViewSet):
             # this permit to optimize data serialization with only required columns
             context['request'].query_params['fields'] = ','.join(columns)
         return context
+
+
+class SimplifiedGeometryMixin:
+    """ Serve stored simplified geometries in geojson layer when ``zoom`` parameter is given (``SIMPLIFIED_GEOMETRIES``) """
+
+    def simplified_level(self):
+        return simplified_level(self.request.GET.get('zoom'))
+
+    def simplified_api_geom(self, field='geom'):
+        return Transform(simplified_geometry(field, self.request.GET.get('zoom'), force_2d=True), settings.API_SRID)
+
+    def view_cache_key(self):
+        """ Used by the ``view_cache_response_content`` decorator, layers are cached for each level of detail """
+        view_cache_key = getattr(super(), 'view_cache_key', None)
+        geojson_lookup = view_cache_key() if view_cache_key else None
+        level = self.simplified_level()
+        if geojson_lookup and level:
+            geojson_lookup = '{}_{}'.format(geojson_lookup, level)
+        return geojson_lookup
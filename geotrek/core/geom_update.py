@@ -0,0 +1,47 @@
+"""
+
+   Deferred update of topologies geometries
+
+   With ``TOPOLOGY_DEFERRED_GEOM_UPDATE``, path geometry changes only queue linked topologies
+   (``geom_need_update`` and ``geom_update_queued`` columns). Their geometries are computed afterwards,
+   by batches, by a celery task launched when paths are saved and by ``update_topologies_geom`` command.
+
+"""
+from django.conf import settings
+from django.db import connection, transaction
+
+
+def queue_status():
+    """ Number of queued topologies and age of the oldest one (in seconds, None if queue is empty) """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT COUNT(*), EXTRACT(EPOCH FROM NOW() - MIN(geom_update_queued))
+            FROM core_topology WHERE geom_update_queued IS NOT NULL
+        """)
+        depth, lag = cursor.fetchone()
+    return depth, lag
+
+
+def update_queued_geometries(batch_size=None, max_batches=None):
+    """
+    Compute geometries of queued topologies, oldest first, one transaction per batch.
+    Topologies are locked with ``SKIP LOCKED`` so that several workers can run at the same time.
+    Returns the number of updated topologies.
+    """
+    batch_size = batch_size or settings.TOPOLOGY_GEOM_UPDATE_BATCH_SIZE
+    count = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT id FROM core_topology WHERE geom_update_queued IS NOT NULL
+                ORDER BY geom_update_queued, id LIMIT %s FOR UPDATE SKIP LOCKED
+            """, [batch_size])
+            pks = [row[0] for row in cursor.fetchall()]
+            for pk in pks:
+                cursor.execute("SELECT update_geometry_of_topology(%s)", [pk])
+        if not pks:
+            break
+        count += len(pks)
+        batches += 1
+    return count
@@ -1,5 +1,11 @@
+import heapq
 import math
+import uuid
+from array import array
 from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import Count, Max
 
 
 def path_modifier(path):
@@ -55,3 +61,386 @@ def graph_edges_nodes_of_qs(qs):
         'edges': dict(edges),
         'nodes': dict(nodes),
     }
+
+
+class IncrementalGraphMixin:
+    """
+    Keep a graph synchronized with a queryset of paths.
+
+    Only paths updated since last sync are (re)loaded. Path deletion
+    touches ``date_update`` of latest path (see ``path_latest_updated_d``),
+    and disappeared paths are detected by comparing counts.
+
+    ``date_update`` is the start time of the transaction which updated a path,
+    so a transaction committed after a sync can bring an older date. Update dates
+    of paths updated within ``sync_margin`` before latest sync are kept, and paths
+    of this window are loaded again if their date is new.
+
+    Subclasses implement ``__len__()``, ``edge_ids()``, ``add_path()`` and ``remove_edge()``.
+    """
+    latest = None
+    count = None
+    recent = None
+    sync_margin = timedelta(minutes=5)
+
+    def recent_updates(self, qs, latest):
+        """ Update dates of paths updated within ``sync_margin`` before ``latest`` """
+        if latest is None:
+            return {}
+        return dict(qs.filter(date_update__gte=latest - self.sync_margin).values_list('pk', 'date_update'))
+
+    def sync(self, qs):
+        """ Bring the graph up-to-date with ``qs``. Return ``True`` if it changed. """
+        stats = qs.aggregate(latest=Max('date_update'), count=Count('pk'))
+        if self.latest is None:
+            changed = qs
+        else:
+            recent = self.recent_updates(qs, self.latest)
+            changed_pks = [pk for pk, date_update in recent.items() if (self.recent or {}).get(pk) != date_update]
+            if not changed_pks and (stats['latest'], stats['count']) == (self.latest, self.count):
+                return False
+            changed = qs.filter(pk__in=changed_pks)
+        for path in changed.only('pk', 'geom', 'length').order_by('pk'):
+            self.add_path(path)
+        if len(self) != stats['count']:
+            existing = set(qs.values_list('pk', flat=True))
+            for pk in self.edge_ids():
+                if pk not in existing:
+                    self.remove_edge(pk)
+        self.latest, self.count = stats['latest'], stats['count']
+        self.recent = self.recent_updates(qs, self.latest)
+        return True
+
+
+class PathGraph(IncrementalGraphMixin):
+    """
+    Routable graph of paths, kept in memory.
+
+    Nodes are paths extremities, numbered from 0 in order of appearance.
+    Adjacency is array-backed: ``adjacency[node_id]`` is an array of edge
+    slots and each slot stores its start node, end node and length (float).
+    Edges are paths, identified by their pk.
+    """
+
+    def __init__(self):
+        self.node_ids = {}
+        self.node_xs = array('d')
+        self.node_ys = array('d')
+        self.adjacency = []
+        self.edge_slots = {}
+        self.edge_pks = array('q')
+        self.edge_starts = array('q')
+        self.edge_ends = array('q')
+        self.edge_lengths = array('d')
+        self.free_slots = []
+
+    def __len__(self):
+        return len(self.edge_slots)
+
+    def edge_ids(self):
+        return list(self.edge_slots)
+
+    def get_node(self, coord):
+        coord = tuple(coord[:2])
+        node_id = self.node_ids.get(coord)
+        if node_id is None:
+            node_id = len(self.node_xs)
+            self.node_ids[coord] = node_id
+            self.node_xs.append(coord[0])
+            self.node_ys.append(coord[1])
+            self.adjacency.append(array('q'))
+        return node_id
+
+    def add_edge(self, pk, start, end, length):
+        """ Add (or replace) the edge ``pk`` between ``start`` and ``end`` coordinates. """
+        if pk in self.edge_slots:
+            self.remove_edge(pk)
+        start_id, end_id = self.get_node(start), self.get_node(end)
+        length = 0.0 if length is None or math.isnan(length) else float(length)
+        if self.free_slots:
+            slot = self.free_slots.pop()
+            self.edge_pks[slot] = pk
+            self.edge_starts[slot] = start_id
+            self.edge_ends[slot] = end_id
+            self.edge_lengths[slot] = length
+        else:
+            slot = len(self.edge_pks)
+            self.edge_pks.append(pk)
+            self.edge_starts.append(start_id)
+            self.edge_ends.append(end_id)
+            self.edge_lengths.append(length)
+        self.edge_slots[pk] = slot
+        self.adjacency[start_id].append(slot)
+        if end_id != start_id:
+            self.adjacency[end_id].append(slot)
+        return slot
+
+    def add_path(self, path):
+        coords = path.geom.coords
+        return self.add_edge(path.pk, coords[0], coords[-1], path.length)
+
+    def remove_edge(self, pk):
+        slot = self.edge_slots.pop(pk, None)
+        if slot is None:
+            return
+        for node_id in {self.edge_starts[slot], self.edge_ends[slot]}:
+            neighbours = self.adjacency[node_id]
+            del neighbours[neighbours.index(slot)]
+        self.edge_pks[slot] = -1
+        self.free_slots.append(slot)
+
+    def edge(self, pk):
+        """ Return (start node, end node, length) of edge ``pk``. """
+        slot = self.edge_slots[pk]
+        return self.edge_starts[slot], self.edge_ends[slot], self.edge_lengths[slot]
+
+    def distance(self, node_id, x, y):
+        return math.hypot(self.node_xs[node_id] - x, self.node_ys[node_id] - y)
+
+    def shortest_path(self, sources, targets, goal=None, tolerance=0.0):
+        """
+        Return the shortest way from any of ``sources`` to any of ``targets``,
+        both being dicts ``{node_id: initial/final cost}``.
+
+        Runs Dijkstra, or A* if ``goal`` coordinates are given (euclidean
+        distance is a lower bound of path lengths, expressed in SRID units).
+        ``tolerance`` is the maximum distance between ``goal`` and the actual
+        destination, so that the heuristic remains admissible.
+
+        Returns a tuple ``(length, [node_id, ...], [edge_pk, ...])`` or ``None``
+        if targets are not reachable.
+        """
+        if goal is None:
+            def heuristic(node_id):
+                return 0.0
+        else:
+            def heuristic(node_id):
+                return max(0.0, self.distance(node_id, *goal) - tolerance)
+
+        costs = {}
+        previous = {}
+        heap = []
+        for node_id, cost in sources.items():
+            if cost < costs.get(node_id, math.inf):
+                costs[node_id] = cost
+                previous[node_id] = None
+                heapq.heappush(heap, (cost + heuristic(node_id), cost, node_id))
+
+        best, best_node = math.inf, None
+        visited = set()
+        while heap:
+            estimate, cost, node_id = heapq.heappop(heap)
+            if estimate >= best:
+                break
+            if node_id in visited:
+                continue
+            visited.add(node_id)
+            if node_id in targets and cost + targets[node_id] < best:
+                best, best_node = cost + targets[node_id], node_id
+            for slot in self.adjacency[node_id]:
+                start_id, end_id = self.edge_starts[slot], self.edge_ends[slot]
+                other_id = end_id if start_id == node_id else start_id
+                new_cost = cost + self.edge_lengths[slot]
+                if new_cost < costs.get(other_id, math.inf):
+                    costs[other_id] = new_cost
+                    previous[other_id] = (node_id, self.edge_pks[slot])
+                    heapq.heappush(heap, (new_cost + heuristic(other_id), new_cost, other_id))
+
+        if best_node is None:
+            return None
+        nodes, edges = [best_node], []
+        step = previous[best_node]
+        while step is not None:
+            node_id, pk = step
+            nodes.append(node_id)
+            edges.append(pk)
+            step = previous[node_id]
+        return best, nodes[::-1], edges[::-1]
+
+    def route(self, start, end, goal=None, tolerance=0.0):
+        """
+        Return the shortest route between two snapped points, given as tuples
+        ``(path_pk, position)``, in the form of a serialized sub-topology::
+
+            {"paths": [1, 2, 3], "positions": {"0": [0.4, 1.0], "2": [0.0, 0.2]}, "length": 1234.5}
+
+        ``None`` is returned if points are not connected.
+        """
+        start_pk, start_position = start
+        end_pk, end_position = end
+        s_start, s_end, s_length = self.edge(start_pk)
+        e_start, e_end, e_length = self.edge(end_pk)
+
+        sources = {s_start: start_position * s_length}
+        sources[s_end] = min(sources.get(s_end, math.inf), (1 - start_position) * s_length)
+        targets = {e_start: end_position * e_length}
+        targets[e_end] = min(targets.get(e_end, math.inf), (1 - end_position) * e_length)
+
+        result = self.shortest_path(sources, targets, goal=goal, tolerance=tolerance)
+        if start_pk == end_pk:
+            direct = abs(end_position - start_position) * s_length
+            if result is None or direct <= result[0]:
+                return {'paths': [start_pk], 'positions': {'0': [start_position, end_position]},
+                        'length': direct}
+        if result is None:
+            return None
+
+        length, nodes, edges = result
+        first_node, last_node = nodes[0], nodes[-1]
+        if first_node == s_end and (first_node != s_start or start_position >= 0.5):
+            first = (start_position, 1.0)
+        else:
+            first = (start_position, 0.0)
+        if last_node == e_start and (last_node != e_end or end_position <= 0.5):
+            last = (0.0, end_position)
+        else:
+            last = (1.0, end_position)
+
+        paths = [start_pk]
+        positions = {'0': list(first)}
+        for i, pk in enumerate(edges):
+            from_id = nodes[i]
+            paths.append(pk)
+            positions[str(i + 1)] = [0.0, 1.0] if self.edge(pk)[0] == from_id else [1.0, 0.0]
+        paths.append(end_pk)
+        positions[str(len(paths) - 1)] = list(last)
+        return {'paths': paths, 'positions': positions, 'length': length}
+
+
+class VersionedGraph(IncrementalGraphMixin):
+    """
+    Graph in the form of ``graph_edges_nodes_of_qs()``, patched incrementally.
+
+    Each synchronization which changes the graph increments ``version`` and
+    records touched edges and nodes, so that clients knowing a previous version
+    can fetch only differences (see ``delta()``).
+    Versions are prefixed by a ``generation`` id, unique for each build, since
+    numbering restarts when the graph is built again (e.g. after cache eviction).
+    """
+    changelog_size = 100
+
+    def __init__(self):
+        self.generation = uuid.uuid4().hex
+        self.version = 0
+        self.node_keys = {}
+        self.nodes = {}
+        self.edges = {}
+        self.changelog = []
+        self.touched_edges = set()
+        self.touched_nodes = set()
+
+    def __len__(self):
+        return len(self.edges)
+
+    def edge_ids(self):
+        return list(self.edges)
+
+    def get_node(self, coord):
+        key = self.node_keys.get(coord)
+        if key is None:
+            key = len(self.node_keys) + 1
+            self.node_keys[coord] = key
+        return key
+
+    def add_path(self, path):
+        self.remove_edge(path.pk)
+        coords = path.geom.coords
+        k_start_point, k_end_point = self.get_node(coords[0]), self.get_node(coords[-1])
+
+        v_path = path_modifier(path)
+        v_path['nodes_id'] = [k_start_point, k_end_point]
+
+        self.nodes.setdefault(k_start_point, {})[k_end_point] = path.pk
+        self.nodes.setdefault(k_end_point, {})[k_start_point] = path.pk
+        self.edges[path.pk] = v_path
+        self.touched_edges.add(path.pk)
+        self.touched_nodes.update((k_start_point, k_end_point))
+
+    def remove_edge(self, pk):
+        v_path = self.edges.pop(pk, None)
+        if v_path is None:
+            return
+        k_start_point, k_end_point = v_path['nodes_id']
+        for k_a, k_b in ((k_start_point, k_end_point), (k_end_point, k_start_point)):
+            neighbours = self.nodes.get(k_a, {})
+            if neighbours.get(k_b) == pk:
+                del neighbours[k_b]
+            if not neighbours:
+                self.nodes.pop(k_a, None)
+        self.touched_edges.add(pk)
+        self.touched_nodes.update((k_start_point, k_end_point))
+
+    def sync(self, qs):
+        initial = self.latest is None and self.count is None
+        changed = super().sync(qs)
+        if changed and (initial or self.touched_edges):
+            self.version += 1
+            if not initial:
+                self.changelog.append((self.version, self.touched_edges, self.touched_nodes))
+                del self.changelog[:-self.changelog_size]
+        self.touched_edges, self.touched_nodes = set(), set()
+        return changed
+
+    def fork(self):
+        """
+        Start a new generation, when this graph was patched concurrently with the one
+        published from the same version, so that both never answer for the same tags.
+        """
+        self.generation = uuid.uuid4().hex
+        self.changelog = []
+
+    @property
+    def tag(self):
+        """ Version of the graph, including its generation """
+        return '{}-{}'.format(self.generation, self.version)
+
+    def graph(self):
+        return {
+            'edges': self.edges,
+            'nodes': self.nodes,
+        }
+
+    def delta(self, tag):
+        """
+        Return nodes and edges added, changed or removed since version ``tag`` (see ``tag``),
+        or ``None`` if this version is unknown, too old or from another generation.
+        """
+        generation, sep, since = tag.rpartition('-')
+        if not sep or generation != self.generation or not since.isdigit():
+            return None
+        since = int(since)
+        if since != self.version and (not self.changelog or not self.changelog[0][0] - 1 <= since < self.version):
+            return None
+        edges, nodes = set(), set()
+        for version, touched_edges, touched_nodes in self.changelog:
+            if version > since:
+                edges |= touched_edges
+                nodes |= touched_nodes
+        return {
+            'version': self.tag,
+            'since': tag,
+            'edges': {pk: self.edges[pk] for pk in edges if pk in self.edges},
+            'nodes': {key: self.nodes[key] for key in nodes if key in self.nodes},
+            'removed_edges': sorted(pk for pk in edges if pk not in self.edges),
+            'removed_nodes': sorted(key for key in nodes if key not in self.nodes),
+        }
+
+
+_path_graph = None
+
+
+def get_path_graph():
+    """ Return the routing graph of this process, synchronized with database. """
+    from geotrek.core.models import Path
+
+    global _path_graph
+    if _path_graph is None:
+        _path_graph = PathGraph()
+    _path_graph.sync(Path.objects.exclude(draft=True))
+    return _path_graph
+
+
+def sync_path_graph():
+    """ Synchronize the routing graph of this process, if it was built already. """
+    if _path_graph is not None:
+        get_path_graph()
@@ -1,11 +1,73 @@
 from django.contrib.gis.gdal import DataSource, GDALException
+from geotrek.core.graph import sync_path_graph
 from geotrek.core.models import Path
 from geotrek.authent.models import Structure
 from django.contrib.gis.geos.collections import Polygon, LineString
 from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
 from django.db.utils import IntegrityError, InternalError
-from django.db import transaction
+from django.db import connection, transaction
+from psycopg2.extras import execute_values
+
+
+# Per-row triggers disabled by --bulk, their work is done once for all paths
+BULK_DISABLED_TRIGGERS = ('core_path_00_snap_geom_iu_tgr', 'core_path_10_split_geom_iu_tgr')
+
+# Move extremities of staged paths on closest path (existing or staged before), like paths_snap_extremities()
+BULK_SNAP_SQL = """
+    UPDATE loadpaths_staging s SET geom = ST_SetPoint(s.geom, {index}, snapped.point)
+    FROM (
+        SELECT e.idx, COALESCE(v.geom, c.closest) AS point
+        FROM (SELECT idx, {point}(geom) AS point FROM loadpaths_staging) e
+        JOIN LATERAL (
+            SELECT closest, other FROM (
+                SELECT ST_ClosestPoint(p.geom, e.point) AS closest, p.geom AS other, ST_Distance(p.geom, e.point) AS d
+                FROM core_path p WHERE ST_DWithin(p.geom, e.point, %(distance)s)
+                UNION ALL
+                SELECT ST_ClosestPoint(o.geom, e.point), o.geom, ST_Distance(o.geom, e.point)
+                FROM loadpaths_staging o WHERE o.idx < e.idx AND ST_DWithin(o.geom, e.point, %(distance)s)
+            ) candidates
+            WHERE d < %(distance)s ORDER BY d LIMIT 1
+        ) c ON TRUE
+        LEFT JOIN LATERAL (
+            SELECT dp.geom FROM ST_DumpPoints(c.other) dp
+            WHERE ST_Distance(c.closest, dp.geom) < %(distance)s
+            ORDER BY ST_Distance(c.closest, dp.geom) LIMIT 1
+        ) v ON TRUE
+    ) snapped
+    WHERE s.idx = snapped.idx AND NOT ST_Equals({point}(s.geom), snapped.point)
+"""
+
+# Split staged paths where they cross or touch each other, like paths_topology_intersect_split().
+# Split points closer than 1 unit from an extremity or from each other are ignored.
+BULK_NODE_SQL = """
+    CREATE TEMPORARY TABLE loadpaths_noded ON COMMIT DROP AS
+    WITH intersections AS (
+        SELECT a.idx, ST_LineLocatePoint(a.geom, d.geom) AS fraction, ST_Length(a.geom) AS length
+        FROM loadpaths_staging a
+        JOIN loadpaths_staging b ON a.idx != b.idx AND ST_Intersects(a.geom, b.geom)
+        CROSS JOIN LATERAL ST_Dump(ST_Intersection(a.geom, b.geom)) d
+        WHERE GeometryType(d.geom) = 'POINT'
+    ), fractions AS (
+        SELECT DISTINCT ON (idx, ROUND((fraction * length)::numeric)) idx, fraction FROM intersections
+        WHERE fraction * length >= 1 AND (1 - fraction) * length >= 1
+        UNION SELECT idx, 0 FROM loadpaths_staging
+        UNION SELECT idx, 1 FROM loadpaths_staging
+    ), segments AS (
+        SELECT idx, fraction AS a, LEAD(fraction) OVER (PARTITION BY idx ORDER BY fraction) AS b FROM fractions
+    )
+    SELECT s.idx, seg.a, s.name, s.comments, ST_LineSubstring(s.geom, seg.a, seg.b) AS geom
+    FROM segments seg JOIN loadpaths_staging s ON s.idx = seg.idx
+    WHERE seg.b IS NOT NULL
+"""
+
+# Pairs of paths which cross or touch each other without being split (DE-9IM: interior of one of them involved)
+BULK_UNSPLIT_SQL = """
+    SELECT a.id, b.id FROM core_path a JOIN core_path b ON a.id != b.id AND ST_Intersects(a.geom, b.geom)
+    WHERE a.id = ANY(%(ids)s) AND {other} AND NOT a.draft AND NOT b.draft
+      AND (ST_Relate(a.geom, b.geom, '0********') OR ST_Relate(a.geom, b.geom, '*0*******')
+           OR ST_Relate(a.geom, b.geom, '***0*****'))
+"""
 
 
 class Command(BaseCommand):
@@ -29,6 +91,9 @@ class Command(BaseCommand):
         parser.add_argument('--dry', '-d', action='store_true', dest='dry', default=False,
                             help="Do not change the database, dry run. Show the number of fail"
                                  " and objects potentially created")
+        parser.add_argument('--bulk', '-b', action='store_true', dest='bulk', default=False,
+                            help="Snap and split all paths at once instead of path by path"
+                                 " (paths table is locked meanwhile)")
 
     def handle(self, *args, **options):
         verbosity = options.get('verbosity')
@@ -41,6 +106,7 @@ class Command(BaseCommand):
         comments_columns = options.get('comment')
         fail = options.get('fail')
         dry = options.get('dry')
+        bulk = options.get('bulk')
 
         if dry:
             fail = True
@@ -68,6 +134,7 @@ class Command(BaseCommand):
         self.bbox.srid = settings.SRID
 
         sid = transaction.savepoint()
+        rows = []
 
         for layer in ds:
             for feat in layer:
@@ -85,9 +152,12 @@ class Command(BaseCommand):
                 self.check_srid(srid, geom)
                 geom.dim = 2
                 if self.should_import(feat, geom):
+                    comment_final = '</br>'.join(comment_final_tab)
+                    if bulk:
+                        rows.append((len(rows), name or '', comment_final, geom.hexewkb.decode()))
+                        continue
                     try:
                         with transaction.atomic():
-                            comment_final = '</br>'.join(comment_final_tab)
                             path = Path.objects.create(name=name,
                                                        structure=structure,
                                                        geom=geom,
@@ -103,6 +173,8 @@ class Command(BaseCommand):
                             self.stdout.write('Integrity Error on path : {}, {}'.format(name, geom))
                         else:
                             raise
+        if bulk:
+            counter, counter_fail = self.bulk_load(rows, structure, fail, dry, verbosity)
         if not dry:
             transaction.savepoint_commit(sid)
             if verbosity >= 2:
@@ -113,6 +185,81 @@ class Command(BaseCommand):
             self.stdout.write(self.style.NOTICE(
                 "{0} objects will be create, {1} objects failed;".format(counter, counter_fail)))
 
+    def bulk_load(self, rows, structure, fail, dry, verbosity):
+        """
+        Load all paths at once: geometries are staged in a temporary table, snapped and split with
+        a few set-based queries, then inserted with per-row snap and split triggers disabled.
+        Staged paths crossing existing paths are then split by triggers, as usual.
+        """
+        counter_fail = 0
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("DROP TABLE IF EXISTS loadpaths_staging, loadpaths_noded")
+            cursor.execute("""
+                CREATE TEMPORARY TABLE loadpaths_staging (
+                    idx integer PRIMARY KEY, name varchar, comments text, geom geometry(LineString, %s)
+                ) ON COMMIT DROP
+            """ % settings.SRID)
+            execute_values(cursor.cursor, "INSERT INTO loadpaths_staging (idx, name, comments, geom) VALUES %s",
+                           rows, template="(%s, %s, %s, %s::geometry)", page_size=1000)
+            cursor.execute("CREATE INDEX ON loadpaths_staging USING GIST (geom)")
+            cursor.execute("ANALYZE loadpaths_staging")
+
+            for point, index in (('ST_StartPoint', '0'), ('ST_EndPoint', 'ST_NPoints(s.geom) - 1')):
+                cursor.execute(BULK_SNAP_SQL.format(point=point, index=index),
+                               {'distance': settings.PATH_SNAPPING_DISTANCE})
+
+            cursor.execute("""
+                DELETE FROM loadpaths_staging WHERE NOT ST_IsValid(geom) OR NOT ST_IsSimple(geom)
+                RETURNING name, ST_AsText(geom)
+            """)
+            for name, wkt in cursor.fetchall():
+                if not fail:
+                    raise CommandError('Invalid geometry on path : {}, {}'.format(name, wkt))
+                counter_fail += 1
+                self.stdout.write('Invalid geometry on path : {}, {}'.format(name, wkt))
+            cursor.execute("SELECT COUNT(*) FROM loadpaths_staging")
+            counter = cursor.fetchone()[0]
+
+            cursor.execute(BULK_NODE_SQL)
+            # ALTER TABLE is transactional: triggers are enabled again if anything fails
+            for trigger in BULK_DISABLED_TRIGGERS:
+                cursor.execute("ALTER TABLE core_path DISABLE TRIGGER {}".format(trigger))
+            cursor.execute("""
+                INSERT INTO core_path (structure_id, name, comments, geom)
+                SELECT %s, name, comments, geom FROM loadpaths_noded ORDER BY idx, a
+                RETURNING id
+            """, [structure.pk])
+            ids = [row[0] for row in cursor.fetchall()]
+            for trigger in BULK_DISABLED_TRIGGERS:
+                cursor.execute("ALTER TABLE core_path ENABLE TRIGGER {}".format(trigger))
+            if verbosity > 0:
+                self.stdout.write("{0} paths created from {1} loaded paths".format(len(ids), counter))
+
+            # Let triggers split loaded paths crossing existing ones
+            cursor.execute(BULK_UNSPLIT_SQL.format(other="b.id != ALL(%(ids)s)"), {'ids': ids})
+            for pk in sorted(set(row[0] for row in cursor.fetchall())):
+                cursor.execute("UPDATE core_path SET geom = geom WHERE id = %s", [pk])
+
+            # Consistency check
+            cursor.execute("""
+                SELECT tgname FROM pg_trigger WHERE tgrelid = 'core_path'::regclass AND tgenabled = 'D'
+                AND tgname IN %s
+            """, [BULK_DISABLED_TRIGGERS])
+            disabled = [row[0] for row in cursor.fetchall()]
+            if disabled:
+                raise CommandError("Triggers are still disabled: {}".format(', '.join(disabled)))
+            cursor.execute(BULK_UNSPLIT_SQL.format(other="TRUE"), {'ids': ids})
+            unsplit = cursor.fetchall()
+            if unsplit and verbosity > 0:
+                self.stderr.write("{0} loaded paths cross or touch another path without being split: {1}".format(
+                    len(unsplit), ', '.join('{}/{}'.format(*pair) for pair in unsplit)))
+
+            if dry:
+                transaction.set_rollback(True)
+            else:
+                transaction.on_commit(sync_path_graph)
+        return counter, counter_fail
+
     def check_srid(self, srid, geom):
         if not geom.srid:
             geom.srid = srid
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from geotrek.core.geom_update import queue_status, update_queued_geometries
+
+
+class Command(BaseCommand):
+    help = "Compute geometries of topologies queued by path changes (TOPOLOGY_DEFERRED_GEOM_UPDATE)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', dest='batch_size', type=int, default=None,
+                            help="Number of topologies updated in each transaction "
+                                 "(default: TOPOLOGY_GEOM_UPDATE_BATCH_SIZE setting)")
+        parser.add_argument('--max-batches', dest='max_batches', type=int, default=None,
+                            help="Stop after this number of batches")
+        parser.add_argument('--status', action='store_true', default=False,
+                            help="Only display queue depth and lag")
+
+    def handle(self, *args, **options):
+        if not options['status']:
+            count = update_queued_geometries(options['batch_size'], options['max_batches'])
+            if options['verbosity'] > 0:
+                self.stdout.write("{count} topologies updated".format(count=count))
+        depth, lag = queue_status()
+        if options['verbosity'] > 0 or options['status']:
+            self.stdout.write("{depth} topologies queued, lag: {lag}s".format(depth=depth, lag=int(lag or 0)))
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0034_auto_20220909_1316'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='topology',
+            name='geom_update_queued',
+            field=models.DateTimeField(db_index=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.conf import settings
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0035_topology_geom_update_queued'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='path',
+            name='geom_simplified_low',
+            field=django.contrib.gis.db.models.fields.GeometryField(default=None, dim=3, editable=False, null=True, spatial_index=False, srid=settings.SRID),
+        ),
+        migrations.AddField(
+            model_name='path',
+            name='geom_simplified_medium',
+            field=django.contrib.gis.db.models.fields.GeometryField(default=None, dim=3, editable=False, null=True, spatial_index=False, srid=settings.SRID),
+        ),
+        migrations.AddField(
+            model_name='topology',
+            name='geom_simplified_low',
+            field=django.contrib.gis.db.models.fields.GeometryField(default=None, dim=3, editable=False, null=True, spatial_index=False, srid=settings.SRID),
+        ),
+        migrations.AddField(
+            model_name='topology',
+            name='geom_simplified_medium',
+            field=django.contrib.gis.db.models.fields.GeometryField(default=None, dim=3, editable=False, null=True, spatial_index=False, srid=settings.SRID),
+        ),
+    ]
@@ -9,7 +9,7 @@ from django.contrib.gis.db.models.functions import Distance
 from django.contrib.gis.geos import Point, fromstr, LineString, GEOSGeometry
 from django.contrib.postgres.indexes import GistIndex
 from django.core.mail import mail_managers
-from django.db import connection, connections, DEFAULT_DB_ALIAS
+from django.db import connection, connections, transaction, DEFAULT_DB_ALIAS
 from django.db.models import ProtectedError
 from django.db.models.query import QuerySet
 from django.template.loader import render_to_string
@@ -23,6 +23,7 @@ from geotrek.common.functions import Length
 from geotrek.common.mixins.managers import NoDeleteManager
 from geotrek.common.mixins.models import TimeStampedModelMixin, NoDeleteMixin, AddPropertyMixin
 from geotrek.common.utils import classproperty, sqlfunction, uniquify
+from geotrek.core.graph import sync_path_graph
 from geotrek.zoning.mixins import ZoningPropertiesMixin
 from mapentity.models import MapEntityMixin
 from mapentity.serializers import plain_text
@@ -66,6 +67,11 @@ class Path(ZoningPropertiesMixin, AddPropertyMixin, MapEntityMixin, AltimetryMix
     geom = models.LineStringField(srid=settings.SRID, spatial_index=False)
     geom_cadastre = models.LineStringField(null=True, srid=settings.SRID, spatial_index=False,
                                            editable=False)
+    # Computed values (managed at DB-level with triggers), see ``SIMPLIFIED_GEOMETRIES``
+    geom_simplified_low = models.GeometryField(dim=3, srid=settings.SRID, spatial_index=False,
+                                               editable=False, null=True, default=None)
+    geom_simplified_medium = models.GeometryField(dim=3, srid=settings.SRID, spatial_index=False,
+                                                  editable=False, null=True, default=None)
     valid = models.BooleanField(default=True, verbose_name=_("Validity"),
                                 help_text=_("Approved by manager"))
     visible = models.BooleanField(default=True, verbose_name=_("Visible"),
@@ -262,6 +268,17 @@ class Path(ZoningPropertiesMixin, AddPropertyMixin, MapEntityMixin, AltimetryMix
                 logger.warning(f"Error mail managers didn't work ({msg})")
         super().save(*args, **kwargs)
         self.reload()
+        transaction.on_commit(sync_path_graph)
+        if settings.TOPOLOGY_DEFERRED_GEOM_UPDATE:
+            transaction.on_commit(self.queue_topologies_geom_update)
+
+    def queue_topologies_geom_update(self):
+        from geotrek.core.tasks import update_topologies_geom
+        try:
+            update_topologies_geom.delay()
+        except Exception as e:
+            # Queued topologies will be updated by next task run or update_topologies_geom command
+            logger.warning("Cannot queue geometry update of topologies of {}: {}".format(self, e))
 
     def delete(self, *args, **kwargs):
         if not settings.TREKKING_TOPOLOGY_ENABLED:
@@ -271,6 +288,7 @@ class Path(ZoningPropertiesMixin, AddPropertyMixin, MapEntityMixin, AltimetryMix
             raise ProtectedError(_("You can't delete this path, some topologies are linked with this path"), self)
         topologies_list = list(topologies)
         r = super().delete(*args, **kwargs)
+        transaction.on_commit(sync_path_graph)
         if not Path.objects.exists():
             return r
         for topology in topologies_list:
@@ -412,10 +430,16 @@ class Topology(ZoningPropertiesMixin, AddPropertyMixin, AltimetryMixin,
     offset = models.FloatField(default=0.0, verbose_name=_("Offset"))  # in SRID units
     kind = models.CharField(editable=False, verbose_name=_("Kind"), max_length=32)
     geom_need_update = models.BooleanField(default=False)
+    geom_update_queued = models.DateTimeField(null=True, editable=False, db_index=True)
 
     geom = models.GeometryField(editable=(not settings.TREKKING_TOPOLOGY_ENABLED),
                                 srid=settings.SRID, null=True,
                                 default=None, spatial_index=False)
+    # Computed values (managed at DB-level with triggers), see ``SIMPLIFIED_GEOMETRIES``
+    geom_simplified_low = models.GeometryField(dim=3, srid=settings.SRID, spatial_index=False,
+                                               editable=False, null=True, default=None)
+    geom_simplified_medium = models.GeometryField(dim=3, srid=settings.SRID, spatial_index=False,
+                                                  editable=False, null=True, default=None)
     uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
 
     """ Fake srid attribute, that prevents transform() calls when using Django map widgets. """
@@ -0,0 +1,11 @@
+from celery import shared_task
+
+
+@shared_task(name='geotrek.core.update-topologies-geom')
+def update_topologies_geom():
+    """
+    celery shared task - compute geometries of topologies queued by path changes
+    """
+    from geotrek.core.geom_update import update_queued_geometries
+
+    return update_queued_geometries()
@@ -140,7 +140,7 @@ BEGIN
                                  descent = elevation.negative_gain
                              WHERE id = topology_id;
     END IF;
-    UPDATE core_topology SET geom_need_update = FALSE WHERE id = topology_id;
+    UPDATE core_topology SET geom_need_update = FALSE, geom_update_queued = NULL WHERE id = topology_id;
 END;
 $$ LANGUAGE plpgsql;
 
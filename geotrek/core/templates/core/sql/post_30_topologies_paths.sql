@@ -47,12 +47,12 @@ $$ LANGUAGE plpgsql;
 CREATE FUNCTION {{ schema_geotrek }}.ft_topologies_paths_geometry() RETURNS trigger SECURITY DEFINER AS $$
 BEGIN
     IF TG_OP = 'INSERT' THEN
-        UPDATE core_topology SET geom_need_update = TRUE WHERE id = NEW.topo_object_id AND kind != 'TMP';
+        UPDATE core_topology SET geom_need_update = TRUE, geom_update_queued = NULL WHERE id = NEW.topo_object_id AND kind != 'TMP';
     ELSE
-        UPDATE core_topology SET geom_need_update = TRUE WHERE id = OLD.topo_object_id AND kind != 'TMP';
+        UPDATE core_topology SET geom_need_update = TRUE, geom_update_queued = NULL WHERE id = OLD.topo_object_id AND kind != 'TMP';
         IF TG_OP = 'UPDATE' THEN -- /!\ Logical ops are commutative in SQL
             IF NEW.topo_object_id != OLD.topo_object_id THEN
-                UPDATE core_topology SET geom_need_update = TRUE WHERE id = NEW.topo_object_id AND kind != 'TMP';
+                UPDATE core_topology SET geom_need_update = TRUE, geom_update_queued = NULL WHERE id = NEW.topo_object_id AND kind != 'TMP';
             END IF;
         END IF;
     END IF;
@@ -73,7 +73,8 @@ CREATE FUNCTION {{ schema_geotrek }}.ft_topologies_paths_geometry_statement() RE
 DECLARE
     rec record;
 BEGIN
-    FOR rec IN SELECT * FROM core_topology WHERE geom_need_update = TRUE LOOP
+    -- Topologies queued by path changes (TOPOLOGY_DEFERRED_GEOM_UPDATE) are left to update_topologies_geom
+    FOR rec IN SELECT * FROM core_topology WHERE geom_need_update = TRUE AND geom_update_queued IS NULL LOOP
         PERFORM update_geometry_of_topology(rec.id);
     END LOOP;
 
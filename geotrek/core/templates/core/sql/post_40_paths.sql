@@ -45,14 +45,24 @@ DECLARE
 BEGIN
     -- Geometry of linear topologies are always updated
     -- Geometry of point topologies are updated if offset = 0
-    FOR eid IN SELECT e.id
-               FROM core_pathaggregation et, core_topology e
-               WHERE et.path_id = NEW.id AND et.topo_object_id = e.id
-               GROUP BY e.id, e."offset"
-               HAVING BOOL_OR(et.start_position != et.end_position) OR e."offset" = 0.0
-    LOOP
-        PERFORM update_geometry_of_topology(eid);
-    END LOOP;
+    IF {{ TOPOLOGY_DEFERRED_GEOM_UPDATE }} THEN
+        -- Only queue topologies, their geometry is computed later by update_topologies_geom
+        UPDATE core_topology SET geom_need_update = TRUE, geom_update_queued = COALESCE(geom_update_queued, NOW())
+        WHERE id IN (SELECT e.id
+                     FROM core_pathaggregation et, core_topology e
+                     WHERE et.path_id = NEW.id AND et.topo_object_id = e.id
+                     GROUP BY e.id, e."offset"
+                     HAVING BOOL_OR(et.start_position != et.end_position) OR e."offset" = 0.0);
+    ELSE
+        FOR eid IN SELECT e.id
+                   FROM core_pathaggregation et, core_topology e
+                   WHERE et.path_id = NEW.id AND et.topo_object_id = e.id
+                   GROUP BY e.id, e."offset"
+                   HAVING BOOL_OR(et.start_position != et.end_position) OR e."offset" = 0.0
+        LOOP
+            PERFORM update_geometry_of_topology(eid);
+        END LOOP;
+    END IF;
 
     -- Special case of point geometries with offset != 0
     FOR eid, egeom IN SELECT e.id, e.geom
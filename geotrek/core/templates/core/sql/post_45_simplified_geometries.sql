@@ -0,0 +1,25 @@
+-------------------------------------------------------------------------------
+-- Keep simplified geometries of topologies and paths up to date
+-- (after elevation triggers, which compute 3D geometries)
+-------------------------------------------------------------------------------
+
+CREATE TRIGGER core_topology_simplified_geom_iu_tgr
+BEFORE INSERT OR UPDATE ON core_topology
+FOR EACH ROW EXECUTE PROCEDURE ft_simplified_geom_iu('3d');
+
+CREATE TRIGGER core_path_simplified_geom_iu_tgr
+BEFORE INSERT OR UPDATE ON core_path
+FOR EACH ROW EXECUTE PROCEDURE ft_simplified_geom_iu('3d');
+
+
+-- Simplified geometries of existing objects are computed, without changing their update date
+
+ALTER TABLE core_topology DISABLE TRIGGER core_topology_date_update_tgr;
+UPDATE core_topology SET geom_simplified_low = NULL
+WHERE geom_simplified_low IS NULL AND ST_Dimension(geom) > 0;
+ALTER TABLE core_topology ENABLE TRIGGER core_topology_date_update_tgr;
+
+ALTER TABLE core_path DISABLE TRIGGER core_path_date_update_tgr;
+UPDATE core_path SET geom_simplified_low = NULL
+WHERE geom_simplified_low IS NULL;
+ALTER TABLE core_path ENABLE TRIGGER core_path_date_update_tgr;
@@ -2,6 +2,8 @@
 -------
 -- geom
 -- geom_cadastre
+-- geom_simplified_low
+-- geom_simplified_medium
 ALTER TABLE core_path ALTER COLUMN valid SET DEFAULT true;
 ALTER TABLE core_path ALTER COLUMN visible SET DEFAULT true;
 ALTER TABLE core_path ALTER COLUMN name SET DEFAULT '';
@@ -38,6 +40,8 @@ ALTER TABLE core_topology ALTER COLUMN kind SET DEFAULT '';
 ALTER TABLE core_topology ALTER COLUMN "length" SET DEFAULT 0.0;
 ALTER TABLE core_topology ALTER COLUMN geom_need_update SET DEFAULT FALSE;
 -- geom
+-- geom_simplified_low
+-- geom_simplified_medium
 ALTER TABLE core_topology ALTER COLUMN uuid SET DEFAULT gen_random_uuid();
 -- geom_3d
 ALTER TABLE core_topology ALTER COLUMN ascent SET DEFAULT 0.0;
@@ -1,3 +1,4 @@
+import re
 from io import StringIO
 from unittest import mock, skipIf
 
@@ -6,10 +7,12 @@ from django.contrib.gis.geos import LineString
 from django.core.management import call_command
 from django.core.management.base import CommandError
 from django.test import TestCase, override_settings
-from django.db import IntegrityError
+from django.db import IntegrityError, connection
+from django.template.loader import get_template
 
 from geotrek.authent.models import Structure
 from geotrek.core.models import Path
+from geotrek.core.tests.factories import PathFactory, TopologyFactory
 from geotrek.trekking.tests.factories import POIFactory
 import os
 
@@ -229,3 +232,97 @@ class LoadPathsCommandTest(TestCase):
         value = Path.objects.first()
         self.assertEqual(value.name, 'lulu')
         self.assertEqual(value.structure, self.structure)
+
+    def test_load_paths_bulk(self):
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'paths_bulk.geojson')
+        PathFactory.create(geom=LineString((700150, 6599950), (700150, 6600050), srid=settings.SRID))
+        output = StringIO()
+        call_command('loadpaths', filename, bulk=True, structure='huh', srid=2154, verbosity=1, stdout=output,
+                     stderr=output)
+        self.assertIn('6 paths created from 3 loaded paths', output.getvalue())
+        self.assertNotIn('without being split', output.getvalue())
+        # A and B split each other, C is snapped to A and split with existing path
+        self.assertEqual(Path.objects.count(), 8)
+        self.assertEqual(Path.objects.filter(name='C').count(), 2)
+        self.assertTrue(Path.objects.filter(geom__intersects='SRID={};POINT(700100 6600000)'.format(settings.SRID),
+                                            name='C').exists())
+
+    def test_load_paths_bulk_dry(self):
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'paths_bulk.geojson')
+        output = StringIO()
+        call_command('loadpaths', filename, bulk=True, dry=True, srid=2154, verbosity=0, stdout=output)
+        self.assertIn('3 objects will be create, 0 objects failed;', output.getvalue())
+        self.assertEqual(Path.objects.count(), 0)
+
+
+@skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
+class UpdateTopologiesGeomCommandTest(TestCase):
+    def setUp(self):
+        path = PathFactory.create(geom=LineString((0, 0), (10, 0)))
+        self.topology = TopologyFactory.create(paths=[(path, 0, 1)])
+        # Simulate a path change while geometries are deferred
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE core_topology SET geom = ST_SetSRID(ST_MakeLine(ST_MakePoint(0, 0), ST_MakePoint(5, 0)), %s), "
+                           "geom_need_update = TRUE, geom_update_queued = NOW() WHERE id = %s",
+                           [settings.SRID, self.topology.pk])
+
+    def test_status(self):
+        output = StringIO()
+        call_command('update_topologies_geom', status=True, verbosity=0, stdout=output)
+        self.assertIn('1 topologies queued', output.getvalue())
+        self.topology.refresh_from_db()
+        self.assertEqual(self.topology.geom.length, 5)
+
+    def test_update_queued_topologies(self):
+        output = StringIO()
+        call_command('update_topologies_geom', stdout=output)
+        self.assertIn('1 topologies updated', output.getvalue())
+        self.assertIn('0 topologies queued', output.getvalue())
+        self.topology.refresh_from_db()
+        self.assertEqual(self.topology.geom.length, 10)
+        self.assertFalse(self.topology.geom_need_update)
+        self.assertIsNone(self.topology.geom_update_queued)
+
+    def test_topology_edition_is_not_deferred(self):
+        self.topology.offset = 1
+        self.topology.save()
+        self.topology.refresh_from_db()
+        self.assertIsNone(self.topology.geom_update_queued)
+        self.assertEqual(self.topology.geom.length, 10)
+
+
+@skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
+@override_settings(TOPOLOGY_DEFERRED_GEOM_UPDATE=True)
+class DeferredTopologiesGeomUpdateTest(TestCase):
+    def setUp(self):
+        # Install path trigger as rendered with deferred geometry update enabled
+        context = {name: getattr(settings, name) for name in dir(settings) if name.isupper()}
+        context['schema_geotrek'] = settings.DATABASE_SCHEMAS.get('geotrek.core') or settings.DATABASE_SCHEMAS.get('default', 'public')
+        rendered_sql = get_template('core/sql/post_40_paths.sql').render(context)
+        function_sql = re.search(r'CREATE FUNCTION \S+\.update_topology_geom_when_path_changes\(\).*?\$\$ LANGUAGE plpgsql;',
+                                 rendered_sql, re.DOTALL).group(0)
+        with connection.cursor() as cursor:
+            cursor.execute(function_sql.replace('CREATE FUNCTION', 'CREATE OR REPLACE FUNCTION', 1))
+        self.path = PathFactory.create(geom=LineString((0, 0), (10, 0)))
+        self.topology = TopologyFactory.create(paths=[(self.path, 0, 1)])
+
+    @mock.patch('geotrek.core.tasks.update_topologies_geom.delay')
+    def test_path_change_queues_topologies(self, mocked):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.path.geom = LineString((0, 0), (20, 0))
+            self.path.save()
+        mocked.assert_called_once_with()
+        self.topology.refresh_from_db()
+        self.assertTrue(self.topology.geom_need_update)
+        self.assertIsNotNone(self.topology.geom_update_queued)
+        self.assertEqual(self.topology.geom.length, 10)
+
+    @mock.patch('geotrek.core.models.logger')
+    @mock.patch('geotrek.core.tasks.update_topologies_geom.delay', side_effect=Exception('Broker unavailable'))
+    def test_path_change_broker_unavailable(self, mocked_delay, mocked_logger):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.path.geom = LineString((0, 0), (20, 0))
+            self.path.save()
+        mocked_logger.warning.assert_called_once()
+        self.topology.refresh_from_db()
+        self.assertTrue(self.topology.geom_need_update)
@@ -1,12 +1,15 @@
-from unittest import skipIf
+from datetime import timedelta
+from unittest import mock, skipIf
 
 from django.conf import settings
-from django.contrib.gis.geos import LineString
+from django.core.cache import caches
+from django.db import connection
+from django.contrib.gis.geos import LineString, Point
 from django.test import TestCase
 from django.urls import reverse
 from mapentity.tests.factories import UserFactory
 
-from geotrek.core.graph import graph_edges_nodes_of_qs
+from geotrek.core.graph import PathGraph, get_path_graph, graph_edges_nodes_of_qs
 from geotrek.core.models import Path
 from geotrek.core.tests.factories import PathFactory
 
@@ -19,6 +22,7 @@ class SimpleGraph(TestCase):
         cls.url = reverse('core:path-drf-graph')
 
     def setUp(self):
+        caches['fat'].delete('path_graph_json')
         self.client.force_login(user=self.user)
 
     def test_python_graph_from_path(self):
@@ -96,3 +100,168 @@ class SimpleGraph(TestCase):
         PathFactory(geom=LineString((0, 0), (1, 1)))
         response = self.client.get(self.url)
         self.assertNotEqual(response['Cache-Control'], None)
+
+    def test_json_graph_etag(self):
+        PathFactory(geom=LineString((0, 0), (1, 1)))
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        PathFactory(geom=LineString((5, 5), (6, 6)))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_json_graph_delta(self):
+        path_1 = PathFactory(geom=LineString((0, 0), (1, 1)))
+        path_2 = PathFactory(geom=LineString((5, 5), (6, 6)))
+        response = self.client.get(self.url)
+        version = response['ETag'].strip('"')
+        path_3 = PathFactory(geom=LineString((1, 1), (2, 2)))
+        path_2.delete()
+        response = self.client.get(self.url, {'since': version})
+        self.assertEqual(response.status_code, 200)
+        delta = response.json()
+        self.assertEqual(delta['since'], version)
+        self.assertEqual(list(delta['edges']), [str(path_3.pk)])
+        self.assertEqual(delta['removed_edges'], [path_2.pk])
+        self.assertEqual(delta['nodes']['2'], {'1': path_1.pk, '5': path_3.pk})
+        self.assertEqual(delta['removed_nodes'], [3, 4])
+
+    def test_json_graph_delta_unknown_version(self):
+        path = PathFactory(geom=LineString((0, 0), (1, 1)))
+        response = self.client.get(self.url, {'since': 42})
+        graph = response.json()
+        self.assertNotIn('since', graph)
+        self.assertEqual(list(graph['edges']), [str(path.pk)])
+
+    def test_json_graph_delta_other_generation(self):
+        PathFactory(geom=LineString((0, 0), (1, 1)))
+        response = self.client.get(self.url)
+        version = response['ETag'].strip('"')
+        caches['fat'].clear()
+        path = PathFactory(geom=LineString((5, 5), (6, 6)))
+        response = self.client.get(self.url, {'since': version})
+        self.assertNotEqual(response['ETag'].strip('"'), version)
+        graph = response.json()
+        self.assertNotIn('since', graph)
+        self.assertIn(str(path.pk), graph['edges'])
+        self.assertEqual(len(graph['edges']), 2)
+
+    def test_json_graph_concurrent_update(self):
+        PathFactory(geom=LineString((0, 0), (1, 1)))
+        tag = self.client.get(self.url)['ETag'].strip('"')
+        PathFactory(geom=LineString((5, 5), (6, 6)))
+        # Another process is publishing its own patched graph
+        with mock.patch.object(caches['fat'], 'add', return_value=False):
+            response = self.client.get(self.url, {'since': tag})
+        new_tag = response['ETag'].strip('"')
+        self.assertNotEqual(new_tag.rpartition('-')[0], tag.rpartition('-')[0])
+        self.assertNotIn('since', response.json())
+        self.assertEqual(caches['fat'].get('path_graph_json').tag, tag)
+
+
+class PathGraphTest(TestCase):
+    def setUp(self):
+        self.graph = PathGraph()
+        self.graph.add_edge(1, (0, 0), (10, 0), 10.0)
+        self.graph.add_edge(2, (10, 0), (10, 10), 10.0)
+        self.graph.add_edge(3, (0, 0), (0, 30), 30.0)
+        self.graph.add_edge(4, (0, 30), (10, 10), 25.0)
+
+    def test_nodes_are_shared(self):
+        self.assertEqual(len(self.graph.node_xs), 4)
+        self.assertEqual(len(self.graph), 4)
+        self.assertEqual(self.graph.edge(2)[0], self.graph.edge(1)[1])
+
+    def test_shortest_path_dijkstra(self):
+        length, nodes, edges = self.graph.shortest_path({0: 0.0}, {2: 0.0})
+        self.assertEqual(length, 20.0)
+        self.assertEqual(edges, [1, 2])
+
+    def test_shortest_path_astar(self):
+        length, nodes, edges = self.graph.shortest_path({0: 0.0}, {2: 0.0}, goal=(10, 10))
+        self.assertEqual(length, 20.0)
+        self.assertEqual(edges, [1, 2])
+
+    def test_shortest_path_unreachable(self):
+        self.graph.add_edge(5, (100, 100), (200, 200), 141.0)
+        self.assertIsNone(self.graph.shortest_path({0: 0.0}, {4: 0.0}))
+
+    def test_remove_edge(self):
+        self.graph.remove_edge(2)
+        length, nodes, edges = self.graph.shortest_path({0: 0.0}, {2: 0.0})
+        self.assertEqual(length, 55.0)
+        self.assertEqual(edges, [3, 4])
+
+    def test_removed_slot_is_reused(self):
+        self.graph.remove_edge(2)
+        self.graph.add_edge(5, (10, 0), (10, 10), 5.0)
+        self.assertEqual(len(self.graph.edge_pks), 4)
+        self.assertEqual(self.graph.shortest_path({0: 0.0}, {2: 0.0})[2], [1, 5])
+
+    def test_route_between_snapped_points(self):
+        route = self.graph.route((1, 0.5), (4, 0.2))
+        self.assertEqual(route['paths'], [1, 2, 4])
+        self.assertEqual(route['positions'], {'0': [0.5, 1.0], '1': [0.0, 1.0], '2': [1.0, 0.2]})
+        self.assertEqual(route['length'], 5.0 + 10.0 + 20.0)
+
+    def test_route_on_same_path(self):
+        route = self.graph.route((3, 0.2), (3, 0.6))
+        self.assertEqual(route['paths'], [3])
+        self.assertEqual(route['positions'], {'0': [0.2, 0.6]})
+
+    def test_sync_late_commit(self):
+        path_1 = PathFactory(geom=LineString((0, 0), (10, 0)))
+        PathFactory(geom=LineString((10, 0), (10, 10)))
+        graph = PathGraph()
+        self.assertTrue(graph.sync(Path.objects.all()))
+        self.assertFalse(graph.sync(Path.objects.all()))
+        # Update committed after last sync, dated before it (start of its transaction)
+        with connection.cursor() as cursor:
+            cursor.execute("ALTER TABLE core_path DISABLE TRIGGER core_path_date_update_tgr")
+            cursor.execute("UPDATE core_path SET geom = ST_SetSRID(ST_MakeLine(ST_MakePoint(0, 0), ST_MakePoint(20, 0)), %s), "
+                           "date_update = %s WHERE id = %s",
+                           [settings.SRID, graph.latest - timedelta(seconds=1), path_1.pk])
+            cursor.execute("ALTER TABLE core_path ENABLE TRIGGER core_path_date_update_tgr")
+        self.assertTrue(graph.sync(Path.objects.all()))
+        self.assertEqual(graph.edge(path_1.pk)[2], 20.0)
+        self.assertFalse(graph.sync(Path.objects.all()))
+
+
+@skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
+class RouteViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.url = reverse('core:path-drf-route')
+
+    def setUp(self):
+        self.client.force_login(user=self.user)
+
+    def test_route_bad_parameters(self):
+        response = self.client.get(self.url, {'start': 'foo'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_route(self):
+        path_1 = PathFactory(geom=LineString((700000, 6600000), (700100, 6600000), srid=settings.SRID))
+        path_2 = PathFactory(geom=LineString((700100, 6600000), (700100, 6600100), srid=settings.SRID))
+        start = Point(700050, 6600000, srid=settings.SRID).transform(settings.API_SRID, clone=True)
+        end = Point(700100, 6600050, srid=settings.SRID).transform(settings.API_SRID, clone=True)
+        response = self.client.get(self.url, {'start': '%s,%s' % (start.x, start.y),
+                                              'end': '%s,%s' % (end.x, end.y)})
+        self.assertEqual(response.status_code, 200)
+        route = response.json()
+        self.assertEqual(route['paths'], [path_1.pk, path_2.pk])
+        self.assertAlmostEqual(route['positions']['0'][0], 0.5)
+        self.assertAlmostEqual(route['positions']['1'][1], 0.5)
+        self.assertAlmostEqual(route['length'], 100, places=0)
+
+    def test_route_is_updated_when_path_deleted(self):
+        path_1 = PathFactory(geom=LineString((700000, 6600000), (700100, 6600000), srid=settings.SRID))
+        graph = get_path_graph()
+        self.assertIn(path_1.pk, graph.edge_slots)
+        path_1.delete()
+        PathFactory(geom=LineString((800000, 6600000), (800100, 6600000), srid=settings.SRID))
+        graph = get_path_graph()
+        self.assertNotIn(path_1.pk, graph.edge_slots)
@@ -330,6 +330,17 @@ class PathGeometryTest(TestCase):
         path_snapped.save()
         self.assertEqual(path_snapped.geom.coords, old_geom.coords)
 
+    def test_simplified_geometries(self):
+        # Zigzag with 1 m amplitude, lower than tolerances of simplified geometries
+        p = PathFactory.create(geom=LineString(*[(i * 10, i % 2) for i in range(50)]))
+        p = Path.objects.get(pk=p.pk)
+        self.assertEqual(p.geom_simplified_low.coords, ((0, 0, 0), (490, 1, 0)))
+        self.assertEqual(p.geom_simplified_medium.coords, ((0, 0, 0), (490, 1, 0)))
+        p.geom = LineString((0, 0), (100, 0), (100, 100))
+        p.save()
+        p = Path.objects.get(pk=p.pk)
+        self.assertEqual(p.geom_simplified_low.coords, ((0, 0, 0), (100, 0, 0), (100, 100, 0)))
+
 
 class ComfortTest(TestCase):
     def test_name_with_structure(self):
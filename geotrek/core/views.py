@@ -5,6 +5,7 @@ from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import permission_required
 from django.contrib.gis.db.models.functions import Transform
+from django.contrib.gis.geos import Point
 from django.core.cache import caches
 from django.db.models import Sum, Prefetch
 from django.http import HttpResponseRedirect
@@ -12,6 +13,7 @@ from django.http.response import HttpResponse
 from django.shortcuts import redirect
 from django.urls import reverse
 from django.utils.decorators import method_decorator
+from django.utils.http import parse_etags, quote_etag
 from django.utils.translation import gettext as _
 from django.views.decorators.cache import cache_control
 from django.views.decorators.http import last_modified as cache_last_modified
@@ -29,7 +31,7 @@ from geotrek.common.functions import Length
 from geotrek.common.mixins.views import CustomColumnsMixin
 from geotrek.common.mixins.forms import FormsetMixin
 from geotrek.common.permissions import PublicOrReadPermMixin
-from geotrek.common.viewsets import GeotrekMapentityViewSet
+from geotrek.common.viewsets import GeotrekMapentityViewSet, SimplifiedGeometryMixin
 from . import graph as graph_lib
 from .filters import PathFilterSet, TrailFilterSet
 from .forms import PathForm, TrailForm, CertificationTrailFormSet
@@ -227,7 +229,7 @@ class PathDelete(MapEntityDelete):
         return context
 
 
-class PathViewSet(GeotrekMapentityViewSet):
+class PathViewSet(SimplifiedGeometryMixin, GeotrekMapentityViewSet):
     model = Path
     serializer_class = PathSerializer
     geojson_serializer_class = PathGeojsonSerializer
@@ -249,6 +251,9 @@ class PathViewSet(GeotrekMapentityViewSet):
                 latest_saved.strftime('%y%m%d%H%M%S%f'),
                 '_nodraft' if no_draft else ''
             )
+            level = self.simplified_level()
+            if level:
+                geojson_lookup = '%s_%s' % (geojson_lookup, level)
         return geojson_lookup
 
     def get_queryset(self):
@@ -264,7 +269,7 @@ class PathViewSet(GeotrekMapentityViewSet):
                 select_params=(_("path"),)
             )
 
-            qs = qs.annotate(api_geom=Transform('geom', settings.API_SRID))
+            qs = qs.annotate(api_geom=self.simplified_api_geom())
             qs = qs.only("id", "name", "draft")
 
         else:
@@ -283,24 +288,82 @@ class PathViewSet(GeotrekMapentityViewSet):
     @method_decorator(cache_last_modified(lambda x: Path.no_draft_latest_updated()))
     @action(methods=['GET'], detail=False, url_path='graph.json', renderer_classes=[JSONRenderer, BrowsableAPIRenderer])
     def graph(self, request, *args, **kwargs):
-        """ Return a graph of the path. """
+        """
+        Return a graph of the path.
+
+        Its version is given in ``ETag`` header. Clients knowing a previous version
+        can send it as ``since`` parameter to get only nodes and edges changed since then.
+        """
         cache = caches['fat']
         key = 'path_graph_json'
+        lock_key = 'path_graph_json_lock'
+
+        state = cache.get(key)
+        built = not isinstance(state, graph_lib.VersionedGraph)
+        if built:
+            state = graph_lib.VersionedGraph()
+        initial_tag = state.tag
+        # patch cached graph with paths changed since last version (or build it)
+        if state.sync(Path.objects.exclude(draft=True)):
+            # A patched graph is published only if no other process published another one meanwhile,
+            # otherwise it becomes a new generation (a new graph has its own generation already)
+            published = False
+            if cache.add(lock_key, True, timeout=60):
+                try:
+                    stored = cache.get(key)
+                    if built or getattr(stored, 'tag', None) == initial_tag:
+                        cache.set(key, state)
+                        published = True
+                finally:
+                    cache.delete(lock_key)
+            if not published:
+                state.fork()
+
+        etag = quote_etag(state.tag)
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = Response(status=304)
+        else:
+            graph = None
+            since = request.GET.get('since')
+            if since:
+                graph = state.delta(since)
+            response = Response(graph if graph is not None else state.graph())
+        response['ETag'] = etag
+        return response
 
-        result = cache.get(key)
-        latest = Path.no_draft_latest_updated()
-
-        if result and latest:
-            cache_latest, graph = result
-            # Not empty and still valid
-            if cache_latest and cache_latest >= latest:
-                return Response(graph)
-
-        # cache does not exist or is not up-to-date, rebuild the graph and cache it
-        graph = graph_lib.graph_edges_nodes_of_qs(Path.objects.exclude(draft=True))
-
-        cache.set(key, (latest, graph))
-        return Response(graph)
+    @action(methods=['GET'], detail=False, url_path='route.json', renderer_classes=[JSONRenderer, BrowsableAPIRenderer])
+    def route(self, request, *args, **kwargs):
+        """
+        Return the shortest route between ``start`` and ``end`` points (``lng,lat``),
+        as a serialized sub-topology.
+        """
+        try:
+            points = []
+            for param in ('start', 'end'):
+                lng, lat = request.GET[param].split(',')
+                point = Point(float(lng), float(lat), srid=settings.API_SRID)
+                point.transform(settings.SRID)
+                points.append(point)
+        except (KeyError, ValueError):
+            return Response({'error': _("Parameters start and end must be of the form lng,lat")}, status=400)
+
+        if not Path.objects.exclude(draft=True).exists():
+            return Response({'error': _("No path found")}, status=404)
+        graph = graph_lib.get_path_graph()
+        snapped = []
+        for point in points:
+            closest = Path.closest(point)
+            position, offset = closest.interpolate(point)
+            snapped.append((closest.pk, position, abs(offset)))
+        (start_pk, start_position, _offset), (end_pk, end_position, end_offset) = snapped
+        try:
+            route = graph.route((start_pk, start_position), (end_pk, end_position),
+                                goal=(points[1].x, points[1].y), tolerance=end_offset)
+        except KeyError:
+            route = None
+        if route is None:
+            return Response({'error': _("No route found")}, status=404)
+        return Response(route)
 
     @method_decorator(permission_required('core.change_path'))
     @action(methods=['POST'], detail=False, renderer_classes=[JSONRenderer])
@@ -9,6 +9,8 @@ if 'geotrek.sensitivity' in settings.INSTALLED_APPS:
     from geotrek.sensitivity import views as sensitivity_views
 if 'geotrek.tourism' in settings.INSTALLED_APPS:
     from geotrek.tourism import views as tourism_views
+if 'geotrek.trekking' in settings.INSTALLED_APPS:
+    from geotrek.trekking.models import POIType, ServiceType
 
 
 class SyncRando:
@@ -29,8 +31,36 @@ class SyncRando:
         if self.global_sync.portal:
             dives = dives.filter(Q(portal__name=self.global_sync.portal) | Q(portal=None))
 
-        for dive in dives:
-            self.sync_detail(lang, dive)
+        self.global_sync.sync_details(lang, self, dives)
+
+    def signature(self, lang, dive):
+        """ Data the synced files of a dive depend on, used by ``--incremental`` option """
+        stamp = self.global_sync.stamp
+        values = [
+            self.global_sync.file_signature(os.path.join('api', lang, 'parameters.json')),
+            stamp([dive]),
+            stamp([dive.practice, dive.difficulty]),
+            stamp(dive.levels.order_by('pk')),
+            stamp(dive.themes.order_by('pk')),
+            stamp(dive.cities),
+            stamp(dive.districts),
+            stamp(dive.attachments.all()),
+        ]
+        if 'geotrek.trekking' in settings.INSTALLED_APPS:
+            pois = dive.published_pois
+            values.append(stamp(pois))
+            values.append([stamp(poi.attachments.all()) for poi in pois])
+            values.append(stamp(POIType.objects.filter(pois__in=pois.values('pk')).distinct().order_by('pk')))
+            values.append(stamp(dive.services))
+            values.append(stamp(ServiceType.objects.filter(services__in=dive.services.values('pk')).distinct().order_by('pk')))
+        if 'geotrek.tourism' in settings.INSTALLED_APPS:
+            if self.global_sync.with_events:
+                values.append(stamp(dive.touristic_events.all()))
+            if self.global_sync.categories:
+                values.append(stamp(dive.touristic_contents.all()))
+        if 'geotrek.sensitivity' in settings.INSTALLED_APPS:
+            values.append(stamp(dive.published_sensitive_areas))
+        return values
 
     def sync_pois(self, lang, dive):
         params = {'format': 'geojson'}
@@ -0,0 +1,23 @@
+from django.conf import settings
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('outdoor', '0040_auto_20220909_1327'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='geom_simplified_low',
+            field=django.contrib.gis.db.models.fields.GeometryField(default=None, editable=False, null=True, spatial_index=False, srid=settings.SRID),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='geom_simplified_medium',
+            field=django.contrib.gis.db.models.fields.GeometryField(default=None, editable=False, null=True, spatial_index=False, srid=settings.SRID),
+        ),
+    ]
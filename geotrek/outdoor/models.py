@@ -13,7 +13,7 @@ from mptt.models import MPTTModel, TreeForeignKey, TreeManager
 from geotrek.altimetry.models import AltimetryMixin as BaseAltimetryMixin
 from geotrek.authent.models import StructureRelated
 from geotrek.common.mixins.models import (AddPropertyMixin, OptionalPictogramMixin, PicturesMixin, PublishableMixin,
-                                          TimeStampedModelMixin)
+                                          SearchIndexMixin, TimeStampedModelMixin)
 from geotrek.common.models import Organism, RatingMixin, RatingScaleMixin
 from geotrek.common.templatetags import geotrek_tags
 from geotrek.common.utils import intersecting
@@ -117,8 +117,10 @@ class SiteManager(TreeManager):
         return providers
 
 
-class Site(ZoningPropertiesMixin, AddPropertyMixin, PicturesMixin, PublishableMixin, MapEntityMixin, StructureRelated,
+class Site(SearchIndexMixin, ZoningPropertiesMixin, AddPropertyMixin, PicturesMixin, PublishableMixin, MapEntityMixin, StructureRelated,
            AltimetryMixin, TimeStampedModelMixin, MPTTModel, ExcludedPOIsMixin):
+    search_fields = (('name', 'A'), ('description_teaser', 'B'), ('description', 'C'))
+
     ORIENTATION_CHOICES = (
         ('N', _("↑ N")),
         ('NE', _("↗ NE")),
@@ -354,9 +356,16 @@ class CourseManager(Manager):
         return providers
 
 
-class Course(ZoningPropertiesMixin, AddPropertyMixin, PublishableMixin, MapEntityMixin, StructureRelated, PicturesMixin,
+class Course(SearchIndexMixin, ZoningPropertiesMixin, AddPropertyMixin, PublishableMixin, MapEntityMixin, StructureRelated, PicturesMixin,
              AltimetryMixin, TimeStampedModelMixin, ExcludedPOIsMixin):
+    search_fields = (('name', 'A'), ('description', 'C'))
+
     geom = models.GeometryCollectionField(verbose_name=_("Location"), srid=settings.SRID)
+    # Computed values (managed at DB-level with triggers), see ``SIMPLIFIED_GEOMETRIES``
+    geom_simplified_low = models.GeometryField(srid=settings.SRID, spatial_index=False,
+                                               editable=False, null=True, default=None)
+    geom_simplified_medium = models.GeometryField(srid=settings.SRID, spatial_index=False,
+                                                  editable=False, null=True, default=None)
     parent_sites = models.ManyToManyField(Site, related_name="children_courses", verbose_name=_("Sites"))
     description = models.TextField(verbose_name=_("Description"), blank=True,
                                    help_text=_("Complete description"))
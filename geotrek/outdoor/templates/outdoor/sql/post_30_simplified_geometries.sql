@@ -0,0 +1,13 @@
+-------------------------------------------------------------------------------
+-- Keep simplified geometries of courses up to date
+-------------------------------------------------------------------------------
+
+CREATE TRIGGER outdoor_course_simplified_geom_iu_tgr
+BEFORE INSERT OR UPDATE ON outdoor_course
+FOR EACH ROW EXECUTE PROCEDURE ft_simplified_geom_iu();
+
+
+-- Simplified geometries of existing courses are computed
+
+UPDATE outdoor_course SET geom_simplified_low = NULL
+WHERE geom_simplified_low IS NULL AND ST_Dimension(geom) > 0;
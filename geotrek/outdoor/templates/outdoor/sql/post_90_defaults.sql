@@ -86,6 +86,8 @@ ALTER TABLE outdoor_orderedcoursechild ALTER COLUMN "order" SET DEFAULT 0;
 -- Course
 ---------
 -- geom
+-- geom_simplified_low
+-- geom_simplified_medium
 -- parent_sites
 ALTER TABLE outdoor_course ALTER COLUMN description SET DEFAULT '';
 ALTER TABLE outdoor_course ALTER COLUMN ratings_description SET DEFAULT '';
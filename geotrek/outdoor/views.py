@@ -9,7 +9,7 @@ from geotrek.authent.decorators import same_structure_required
 from geotrek.common.mixins.api import APIViewSet
 from geotrek.common.mixins.views import CompletenessMixin, CustomColumnsMixin
 from geotrek.common.views import DocumentBookletPublic, DocumentPublic, MarkupPublic
-from geotrek.common.viewsets import GeotrekMapentityViewSet
+from geotrek.common.viewsets import GeotrekMapentityViewSet, SimplifiedGeometryMixin
 from .filters import SiteFilterSet, CourseFilterSet
 from .forms import SiteForm, CourseForm
 from .models import Site, Course
@@ -226,7 +226,7 @@ class CourseFormatList(MapEntityFormat, CourseList):
     ]
 
 
-class CourseViewSet(GeotrekMapentityViewSet):
+class CourseViewSet(SimplifiedGeometryMixin, GeotrekMapentityViewSet):
     model = Course
     serializer_class = CourseSerializer
     geojson_serializer_class = CourseGeojsonSerializer
@@ -239,7 +239,7 @@ class CourseViewSet(GeotrekMapentityViewSet):
     def get_queryset(self):
         qs = self.model.objects.all()
         if self.format_kwarg == 'geojson':
-            qs = qs.annotate(api_geom=Transform('geom', settings.API_SRID))
+            qs = qs.annotate(api_geom=self.simplified_api_geom())
             qs = qs.only('id', 'name')
         else:
             qs = qs.prefetch_related('parent_sites')
@@ -0,0 +1,33 @@
+from django.conf import settings
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensitivity', '0022_sensitivearea_provider'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='species',
+            name='period_mask',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='sensitivearea',
+            name='geom_buffered',
+            field=django.contrib.gis.db.models.fields.GeometryField(editable=False, null=True, srid=settings.SRID),
+        ),
+        migrations.AddField(
+            model_name='sensitivearea',
+            name='area',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='sensitivearea',
+            name='period_mask',
+            field=models.IntegerField(db_index=True, default=0, editable=False),
+        ),
+    ]
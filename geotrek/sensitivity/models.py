@@ -55,6 +55,8 @@ class Species(OptionalPictogramMixin):
                                    choices=((SPECIES, pgettext_lazy("Singular", "Species")),
                                             (REGULATORY, _("Regulatory"))))
     eid = models.CharField(verbose_name=_("External id"), max_length=1024, blank=True, null=True)
+    # Months of period fields (bit 0 = January), computed by trigger
+    period_mask = models.IntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ['name']
@@ -72,6 +74,11 @@ class Species(OptionalPictogramMixin):
     def pretty_practices(self):
         return ", ".join([str(practice) for practice in self.practices.all()])
 
+    @staticmethod
+    def months_mask(months):
+        """ Mask of months (1-12) to compare with ``period_mask`` """
+        return sum(1 << (month - 1) for month in set(months) if 1 <= month <= 12)
+
 
 class SensitiveAreaManager(NoDeleteManager):
     def provider_choices(self):
@@ -90,6 +97,11 @@ class SensitiveArea(MapEntityMixin, StructureRelated, TimeStampedModelMixin, NoD
     contact = models.TextField(verbose_name=_("Contact"), blank=True)
     eid = models.CharField(verbose_name=_("External id"), max_length=1024, blank=True, null=True)
     provider = models.CharField(verbose_name=_("Provider"), db_index=True, max_length=1024, blank=True)
+    # Computed by triggers: displayed geometry (points buffered with species radius), its area
+    # and period mask of species
+    geom_buffered = models.GeometryField(srid=settings.SRID, null=True, editable=False)
+    area = models.FloatField(null=True, editable=False)
+    period_mask = models.IntegerField(default=0, editable=False, db_index=True)
 
     objects = SensitiveAreaManager()
 
@@ -0,0 +1,75 @@
+-------------------------------------------------------------------------------
+-- Keep period mask of species up to date (bit 0 = January, bit 11 = December)
+-------------------------------------------------------------------------------
+
+CREATE FUNCTION {{ schema_geotrek }}.sensitivity_species_period_mask_iu() RETURNS trigger SECURITY DEFINER AS $$
+BEGIN
+    NEW.period_mask := NEW.period01::integer
+                       | NEW.period02::integer << 1
+                       | NEW.period03::integer << 2
+                       | NEW.period04::integer << 3
+                       | NEW.period05::integer << 4
+                       | NEW.period06::integer << 5
+                       | NEW.period07::integer << 6
+                       | NEW.period08::integer << 7
+                       | NEW.period09::integer << 8
+                       | NEW.period10::integer << 9
+                       | NEW.period11::integer << 10
+                       | NEW.period12::integer << 11;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER sensitivity_species_period_mask_iu_tgr
+BEFORE INSERT OR UPDATE ON sensitivity_species
+FOR EACH ROW EXECUTE PROCEDURE sensitivity_species_period_mask_iu();
+
+
+CREATE FUNCTION {{ schema_geotrek }}.sensitivity_species_areas_u() RETURNS trigger SECURITY DEFINER AS $$
+BEGIN
+    -- Display geometry of areas is computed again with new radius
+    -- Update date is touched too, so that cached vector tiles are invalidated
+    UPDATE sensitivity_sensitivearea SET period_mask = NEW.period_mask, date_update = statement_timestamp() WHERE species_id = NEW.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER sensitivity_species_areas_u_tgr
+AFTER UPDATE ON sensitivity_species
+FOR EACH ROW
+WHEN (OLD.radius IS DISTINCT FROM NEW.radius OR OLD.period_mask IS DISTINCT FROM NEW.period_mask)
+EXECUTE PROCEDURE sensitivity_species_areas_u();
+
+
+-------------------------------------------------------------------------------
+-- Keep display geometry (points buffered with species radius), area and
+-- period mask of sensitive areas up to date
+-------------------------------------------------------------------------------
+
+CREATE FUNCTION {{ schema_geotrek }}.sensitivity_sensitivearea_display_iu() RETURNS trigger SECURITY DEFINER AS $$
+DECLARE
+    species_radius integer;
+    species_period_mask integer;
+BEGIN
+    SELECT COALESCE(radius, {{ SENSITIVITY_DEFAULT_RADIUS }}), period_mask INTO species_radius, species_period_mask
+    FROM sensitivity_species WHERE id = NEW.species_id;
+    IF GeometryType(NEW.geom) = 'POINT' THEN
+        NEW.geom_buffered := ST_Buffer(NEW.geom, species_radius, 4);
+    ELSE
+        NEW.geom_buffered := NEW.geom;
+    END IF;
+    NEW.area := ST_Area(NEW.geom_buffered);
+    NEW.period_mask := COALESCE(species_period_mask, 0);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER sensitivity_sensitivearea_display_iu_tgr
+BEFORE INSERT OR UPDATE ON sensitivity_sensitivearea
+FOR EACH ROW EXECUTE PROCEDURE sensitivity_sensitivearea_display_iu();
+
+
+-- Computed columns are updated again, triggers were dropped during migrations
+
+UPDATE sensitivity_species SET period_mask = 0;
+UPDATE sensitivity_sensitivearea SET geom_buffered = NULL;
@@ -24,6 +24,7 @@ ALTER TABLE sensitivity_species ALTER COLUMN url SET DEFAULT '';
 ALTER TABLE sensitivity_species ALTER COLUMN category SET DEFAULT 1;
 -- eid
 -- pictogram
+ALTER TABLE sensitivity_species ALTER COLUMN period_mask SET DEFAULT 0;
 
 
 -- SensitiveArea
@@ -39,4 +40,7 @@ ALTER TABLE sensitivity_sensitivearea ALTER COLUMN contact SET DEFAULT '';
 ALTER TABLE maintenance_project ALTER COLUMN date_insert SET DEFAULT now();
 ALTER TABLE maintenance_project ALTER COLUMN date_update SET DEFAULT now();
 ALTER TABLE sensitivity_sensitivearea ALTER COLUMN provider SET DEFAULT '';
+-- geom_buffered
+-- area
+ALTER TABLE sensitivity_sensitivearea ALTER COLUMN period_mask SET DEFAULT 0;
 -- deleted
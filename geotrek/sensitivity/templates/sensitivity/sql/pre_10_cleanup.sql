@@ -2,3 +2,8 @@
 
 DROP VIEW IF EXISTS v_sensitivearea CASCADE;
 
+-- 20
+
+DROP FUNCTION IF EXISTS sensitivity_species_period_mask_iu() CASCADE;
+DROP FUNCTION IF EXISTS sensitivity_species_areas_u() CASCADE;
+DROP FUNCTION IF EXISTS sensitivity_sensitivearea_display_iu() CASCADE;
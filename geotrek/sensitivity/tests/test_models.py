@@ -1,7 +1,10 @@
+from datetime import datetime, timezone
+
 from django.test import TestCase
 from django.test.utils import override_settings
 from django.conf import settings
 
+from geotrek.sensitivity.models import SensitiveArea, Species
 from geotrek.sensitivity.tests.factories import SensitiveAreaFactory, SpeciesFactory
 from geotrek.trekking.tests.factories import TrekFactory
 
@@ -17,6 +20,45 @@ class SensitiveAreaModelTest(TestCase):
         sensitive_area = SensitiveAreaFactory.create()
         self.assertEqual(sensitive_area.radius, settings.SENSITIVITY_DEFAULT_RADIUS)
 
+    def test_display_geometry_polygon(self):
+        sensitive_area = SensitiveAreaFactory.create()
+        sensitive_area.refresh_from_db()
+        self.assertEqual(sensitive_area.geom_buffered, sensitive_area.geom)
+        self.assertAlmostEqual(sensitive_area.area, 9)
+
+    def test_display_geometry_point_follows_species_radius(self):
+        species = SpeciesFactory.create(radius=10)
+        sensitive_area = SensitiveAreaFactory.create(species=species, geom='SRID=2154;POINT (700000 6600000)')
+        sensitive_area.refresh_from_db()
+        self.assertEqual(sensitive_area.geom_buffered.geom_type, 'Polygon')
+        self.assertAlmostEqual(sensitive_area.geom_buffered.extent[2], 700010)
+        species.radius = 20
+        species.save()
+        sensitive_area.refresh_from_db()
+        self.assertAlmostEqual(sensitive_area.geom_buffered.extent[2], 700020)
+        self.assertGreater(sensitive_area.area, 1000)
+
+    def test_period_mask(self):
+        species = SpeciesFactory.create(period01=True, period06=False, period07=False, period12=True)
+        sensitive_area = SensitiveAreaFactory.create(species=species)
+        sensitive_area.refresh_from_db()
+        self.assertEqual(sensitive_area.period_mask, 0b100000000001)
+        self.assertEqual(Species.months_mask([1, 12]), 0b100000000001)
+        species.period12 = False
+        species.save()
+        sensitive_area.refresh_from_db()
+        self.assertEqual(sensitive_area.period_mask, Species.months_mask([1]))
+
+    def test_species_update_touches_areas_update_date(self):
+        species = SpeciesFactory.create(radius=10)
+        sensitive_area = SensitiveAreaFactory.create(species=species)
+        old_date = datetime(2000, 1, 1, tzinfo=timezone.utc)
+        SensitiveArea.objects.filter(pk=sensitive_area.pk).update(date_update=old_date)
+        species.radius = 20
+        species.save()
+        sensitive_area.refresh_from_db()
+        self.assertGreater(sensitive_area.date_update, old_date)
+
     def test_get_lang_published(self):
         sensitive_area = SensitiveAreaFactory.create()
         self.assertEqual(sensitive_area.published_langs, list(settings.MODELTRANSLATION_LANGUAGES))
@@ -3,7 +3,7 @@ import logging
 
 from django.conf import settings
 from django.contrib.gis.db.models.functions import Transform
-from django.db.models import F, Case, When
+from django.db.models import F
 from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404
 from django.views.generic.detail import BaseDetailView
@@ -11,9 +11,7 @@ from mapentity.views import (MapEntityCreate, MapEntityUpdate, MapEntityList, Ma
                              MapEntityDelete, MapEntityFormat, LastModifiedMixin)
 from rest_framework import permissions as rest_permissions, viewsets
 
-from geotrek.api.v2.functions import Buffer, Area
 from geotrek.authent.decorators import same_structure_required
-from geotrek.common.functions import GeometryType
 from geotrek.common.mixins.api import APIViewSet
 from geotrek.common.mixins.views import CustomColumnsMixin
 from geotrek.common.permissions import PublicOrReadPermMixin
@@ -123,14 +121,10 @@ class SensitiveAreaAPIViewSet(APIViewSet):
         qs = SensitiveArea.objects.existing()
         qs = qs.filter(published=True)
         qs = qs.prefetch_related('species')
-        qs = qs.annotate(geom_type=GeometryType(F('geom')))
-        qs = qs.annotate(geom2d_transformed=Case(
-            When(geom_type='POINT', then=Transform(Buffer(F('geom'), F('species__radius'), 4), settings.API_SRID)),
-            When(geom_type__in=('POLYGON', 'MULTIPOLYGON'), then=Transform(F('geom'), settings.API_SRID))
-        ))
+        qs = qs.annotate(geom2d_transformed=Transform(F('geom_buffered'), settings.API_SRID))
         # Ensure smaller areas are at the end of the list, ie above bigger areas on the map
         # to ensure we can select every area in case of overlapping
-        qs = qs.annotate(area=Area('geom2d_transformed')).order_by('-area')
+        qs = qs.order_by('-area')
 
         if 'practices' in self.request.GET:
             qs = qs.filter(species__practices__name__in=self.request.GET['practices'].split(','))
@@ -151,14 +145,10 @@ if 'geotrek.trekking' in settings.INSTALLED_APPS:
                 raise Http404
             qs = trek.published_sensitive_areas
             qs = qs.prefetch_related('species')
-            qs = qs.annotate(geom_type=GeometryType(F('geom')))
-            qs = qs.annotate(geom2d_transformed=Case(
-                When(geom_type='POINT', then=Transform(Buffer(F('geom'), F('species__radius'), 4), settings.API_SRID)),
-                When(geom_type='POLYGON', then=Transform(F('geom'), settings.API_SRID))
-            ))
+            qs = qs.annotate(geom2d_transformed=Transform(F('geom_buffered'), settings.API_SRID))
             # Ensure smaller areas are at the end of the list, ie above bigger areas on the map
             # to ensure we can select every area in case of overlapping
-            qs = qs.annotate(area=Area('geom2d_transformed')).order_by('-area')
+            qs = qs.order_by('-area')
 
             if 'practices' in self.request.GET:
                 qs = qs.filter(species__practices__name__in=self.request.GET['practices'].split(','))
@@ -178,14 +168,10 @@ if 'geotrek.diving' in settings.INSTALLED_APPS:
                 raise Http404
             qs = dive.published_sensitive_areas
             qs = qs.prefetch_related('species')
-            qs = qs.annotate(geom_type=GeometryType(F('geom')))
-            qs = qs.annotate(geom2d_transformed=Case(
-                When(geom_type='POINT', then=Transform(Buffer(F('geom'), F('species__radius'), 4), settings.API_SRID)),
-                When(geom_type='POLYGON', then=Transform(F('geom'), settings.API_SRID))
-            ))
+            qs = qs.annotate(geom2d_transformed=Transform(F('geom_buffered'), settings.API_SRID))
             # Ensure smaller areas are at the end of the list, ie above bigger areas on the map
             # to ensure we can select every area in case of overlapping
-            qs = qs.annotate(area=Area('geom2d_transformed')).order_by('-area')
+            qs = qs.order_by('-area')
 
             if 'practices' in self.request.GET:
                 qs = qs.filter(species__practices__name__in=self.request.GET['practices'].split(','))
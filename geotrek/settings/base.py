@@ -362,6 +362,13 @@ API_SRID = 4326
 
 # SRID displayed for the user (screens / pdf ...)
 DISPLAY_SRID = 3857
+
+# Simplified geometries of treks, paths and outdoor courses stored for two levels of detail (tolerance in SRID units),
+# served by API v2 and admin layers when ``zoom`` parameter is lower or equal to ``max_zoom``
+SIMPLIFIED_GEOMETRIES = {
+    'low': {'tolerance': 50, 'max_zoom': 10},
+    'medium': {'tolerance': 5, 'max_zoom': 13},
+}
 DISPLAY_COORDS_AS_DECIMALS = False
 
 # Extent in native projection (France area)
@@ -548,6 +555,8 @@ PATH_MODEL_ENABLED = True
 
 
 TREKKING_TOPOLOGY_ENABLED = True
+TOPOLOGY_DEFERRED_GEOM_UPDATE = False  # Compute geometries of topologies in background when paths change
+TOPOLOGY_GEOM_UPDATE_BATCH_SIZE = 50
 FLATPAGES_ENABLED = True
 TOURISM_ENABLED = True
 
@@ -622,6 +631,7 @@ MOBILE_TILES_RADIUS_SMALL = 0.005  # ~500 m
 MOBILE_TILES_GLOBAL_ZOOMS = list(range(13))
 MOBILE_TILES_LOW_ZOOMS = list(range(13, 15))
 MOBILE_TILES_HIGH_ZOOMS = list(range(15, 17))
+MOBILE_TILES_DOWNLOAD_WORKERS = 8  # Simultaneous tiles downloads
 MOBILE_CATEGORY_PICTO_SIZE = 32
 MOBILE_POI_PICTO_SIZE = 32
 MOBILE_INFORMATIONDESKTYPE_PICTO_SIZE = 32
@@ -751,6 +761,10 @@ THUMBNAIL_COPYRIGHT_FORMAT = ""
 # You can also add legend
 
 THUMBNAIL_COPYRIGHT_SIZE = 15
+
+# Generate thumbnails of pictures in background (celery) when they are uploaded or imported
+THUMBNAIL_PREGENERATE = True
+
 PAPERCLIP_MAX_ATTACHMENT_WIDTH = 1280
 PAPERCLIP_MAX_ATTACHMENT_HEIGHT = 1280
 PAPERCLIP_MIN_IMAGE_UPLOAD_WIDTH = None
@@ -16,7 +16,7 @@ from extended_choices import Choices
 from geotrek.authent.models import StructureRelated
 from geotrek.common.mixins.managers import NoDeleteManager
 from geotrek.common.mixins.models import (AddPropertyMixin, NoDeleteMixin, OptionalPictogramMixin, PictogramMixin,
-                                          PicturesMixin, PublishableMixin, TimeStampedModelMixin)
+                                          PicturesMixin, PublishableMixin, SearchIndexMixin, TimeStampedModelMixin)
 from geotrek.common.models import ReservationSystem, Theme
 from geotrek.common.utils import intersecting
 from geotrek.core.models import Topology
@@ -283,10 +283,12 @@ class TouristicContentManager(NoDeleteManager):
         return providers
 
 
-class TouristicContent(ZoningPropertiesMixin, AddPropertyMixin, PublishableMixin, MapEntityMixin, StructureRelated,
+class TouristicContent(SearchIndexMixin, ZoningPropertiesMixin, AddPropertyMixin, PublishableMixin, MapEntityMixin, StructureRelated,
                        TimeStampedModelMixin, PicturesMixin, NoDeleteMixin):
     """ A generic touristic content (accomodation, museum, etc.) in the park
     """
+    search_fields = (('name', 'A'), ('description_teaser', 'B'), ('description', 'C'))
+
     description_teaser = models.TextField(verbose_name=_("Description teaser"), blank=True,
                                           help_text=_("A brief summary"))
     description = models.TextField(verbose_name=_("Description"), blank=True,
@@ -403,10 +405,12 @@ class TouristicEventManager(NoDeleteManager):
         return providers
 
 
-class TouristicEvent(ZoningPropertiesMixin, AddPropertyMixin, PublishableMixin, MapEntityMixin, StructureRelated,
+class TouristicEvent(SearchIndexMixin, ZoningPropertiesMixin, AddPropertyMixin, PublishableMixin, MapEntityMixin, StructureRelated,
                      PicturesMixin, TimeStampedModelMixin, NoDeleteMixin):
     """ A touristic event (conference, workshop, etc.) in the park
     """
+    search_fields = (('name', 'A'), ('description_teaser', 'B'), ('description', 'C'))
+
     description_teaser = models.TextField(verbose_name=_("Description teaser"), blank=True,
                                           help_text=_("A brief summary"))
     description = models.TextField(verbose_name=_("Description"), blank=True,
@@ -50,6 +50,10 @@ class EauViveParser(TouristicContentApidaeParser):
     type2 = []
 
 
+class EauViveBulkParser(EauViveParser):
+    bulk = True
+
+
 class Provider1Parser(TouristicContentApidaeParser):
     category = "Eau vive"
     provider = "Provider1"
@@ -329,6 +333,43 @@ class ParserTests(TranslationResetMixin, TestCase):
         self.assertEqual(Attachment.objects.count(), 4)
         self.assertEqual(Attachment.objects.first().content_object, content)
 
+    @mock.patch('geotrek.common.parsers.requests.get')
+    def test_create_content_apidae_bulk(self, mocked):
+        def mocked_json():
+            filename = os.path.join(os.path.dirname(__file__), 'data', 'apidaeContent.json')
+            with open(filename, 'r') as f:
+                return json.load(f)
+        mocked.return_value.status_code = 200
+        mocked.return_value.json = mocked_json
+        mocked.return_value.content = b'Fake image'
+        FileType.objects.create(type="Photographie")
+        category = TouristicContentCategoryFactory(label="Eau vive")
+        TouristicContentType1Factory(label="Type A")
+        TouristicContentType1Factory(label="Type B")
+        call_command('import', 'geotrek.tourism.tests.test_parsers.EauViveBulkParser', verbosity=0)
+        self.assertEqual(TouristicContent.objects.count(), 1)
+        content = TouristicContent.objects.get()
+        self.assertEqual(content.eid, "479743")
+        self.assertEqual(content.name, "Quey' Raft")
+        self.assertTrue(content.published)
+        self.assertIsNotNone(content.publication_date)
+        self.assertEqual(content.category, category)
+        self.assertQuerysetEqual(
+            content.type1.all(),
+            ['<TouristicContentType1: Type A>', '<TouristicContentType1: Type B>']
+        )
+        self.assertEqual(Attachment.objects.count(), 4)
+        content.name = "Old name"
+        content.save()
+        content.type1.clear()
+        date_update = content.date_update
+        call_command('import', 'geotrek.tourism.tests.test_parsers.EauViveBulkParser', verbosity=0)
+        self.assertEqual(TouristicContent.objects.count(), 1)
+        content = TouristicContent.objects.get()
+        self.assertEqual(content.name, "Quey' Raft")
+        self.assertGreater(content.date_update, date_update)
+        self.assertEqual(content.type1.count(), 2)
+
     @mock.patch('geotrek.common.parsers.requests.get')
     def test_filetype_structure_none(self, mocked):
         def mocked_json():
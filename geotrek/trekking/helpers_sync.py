@@ -2,9 +2,9 @@ from django.conf import settings
 from django.db.models import Q
 
 import os
-from zipfile import ZipFile
 
 from geotrek.common import views as common_views
+from geotrek.common.helpers_sync import SyncZipFile
 from geotrek.trekking import views
 from geotrek.trekking import models
 
@@ -41,18 +41,68 @@ class SyncRando:
         if self.global_sync.portal:
             treks = treks.filter(Q(portal__name=self.global_sync.portal) | Q(portal=None))
 
-        for trek in treks:
-            self.sync_detail(lang, trek)
+        self.sync_globals(lang)
+        count = self.global_sync.sync_details(lang, self, treks)
+        # Global files were rendered once for this language instead of once per trek
+        self.global_sync.renders_avoided += len(self.global_views) * max(count - 1, 0)
+
+    global_views = ('parameters', 'themes', 'meta')
+
+    def sync_globals(self, lang):
+        """ Sync files which are the same for all treks of a language """
+        self.global_sync.sync_json(lang, common_views.ParametersView, 'parameters', zipfile=self.global_sync.zipfile)
+        self.global_sync.sync_json(lang, common_views.ThemeViewSet, 'themes', as_view_args=[{'get': 'list'}],
+                                   zipfile=self.global_sync.zipfile)
+        self.global_sync.sync_metas(lang, common_views.Meta)
+
+    def signature(self, lang, trek):
+        """ Data the synced files of a trek depend on, used by ``--incremental`` option """
+        stamp = self.global_sync.stamp
+        pois = trek.published_pois
+        values = [
+            self.global_sync.file_signature(os.path.join('api', lang, 'parameters.json')),
+            stamp([trek]),
+            stamp([trek.practice, trek.difficulty, trek.route, trek.accessibility_level]),
+            stamp(trek.themes.order_by('pk')),
+            stamp(trek.networks.order_by('pk')),
+            stamp(trek.labels.order_by('pk')),
+            stamp(trek.accessibilities.order_by('pk')),
+            stamp(trek.ratings.order_by('pk')),
+            stamp(trek.web_links.order_by('pk')),
+            stamp(trek.cities),
+            stamp(trek.districts),
+            stamp(trek.attachments.all()),
+            stamp(trek.parents),
+            stamp(trek.children),
+            stamp(pois),
+            [stamp(poi.attachments.all()) for poi in pois],
+            stamp(models.POIType.objects.filter(pois__in=pois.values('pk')).distinct().order_by('pk')),
+            stamp(trek.services),
+            stamp(models.ServiceType.objects.filter(services__in=trek.services.values('pk')).distinct().order_by('pk')),
+            list(trek.information_desks.values_list()),
+        ]
+        if not self.global_sync.skip_dem:
+            values.append(self.global_sync.dem_signature())
+        if self.global_sync.with_infrastructures:
+            values.append(stamp(trek.infrastructures))
+        if self.global_sync.with_signages:
+            values.append(stamp(trek.signages))
+        if self.global_sync.with_events:
+            values.append(stamp(trek.touristic_events.all()))
+            values.append([stamp(event.attachments.all()) for event in trek.touristic_events.all()])
+        if self.global_sync.categories:
+            values.append(stamp(trek.touristic_contents.all()))
+            values.append([stamp(content.attachments.all()) for content in trek.touristic_contents.all()])
+        if 'geotrek.sensitivity' in settings.INSTALLED_APPS:
+            values.append(stamp(trek.published_sensitive_areas))
+        return values
 
     def sync_detail(self, lang, trek):
         zipname = os.path.join('zip', 'treks', lang, '{pk}.zip'.format(pk=trek.pk))
         zipfullname = os.path.join(self.global_sync.tmp_root, zipname)
         self.global_sync.mkdirs(zipfullname)
-        self.trek_zipfile = ZipFile(zipfullname, 'w')
+        self.trek_zipfile = SyncZipFile(zipfullname, 'w')
 
-        self.global_sync.sync_json(lang, common_views.ParametersView, 'parameters', zipfile=self.global_sync.zipfile)
-        self.global_sync.sync_json(lang, common_views.ThemeViewSet, 'themes', as_view_args=[{'get': 'list'}],
-                                   zipfile=self.global_sync.zipfile)
         self.sync_trek_pois(lang, trek, zipfile=self.global_sync.zipfile)
         if self.global_sync.with_infrastructures:
             self.sync_trek_infrastructures(lang, trek)
@@ -62,7 +112,6 @@ class SyncRando:
         self.sync_trek_gpx(lang, trek)
         self.sync_trek_kml(lang, trek)
         self.global_sync.sync_metas(lang, views.TrekMeta, trek)
-        self.global_sync.sync_metas(lang, common_views.Meta)
         if settings.USE_BOOKLET_PDF:
             self.global_sync.sync_pdf(lang, trek, views.TrekDocumentBookletPublic.as_view(model=type(trek)))
         else:
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.test.client import RequestFactory
+from django.utils import translation
+
+from geotrek.trekking.models import Trek
+from geotrek.trekking.views import TrekDocumentBookletPublic, TrekDocumentPublic
+
+
+class Command(BaseCommand):
+    help = "Render public PDF documents of published treks ahead of time. Up-to-date documents are not rendered again."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', '-u', dest='url', default='http://localhost', help='Base url')
+        parser.add_argument('--portal', '-P', dest='portals', action='append', default=[],
+                            help="Also render documents for this portal (can be repeated)")
+        parser.add_argument('--booklet', action='store_true', default=settings.USE_BOOKLET_PDF,
+                            help="Render booklet documents (default: USE_BOOKLET_PDF setting)")
+
+    def handle(self, *args, **options):
+        url = options['url']
+        if not url.startswith('http://') and not url.startswith('https://'):
+            raise CommandError('url parameter should start with http:// or https://')
+        secure = url.startswith('https://')
+        host = url.split('://')[1].rstrip('/')
+        factory = RequestFactory()
+        view_class = TrekDocumentBookletPublic if options['booklet'] else TrekDocumentPublic
+        view = view_class.as_view(model=Trek)
+        count = 0
+        failed = 0
+        for trek in Trek.objects.existing().order_by('pk'):
+            for lang in trek.published_langs:
+                for portal in [None] + options['portals']:
+                    params = {'portal': portal} if portal else {}
+                    request = factory.get('/', params, HTTP_HOST=host, secure=secure)
+                    request.LANGUAGE_CODE = lang
+                    request.user = AnonymousUser()
+                    translation.activate(lang)
+                    try:
+                        response = view(request, pk=trek.pk, slug=trek.slug, lang=lang)
+                    except Exception as e:
+                        response = None
+                        if options['verbosity'] > 0:
+                            self.stderr.write("{trek} ({lang}): {error}".format(trek=trek, lang=lang, error=e))
+                    finally:
+                        translation.deactivate()
+                    if response is not None and response.status_code == 200:
+                        count += 1
+                    else:
+                        failed += 1
+                    if response is not None:
+                        response.close()
+        if options['verbosity'] > 0:
+            self.stdout.write("{count} documents up to date, {failed} failed".format(count=count, failed=failed))
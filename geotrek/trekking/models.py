@@ -19,7 +19,8 @@ from mapentity.serializers import plain_text
 from geotrek.authent.models import StructureRelated
 from geotrek.core.models import Path, Topology, TopologyManager, simplify_coords
 from geotrek.common.utils import intersecting, classproperty
-from geotrek.common.mixins.models import PicturesMixin, PublishableMixin, PictogramMixin, OptionalPictogramMixin
+from geotrek.common.mixins.models import (PicturesMixin, PublishableMixin, PictogramMixin, OptionalPictogramMixin,
+                                          SearchIndexMixin)
 from geotrek.common.mixins.managers import NoDeleteManager
 from geotrek.common.models import Theme, ReservationSystem, RatingMixin, RatingScaleMixin
 from geotrek.common.templatetags import geotrek_tags
@@ -118,7 +119,10 @@ class TrekManager(TopologyManager):
         return providers
 
 
-class Trek(Topology, StructureRelated, PicturesMixin, PublishableMixin, MapEntityMixin):
+class Trek(SearchIndexMixin, Topology, StructureRelated, PicturesMixin, PublishableMixin, MapEntityMixin):
+    search_fields = (
+        ('name', 'A'), ('description_teaser', 'B'), ('ambiance', 'C'), ('description', 'C'),
+    )
     topo_object = models.OneToOneField(Topology, parent_link=True, on_delete=models.CASCADE)
     departure = models.CharField(verbose_name=_("Departure"), max_length=128, blank=True,
                                  help_text=_("Departure description"))
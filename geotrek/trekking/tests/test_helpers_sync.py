@@ -141,3 +141,16 @@ class SyncRandoTestCase(TestCase):
             synchro.sync('fr')
         self.assertEqual(len(mock_trek.call_args_list), 1)
         mock_trek.assert_called_with('fr', self.trek_fr)
+
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_sync_language_global_files_rendered_once(self, stdout, mock_prepare):
+        command = FakeSyncCommand()
+        synchro = SyncRando(command)
+        with patch.object(command, 'sync_json', wraps=command.sync_json) as mock_json, \
+                patch('geotrek.trekking.helpers_sync.SyncRando.sync_detail') as mock_trek:
+            synchro.sync('en')
+        self.assertEqual(len([call for call in mock_json.call_args_list if call[0][2] == 'parameters']), 1)
+        self.assertTrue(os.path.exists(os.path.join(command.tmp_root, 'api', 'en', 'parameters.json')))
+        self.assertTrue(os.path.exists(os.path.join(command.tmp_root, 'meta', 'en', 'index.html')))
+        self.assertGreater(mock_trek.call_count, 1)
+        self.assertEqual(command.renders_avoided, 3 * (mock_trek.call_count - 1))
@@ -43,7 +43,7 @@ from .factories import (POIFactory, POITypeFactory, TrekFactory, TrekWithPOIsFac
                         TrekNetworkFactory, WebLinkFactory, AccessibilityFactory,
                         TrekRelationshipFactory, ServiceFactory, ServiceTypeFactory,
                         TrekWithServicesFactory, TrekWithInfrastructuresFactory,
-                        TrekWithSignagesFactory)
+                        TrekWithSignagesFactory, TrekWithPublishedPOIsFactory, PracticeFactory)
 from ..models import POI, Trek, Service, OrderedTrekChild
 
 
@@ -1536,6 +1536,59 @@ class ServiceJSONTest(TrekkingManagerTest):
                               })
 
 
+class TrekDocumentPublicCacheTest(TestCase):
+    @mock.patch('mapentity.helpers.requests.get')
+    def test_document_stored_until_trek_changes(self, mock_get):
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.content = b'xxx'
+        trek = TrekWithPublishedPOIsFactory.create(published=True)
+        url = reverse('trekking:trek_printable', kwargs={'lang': 'fr', 'pk': trek.pk, 'slug': trek.slug})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        path = response[settings.MAPENTITY_CONFIG['SENDFILE_HTTP_HEADER']]
+        self.assertTrue(path.startswith('{}documents/trek/{}/'.format(settings.MEDIA_URL_SECURE, trek.pk)))
+        stored = os.path.join(settings.MEDIA_ROOT, path[len(settings.MEDIA_URL_SECURE):])
+        self.assertTrue(os.path.exists(stored))
+        # Stored document is served without rendering it again
+        with self.assertTemplateNotUsed('trekking/trek_public_pdf.html'):
+            response = self.client.get(url)
+        self.assertEqual(response[settings.MAPENTITY_CONFIG['SENDFILE_HTTP_HEADER']], path)
+        # Document is rendered again when a POI of trek is depublished
+        poi = trek.published_pois.first()
+        poi.published = False
+        poi.save()
+        with self.assertTemplateUsed('trekking/trek_public_pdf.html'):
+            response = self.client.get(url)
+        self.assertNotEqual(response[settings.MAPENTITY_CONFIG['SENDFILE_HTTP_HEADER']], path)
+        self.assertFalse(os.path.exists(stored))
+
+    @mock.patch('mapentity.helpers.requests.get')
+    def test_document_stored_until_related_objects_change(self, mock_get):
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.content = b'xxx'
+        desk = tourism_factories.InformationDeskFactory.create()
+        trek = TrekFactory.create(published=True, practice=PracticeFactory.create())
+        trek.information_desks.add(desk)
+        url = reverse('trekking:trek_printable', kwargs={'lang': 'fr', 'pk': trek.pk, 'slug': trek.slug})
+        path = self.client.get(url)[settings.MAPENTITY_CONFIG['SENDFILE_HTTP_HEADER']]
+        # Signature is stable while nothing changes
+        with self.assertTemplateNotUsed('trekking/trek_public_pdf.html'):
+            response = self.client.get(url)
+        self.assertEqual(response[settings.MAPENTITY_CONFIG['SENDFILE_HTTP_HEADER']], path)
+        # Information desks and practices have no update date
+        desk.name = "Renamed desk"
+        desk.save()
+        with self.assertTemplateUsed('trekking/trek_public_pdf.html'):
+            response = self.client.get(url)
+        self.assertNotEqual(response[settings.MAPENTITY_CONFIG['SENDFILE_HTTP_HEADER']], path)
+        path = response[settings.MAPENTITY_CONFIG['SENDFILE_HTTP_HEADER']]
+        trek.practice.name = "Renamed practice"
+        trek.practice.save()
+        with self.assertTemplateUsed('trekking/trek_public_pdf.html'):
+            response = self.client.get(url)
+        self.assertNotEqual(response[settings.MAPENTITY_CONFIG['SENDFILE_HTTP_HEADER']], path)
+
+
 class TestDepublishSignagesRemovedFromPDF(TestCase):
 
     def setUp(self):
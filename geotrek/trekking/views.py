@@ -1,6 +1,7 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.contrib.gis.db.models.functions import Transform
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.gis.db.models.functions import AsWKT, Transform
 from django.db.models import Q
 from django.db.models.query import Prefetch
 from django.http import HttpResponse, Http404
@@ -19,11 +20,11 @@ from geotrek.authent.decorators import same_structure_required
 from geotrek.common.forms import AttachmentAccessibilityForm
 from geotrek.common.mixins.api import APIViewSet
 from geotrek.common.mixins.forms import FormsetMixin
-from geotrek.common.mixins.views import CompletenessMixin, CustomColumnsMixin, MetaMixin
+from geotrek.common.mixins.views import CompletenessMixin, CustomColumnsMixin, DocumentPublicCacheMixin, MetaMixin
 from geotrek.common.models import Attachment, RecordSource, TargetPortal, Label
 from geotrek.common.permissions import PublicOrReadPermMixin
 from geotrek.common.views import DocumentPublic, DocumentBookletPublic, MarkupPublic
-from geotrek.common.viewsets import GeotrekMapentityViewSet
+from geotrek.common.viewsets import GeotrekMapentityViewSet, SimplifiedGeometryMixin
 from geotrek.core.models import AltimetryMixin
 from geotrek.core.views import CreateFromTopologyMixin
 from geotrek.infrastructure.models import Infrastructure
@@ -34,7 +35,7 @@ from geotrek.zoning.models import District, City, RestrictedArea
 
 from .filters import TrekFilterSet, POIFilterSet, ServiceFilterSet
 from .forms import TrekForm, TrekRelationshipFormSet, POIForm, WebLinkCreateFormPopup, ServiceForm
-from .models import Trek, POI, WebLink, Service, TrekRelationship, OrderedTrekChild
+from .models import Trek, POI, WebLink, Service, TrekRelationship, OrderedTrekChild, Practice, DifficultyLevel
 from .serializers import (TrekGPXSerializer, TrekSerializer, POISerializer, ServiceSerializer, POIAPIGeojsonSerializer,
                           ServiceAPIGeojsonSerializer, TrekAPISerializer, TrekAPIGeojsonSerializer, POIAPISerializer,
                           ServiceAPISerializer, TrekGeojsonSerializer, POIGeojsonSerializer, ServiceGeojsonSerializer)
@@ -191,11 +192,39 @@ class TrekDocumentPublicMixin:
         return super().render_to_response(context, **response_kwargs)
 
 
-class TrekDocumentPublic(TrekDocumentPublicMixin, DocumentPublic):
+class TrekDocumentPublicCacheMixin(DocumentPublicCacheMixin):
+    def get_document_signature(self, obj):
+        signature = super().get_document_signature(obj)
+        pois = list(obj.published_pois.order_by('pk').values_list('pk', 'date_update'))
+        signature.append(pois)
+        signature.append(list(obj.published_infrastructures.order_by('pk').values_list('pk', 'date_update')))
+        signature.append(list(obj.published_signages.order_by('pk').values_list('pk', 'date_update')))
+        # Information desks and categories have no update date, their printed values are used instead
+        # (explicit columns: repr() of geometries is not stable)
+        signature.append(list(obj.information_desks.order_by('pk').values_list(
+            'pk', 'name', 'type', 'description', 'phone', 'email', 'website', 'photo', 'street', 'postal_code',
+            'municipality', 'accessibility', 'label_accessibility', AsWKT('geom'))))
+        signature.append(list(Practice.objects.filter(pk=obj.practice_id).values_list('pk', 'name', 'pictogram')))
+        signature.append(list(DifficultyLevel.objects.filter(pk=obj.difficulty_id)
+                              .values_list('pk', 'difficulty', 'pictogram')))
+        signature.append(list(obj.themes.order_by('pk').values_list('pk', 'label', 'pictogram')))
+        signature.append(list(obj.labels.order_by('pk').values_list('pk', 'name', 'advice', 'pictogram')))
+        signature.append(list(obj.networks.order_by('pk').values_list('pk', 'network', 'pictogram')))
+        signature.append(list(obj.accessibilities.order_by('pk').values_list('pk', 'name', 'pictogram')))
+        signature.append([(city.pk, city.name) for city in obj.cities])
+        attachments = Attachment.objects.filter(
+            Q(content_type=ContentType.objects.get_for_model(Trek), object_id=obj.pk)
+            | Q(content_type=ContentType.objects.get_for_model(POI), object_id__in=[pk for pk, date_update in pois])
+        )
+        signature.append(list(attachments.order_by('pk').values_list('pk', 'date_update')))
+        return signature
+
+
+class TrekDocumentPublic(TrekDocumentPublicMixin, TrekDocumentPublicCacheMixin, DocumentPublic):
     pass
 
 
-class TrekDocumentBookletPublic(TrekDocumentPublicMixin, DocumentBookletPublic):
+class TrekDocumentBookletPublic(TrekDocumentPublicMixin, TrekDocumentPublicCacheMixin, DocumentBookletPublic):
     pass
 
 
@@ -235,7 +264,7 @@ class TrekMeta(MetaMixin, DetailView):
     template_name = 'trekking/trek_meta.html'
 
 
-class TrekViewSet(GeotrekMapentityViewSet):
+class TrekViewSet(SimplifiedGeometryMixin, GeotrekMapentityViewSet):
     model = Trek
     serializer_class = TrekSerializer
     geojson_serializer_class = TrekGeojsonSerializer
@@ -244,7 +273,7 @@ class TrekViewSet(GeotrekMapentityViewSet):
     def get_queryset(self):
         qs = self.model.objects.existing()
         if self.format_kwarg == 'geojson':
-            qs = qs.annotate(api_geom=Transform('geom', settings.API_SRID))
+            qs = qs.annotate(api_geom=self.simplified_api_geom())
             qs = qs.only('id', 'name', 'published')
         else:
             qs = qs.prefetch_related('attachments')
@@ -0,0 +1,53 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zoning', '0101_auto_20220913_1542'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CityIntersection',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_table', models.CharField(max_length=64)),
+                ('object_id', models.IntegerField()),
+                ('city_code', models.CharField(max_length=6)),
+            ],
+            options={
+                'abstract': False,
+                'default_permissions': (),
+            },
+        ),
+        migrations.CreateModel(
+            name='DistrictIntersection',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_table', models.CharField(max_length=64)),
+                ('object_id', models.IntegerField()),
+                ('district_id', models.IntegerField()),
+            ],
+            options={
+                'abstract': False,
+                'default_permissions': (),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='cityintersection',
+            index=models.Index(fields=['city_code', 'object_table', 'object_id'], name='cityintersection_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cityintersection',
+            index=models.Index(fields=['object_table', 'object_id'], name='cityintersection_object_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='districtintersection',
+            index=models.Index(fields=['district_id', 'object_table', 'object_id'], name='districtintersection_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='districtintersection',
+            index=models.Index(fields=['object_table', 'object_id'], name='districtinters_object_idx'),
+        ),
+    ]
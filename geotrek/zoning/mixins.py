@@ -1,7 +1,23 @@
+from collections import defaultdict
+
+from django.db import connection
 from django.utils.translation import gettext_lazy as _
 
 from geotrek.common.utils import intersecting, uniquify
-from .models import RestrictedArea, District, City
+from .models import RestrictedArea, District, City, CityIntersection, DistrictIntersection, ZoneIntersection
+
+
+ZONING_MODELS = {
+    'areas': RestrictedArea,
+    'districts': District,
+    'cities': City,
+}
+
+# Tables of intersections maintained by triggers, and their column referencing zones
+INTERSECTION_MODELS = {
+    'districts': (DistrictIntersection, 'district_id'),
+    'cities': (CityIntersection, 'city_code'),
+}
 
 
 class ZoningPropertiesMixin:
@@ -11,17 +27,23 @@ class ZoningPropertiesMixin:
     def zoning_property(self):
         return self
 
+    def _zoning(self, name):
+        prefetched = getattr(self, '_prefetched_zoning', {})
+        if name in prefetched:
+            return prefetched[name]
+        return uniquify(intersecting(ZONING_MODELS[name], self.zoning_property, distance=0, defer=('geom',)))
+
     @property
     def areas(self):
-        return uniquify(intersecting(RestrictedArea, self.zoning_property, distance=0, defer=('geom',)))
+        return self._zoning('areas')
 
     @property
     def districts(self):
-        return uniquify(intersecting(District, self.zoning_property, distance=0, defer=('geom',)))
+        return self._zoning('districts')
 
     @property
     def cities(self):
-        return uniquify(intersecting(City, self.zoning_property, distance=0, defer=('geom',)))
+        return self._zoning('cities')
 
     @property
     def published_areas(self):
@@ -40,3 +62,93 @@ class ZoningPropertiesMixin:
         if not hasattr(self, 'published'):
             return self.cities
         return [city for city in self.cities if city.published]
+
+
+def prefetch_zoning(objects, properties=tuple(ZONING_MODELS)):
+    """
+    Compute zoning properties (``cities``, ``districts``, ``areas``) of many objects at once,
+    with one query per zoning layer instead of one query per object and property.
+    Cities and districts of objects whose intersections are maintained by triggers are read from
+    ``CityIntersection`` and ``DistrictIntersection`` tables, other ones are computed with a spatial join.
+    Objects can be a queryset, they are returned as a list.
+    """
+    objects = list(objects)
+    targets = {}
+    for obj in objects:
+        if not isinstance(obj, ZoningPropertiesMixin):
+            continue
+        obj._prefetched_zoning = getattr(obj, '_prefetched_zoning', {})
+        target = obj.zoning_property
+        if target is not None and target.geom:
+            targets[id(obj)] = target
+    object_tables = ZoneIntersection.object_tables()
+    for name in properties:
+        model = ZONING_MODELS[name]
+        intersection = INTERSECTION_MODELS.get(name)
+        stored, computed = [], []
+        for key, target in targets.items():
+            if intersection and intersection[0].object_table_of(type(target)) in object_tables:
+                stored.append(key)
+            else:
+                computed.append(key)
+        rows = []
+        if stored:
+            rows += _stored_zones(model, intersection, [targets[key] for key in stored])
+        if computed:
+            rows += _computed_zones(model, [targets[key] for key in computed], offset=len(stored))
+        keys = stored + computed
+        zones = list(model.objects.filter(pk__in=set(row[1] for row in rows)).defer('geom'))
+        # Keep default ordering of zoning layer for objects which are not lines, like ``intersecting()``
+        ranks = {zone.pk: rank for rank, zone in enumerate(zones)}
+        zones = {zone.pk: zone for zone in zones}
+        intersections = defaultdict(list)
+        for idx, pk, position in rows:
+            intersections[keys[idx]].append((position or 0, ranks[pk], zones[pk]))
+        for obj in objects:
+            if isinstance(obj, ZoningPropertiesMixin):
+                obj._prefetched_zoning[name] = [zone for position, rank, zone in sorted(intersections[id(obj)])]
+    return objects
+
+
+# Position of first intersection along lines, to order zones like ``intersecting()``
+ZONE_POSITION_SQL = """
+    SELECT o.idx, z.{pk}, MIN(ST_LineLocatePoint(o.geom, ST_StartPoint(d.geom))) AS position
+    FROM {source}
+    LEFT JOIN LATERAL (
+        SELECT (ST_Dump(ST_Intersection(o.geom, z.geom))).geom
+        WHERE GeometryType(o.geom) = 'LINESTRING'
+    ) d ON TRUE
+    GROUP BY o.idx, z.{pk}
+"""
+
+
+def _stored_zones(model, intersection, targets):
+    """ Rows (index of target, zone pk, position) of zones intersecting targets, read from intersection table """
+    intersection_model, zone_column = intersection
+    source = """
+        unnest(%s::integer[], %s::varchar[], %s::integer[], %s::geometry[]) AS o(idx, object_table, object_id, geom)
+        JOIN {intersection} i ON i.object_table = o.object_table AND i.object_id = o.object_id
+        JOIN {table} z ON z.{pk} = i.{zone_column}
+    """.format(intersection=intersection_model._meta.db_table, table=model._meta.db_table,
+               pk=model._meta.pk.column, zone_column=zone_column)
+    params = [
+        list(range(len(targets))),
+        [intersection_model.object_table_of(type(target)) for target in targets],
+        [target.pk for target in targets],
+        [target.geom.hexewkb.decode() for target in targets],
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(ZONE_POSITION_SQL.format(pk=model._meta.pk.column, source=source), params)
+        return cursor.fetchall()
+
+
+def _computed_zones(model, targets, offset=0):
+    """ Rows (offset + index of target, zone pk, position) of zones intersecting targets, with a spatial join """
+    source = """
+        unnest(%s::integer[], %s::geometry[]) AS o(idx, geom)
+        JOIN {table} z ON ST_Intersects(o.geom, z.geom)
+    """.format(table=model._meta.db_table)
+    params = [list(range(offset, offset + len(targets))), [target.geom.hexewkb.decode() for target in targets]]
+    with connection.cursor() as cursor:
+        cursor.execute(ZONE_POSITION_SQL.format(pk=model._meta.pk.column, source=source), params)
+        return cursor.fetchall()
@@ -79,3 +79,51 @@ class District(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class ZoneIntersection(models.Model):
+    """
+    Object intersecting a zone, maintained by triggers when geometries of objects or zones change
+    (see zoning/sql/post_30_intersections.sql), to filter objects by zone without spatial join.
+    Objects are identified by the table of their geometry, ``core_topology`` for treks.
+    """
+    object_table = models.CharField(max_length=64)
+    object_id = models.IntegerField()
+
+    class Meta:
+        abstract = True
+        default_permissions = ()
+
+    @classmethod
+    def object_table_of(cls, model):
+        return model._meta.get_field('geom').model._meta.db_table
+
+    @classmethod
+    def object_tables(cls):
+        """ Tables of objects whose intersections are maintained, like ``v_zoning_objects`` view """
+        tables = {'core_topology'}
+        if 'geotrek.tourism' in settings.INSTALLED_APPS:
+            tables |= {'tourism_touristiccontent', 'tourism_touristicevent'}
+        if 'geotrek.outdoor' in settings.INSTALLED_APPS:
+            tables |= {'outdoor_site', 'outdoor_course'}
+        return tables
+
+
+class CityIntersection(ZoneIntersection):
+    city_code = models.CharField(max_length=6)
+
+    class Meta(ZoneIntersection.Meta):
+        indexes = [
+            models.Index(name='cityintersection_idx', fields=['city_code', 'object_table', 'object_id']),
+            models.Index(name='cityintersection_object_idx', fields=['object_table', 'object_id']),
+        ]
+
+
+class DistrictIntersection(ZoneIntersection):
+    district_id = models.IntegerField()
+
+    class Meta(ZoneIntersection.Meta):
+        indexes = [
+            models.Index(name='districtintersection_idx', fields=['district_id', 'object_table', 'object_id']),
+            models.Index(name='districtinters_object_idx', fields=['object_table', 'object_id']),
+        ]
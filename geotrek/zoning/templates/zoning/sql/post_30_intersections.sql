@@ -0,0 +1,139 @@
+-------------------------------------------------------------------------------
+-- Keep intersections of objects with cities and districts up to date
+-------------------------------------------------------------------------------
+
+CREATE FUNCTION {{ schema_geotrek }}.zoning_intersections_iu() RETURNS trigger SECURITY DEFINER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW.geom IS NOT DISTINCT FROM OLD.geom THEN
+        RETURN NULL;
+    END IF;
+    DELETE FROM zoning_cityintersection WHERE object_table = TG_TABLE_NAME AND object_id = NEW.id;
+    DELETE FROM zoning_districtintersection WHERE object_table = TG_TABLE_NAME AND object_id = NEW.id;
+    INSERT INTO zoning_cityintersection (object_table, object_id, city_code)
+        SELECT TG_TABLE_NAME, NEW.id, code FROM zoning_city WHERE ST_Intersects(geom, NEW.geom);
+    INSERT INTO zoning_districtintersection (object_table, object_id, district_id)
+        SELECT TG_TABLE_NAME, NEW.id, id FROM zoning_district WHERE ST_Intersects(geom, NEW.geom);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION {{ schema_geotrek }}.zoning_intersections_d() RETURNS trigger SECURITY DEFINER AS $$
+BEGIN
+    DELETE FROM zoning_cityintersection WHERE object_table = TG_TABLE_NAME AND object_id = OLD.id;
+    DELETE FROM zoning_districtintersection WHERE object_table = TG_TABLE_NAME AND object_id = OLD.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_topology_zoning_intersections_iu_tgr
+AFTER INSERT OR UPDATE OF geom ON core_topology
+FOR EACH ROW EXECUTE PROCEDURE zoning_intersections_iu();
+
+CREATE TRIGGER core_topology_zoning_intersections_d_tgr
+AFTER DELETE ON core_topology
+FOR EACH ROW EXECUTE PROCEDURE zoning_intersections_d();
+
+{% if 'geotrek.tourism' in INSTALLED_APPS %}
+CREATE TRIGGER tourism_touristiccontent_zoning_intersections_iu_tgr
+AFTER INSERT OR UPDATE OF geom ON tourism_touristiccontent
+FOR EACH ROW EXECUTE PROCEDURE zoning_intersections_iu();
+
+CREATE TRIGGER tourism_touristiccontent_zoning_intersections_d_tgr
+AFTER DELETE ON tourism_touristiccontent
+FOR EACH ROW EXECUTE PROCEDURE zoning_intersections_d();
+
+CREATE TRIGGER tourism_touristicevent_zoning_intersections_iu_tgr
+AFTER INSERT OR UPDATE OF geom ON tourism_touristicevent
+FOR EACH ROW EXECUTE PROCEDURE zoning_intersections_iu();
+
+CREATE TRIGGER tourism_touristicevent_zoning_intersections_d_tgr
+AFTER DELETE ON tourism_touristicevent
+FOR EACH ROW EXECUTE PROCEDURE zoning_intersections_d();
+{% endif %}
+
+{% if 'geotrek.outdoor' in INSTALLED_APPS %}
+CREATE TRIGGER outdoor_site_zoning_intersections_iu_tgr
+AFTER INSERT OR UPDATE OF geom ON outdoor_site
+FOR EACH ROW EXECUTE PROCEDURE zoning_intersections_iu();
+
+CREATE TRIGGER outdoor_site_zoning_intersections_d_tgr
+AFTER DELETE ON outdoor_site
+FOR EACH ROW EXECUTE PROCEDURE zoning_intersections_d();
+
+CREATE TRIGGER outdoor_course_zoning_intersections_iu_tgr
+AFTER INSERT OR UPDATE OF geom ON outdoor_course
+FOR EACH ROW EXECUTE PROCEDURE zoning_intersections_iu();
+
+CREATE TRIGGER outdoor_course_zoning_intersections_d_tgr
+AFTER DELETE ON outdoor_course
+FOR EACH ROW EXECUTE PROCEDURE zoning_intersections_d();
+{% endif %}
+
+
+-- Objects intersecting a city or a district
+
+CREATE VIEW {{ schema_geotrek }}.v_zoning_objects AS
+SELECT 'core_topology'::varchar AS object_table, id AS object_id, geom FROM core_topology
+{% if 'geotrek.tourism' in INSTALLED_APPS %}
+UNION ALL SELECT 'tourism_touristiccontent', id, geom FROM tourism_touristiccontent
+UNION ALL SELECT 'tourism_touristicevent', id, geom FROM tourism_touristicevent
+{% endif %}
+{% if 'geotrek.outdoor' in INSTALLED_APPS %}
+UNION ALL SELECT 'outdoor_site', id, geom FROM outdoor_site
+UNION ALL SELECT 'outdoor_course', id, geom FROM outdoor_course
+{% endif %}
+;
+
+CREATE FUNCTION {{ schema_geotrek }}.zoning_city_intersections_iud() RETURNS trigger SECURITY DEFINER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW.geom IS NOT DISTINCT FROM OLD.geom AND NEW.code = OLD.code THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM zoning_cityintersection WHERE city_code = OLD.code;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO zoning_cityintersection (object_table, object_id, city_code)
+            SELECT object_table, object_id, NEW.code FROM v_zoning_objects WHERE ST_Intersects(geom, NEW.geom);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER zoning_city_intersections_iud_tgr
+AFTER INSERT OR UPDATE OF geom, code OR DELETE ON zoning_city
+FOR EACH ROW EXECUTE PROCEDURE zoning_city_intersections_iud();
+
+CREATE FUNCTION {{ schema_geotrek }}.zoning_district_intersections_iud() RETURNS trigger SECURITY DEFINER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW.geom IS NOT DISTINCT FROM OLD.geom THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM zoning_districtintersection WHERE district_id = OLD.id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO zoning_districtintersection (object_table, object_id, district_id)
+            SELECT object_table, object_id, NEW.id FROM v_zoning_objects WHERE ST_Intersects(geom, NEW.geom);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER zoning_district_intersections_iud_tgr
+AFTER INSERT OR UPDATE OF geom OR DELETE ON zoning_district
+FOR EACH ROW EXECUTE PROCEDURE zoning_district_intersections_iud();
+
+
+-- Intersections of objects which have none yet are computed (existing objects, or objects saved
+-- while triggers were dropped during migrations), other intersections are kept
+
+INSERT INTO zoning_cityintersection (object_table, object_id, city_code)
+    SELECT o.object_table, o.object_id, c.code FROM v_zoning_objects o JOIN zoning_city c ON ST_Intersects(c.geom, o.geom)
+    WHERE NOT EXISTS (SELECT 1 FROM zoning_cityintersection i
+                      WHERE i.object_table = o.object_table AND i.object_id = o.object_id);
+
+INSERT INTO zoning_districtintersection (object_table, object_id, district_id)
+    SELECT o.object_table, o.object_id, d.id FROM v_zoning_objects o JOIN zoning_district d ON ST_Intersects(d.geom, o.geom)
+    WHERE NOT EXISTS (SELECT 1 FROM zoning_districtintersection i
+                      WHERE i.object_table = o.object_table AND i.object_id = o.object_id);
@@ -1,8 +1,12 @@
 from django.conf import settings
 from django.test import TestCase
 
+from geotrek.core.models import Path
 from geotrek.core.tests.factories import PathFactory
+from geotrek.trekking.models import Trek
 from geotrek.trekking.tests.factories import TrekFactory
+from geotrek.zoning.mixins import prefetch_zoning
+from geotrek.zoning.models import CityIntersection
 from geotrek.zoning.tests.factories import CityFactory, DistrictFactory, RestrictedAreaFactory
 
 
@@ -89,3 +93,33 @@ class ZoningPropertiesMixinTest(TestCase):
         self.assertEqual(len(self.path.areas), 2)
         self.assertQuerysetEqual(self.path.published_areas, [repr(area), repr(self.area)])
         self.assertEqual(len(self.path.published_areas), 2)
+
+    def test_prefetch_zoning(self):
+        city = CityFactory.create(published=False, geom=self.geom_2_wkt)
+        self.path.reverse()
+        self.path.save()
+        path = Path.objects.get(pk=self.path.pk)
+        other = PathFactory.create(geom='SRID=2154;LINESTRING(1000000 300000, 1000000 400000)')
+        with self.assertNumQueries(7):
+            paths = prefetch_zoning(Path.objects.filter(pk__in=[path.pk, other.pk]).order_by('pk'))
+        with self.assertNumQueries(0):
+            self.assertEqual(paths[0].cities, [city, self.city])
+            self.assertEqual(paths[0].districts, [self.district])
+            self.assertEqual(paths[0].areas, [self.area])
+            self.assertEqual(paths[1].cities, [city])
+            self.assertEqual(paths[1].published_districts, [])
+        self.assertEqual(paths[0].cities, path.cities)
+
+    def test_prefetch_zoning_from_intersections(self):
+        city = CityFactory.create(published=False, geom=self.geom_2_wkt)
+        trek = Trek.objects.get(pk=self.trek.pk)
+        with self.assertNumQueries(6):
+            treks = prefetch_zoning([trek])
+        with self.assertNumQueries(0):
+            self.assertEqual(treks[0].cities, [self.city, city])
+            self.assertEqual(treks[0].districts, [self.district])
+            self.assertEqual(treks[0].areas, [self.area])
+        # Cities and districts are read from intersections maintained by triggers
+        CityIntersection.objects.filter(object_table='core_topology', object_id=trek.pk, city_code=city.pk).delete()
+        treks = prefetch_zoning([Trek.objects.get(pk=self.trek.pk)])
+        self.assertEqual(treks[0].cities, [self.city])
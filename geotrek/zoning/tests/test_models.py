@@ -5,7 +5,8 @@ from django.contrib.gis.geos import LineString, Polygon, Point, MultiPolygon
 
 from geotrek.core.tests.factories import PathFactory
 from geotrek.signage.tests.factories import SignageFactory
-from geotrek.zoning.models import City
+from geotrek.trekking.tests.factories import TrekFactory
+from geotrek.zoning.models import City, CityIntersection, DistrictIntersection
 from geotrek.zoning.tests.factories import CityFactory, DistrictFactory, RestrictedAreaFactory, RestrictedAreaTypeFactory
 
 
@@ -301,3 +302,49 @@ class ZoningModelsTest(TestCase):
                                                        geom=MultiPolygon(Polygon(((201, 0), (300, 0), (300, 100), (200, 100), (201, 0)),
                                                                                  srid=settings.SRID)))
         self.assertEqual(str(restricted_area), "Test - Tel")
+
+
+class ZoneIntersectionTest(TestCase):
+    square = MultiPolygon(Polygon(((0, 0), (10, 0), (10, 10), (0, 10), (0, 0)), srid=settings.SRID))
+    far_square = MultiPolygon(Polygon(((20, 20), (30, 20), (30, 30), (20, 30), (20, 20)), srid=settings.SRID))
+
+    def setUp(self):
+        if settings.TREKKING_TOPOLOGY_ENABLED:
+            self.path = PathFactory.create(geom=LineString((1, 1), (2, 2), srid=settings.SRID))
+            self.trek = TrekFactory.create(paths=[self.path])
+        else:
+            self.trek = TrekFactory.create(geom=LineString((1, 1), (2, 2), srid=settings.SRID))
+
+    def city_codes(self):
+        return list(CityIntersection.objects.filter(object_table='core_topology', object_id=self.trek.pk)
+                    .values_list('city_code', flat=True))
+
+    def district_ids(self):
+        return list(DistrictIntersection.objects.filter(object_table='core_topology', object_id=self.trek.pk)
+                    .values_list('district_id', flat=True))
+
+    def test_object_geometry_changes(self):
+        city = CityFactory.create(geom=self.square)
+        district = DistrictFactory.create(geom=self.square)
+        self.assertEqual(self.city_codes(), [city.code])
+        self.assertEqual(self.district_ids(), [district.pk])
+        if settings.TREKKING_TOPOLOGY_ENABLED:
+            self.path.geom = LineString((20, 20), (21, 21), srid=settings.SRID)
+            self.path.save()
+        else:
+            self.trek.geom = LineString((20, 20), (21, 21), srid=settings.SRID)
+            self.trek.save()
+        self.assertEqual(self.city_codes(), [])
+        self.assertEqual(self.district_ids(), [])
+
+    def test_zone_geometry_changes(self):
+        city = CityFactory.create(geom=self.square)
+        self.assertEqual(self.city_codes(), [city.code])
+        city.geom = self.far_square
+        city.save()
+        self.assertEqual(self.city_codes(), [])
+        city.geom = self.square
+        city.save()
+        self.assertEqual(self.city_codes(), [city.code])
+        city.delete()
+        self.assertEqual(self.city_codes(), [])